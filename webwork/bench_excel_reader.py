@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel读取性能测试脚本
+
+生成一个合成的询价单（默认20000行），分别用完整加载模式（旧的读取方式）、
+openpyxl只读流式模式和标准库xlsx后端读取，比较耗时和进程峰值内存。每种模式在独立的子进程中运行，
+以便峰值内存互不影响。
+
+用法:
+    python bench_excel_reader.py [--rows 20000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import openpyxl
+
+from excel_reader import EXPECTED_HEADERS
+
+
+def create_sample(file_path, rows):
+    """生成合成的询价单：第16行表头，第17行起为数据，末尾为Discount行"""
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    for col, header in enumerate(EXPECTED_HEADERS, start=1):
+        sheet.cell(row=16, column=col, value=header)
+    for i in range(rows):
+        sheet.append([
+            i + 1,
+            f"{190000 + i}",
+            f"Item description {i}",
+            "",
+            (i % 10) + 1,
+            "PCS",
+            round(1.5 + i % 100, 2),
+            None,
+            ["LOCAL BRAND", "OEM", "GENUINE"][i % 3],
+        ])
+    sheet.append([])
+    sheet.append([None, None, None, None, None, "Discount  :", None, "16%"])
+    wb.save(file_path)
+
+
+def read_full(file_path):
+    """旧的读取方式：完整加载工作簿，逐单元格查找结束行和Discount"""
+    wb = openpyxl.load_workbook(file_path)
+    sheet = wb.active
+    headers = [cell.value for cell in sheet[16]]
+    end_row = sheet.max_row
+    for row_num in range(17, sheet.max_row + 1):
+        if not isinstance(sheet.cell(row=row_num, column=1).value, (int, float)):
+            end_row = row_num - 1
+            break
+    data = []
+    for row in sheet.iter_rows(min_row=17, max_row=end_row, values_only=True):
+        row_data = {headers[i]: value for i, value in enumerate(row) if i < len(headers) and headers[i] is not None}
+        if any(row_data.values()):
+            data.append(row_data)
+    for row_num in range(sheet.max_row, 1, -1):
+        if sheet.cell(row=row_num, column=6).value == "Discount  :":
+            break
+    return len(data)
+
+
+def read_streaming(file_path):
+    """新的读取方式：ExcelReader只读流式读取"""
+    from excel_reader import ExcelReader
+    data, _ = ExcelReader(file_path).read_data()
+    return len(data)
+
+
+def read_stdlib(file_path):
+    """标准库后端：ExcelReader直接解析xlsx中的XML"""
+    from excel_reader import ExcelReader
+    data, _ = ExcelReader(file_path, backend='stdlib').read_data()
+    return len(data)
+
+
+READERS = {
+    'full': read_full,
+    'streaming': read_streaming,
+    'stdlib': read_stdlib,
+}
+
+
+def peak_rss_mb():
+    """返回当前进程的峰值内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS返回字节，Linux返回KB
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def run_child(mode, file_path, repeat):
+    """在子进程中运行一种读取方式"""
+    reader = READERS[mode]
+    times = []
+    rows = 0
+    devnull = open(os.devnull, 'w')
+    for _ in range(repeat):
+        stdout = sys.stdout
+        sys.stdout = devnull  # 屏蔽ExcelReader的日志输出
+        try:
+            start = time.perf_counter()
+            rows = reader(file_path)
+            times.append(time.perf_counter() - start)
+        finally:
+            sys.stdout = stdout
+    print(json.dumps({'rows': rows, 'best': min(times), 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excel读取性能测试')
+    parser.add_argument('--rows', type=int, default=20000, help='合成数据的行数')
+    parser.add_argument('--repeat', type=int, default=3, help='每种模式的重复次数（取最快一次）')
+    parser.add_argument('--child', choices=sorted(READERS), help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child, args.file, args.repeat)
+        return
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'sample.xlsx')
+        print(f"生成 {args.rows} 行的合成询价单...")
+        create_sample(file_path, args.rows)
+        
+        for mode in READERS:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode,
+                 '--file', file_path, '--repeat', str(args.repeat)],
+                capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            peak = result['peak_rss_mb']
+            peak_text = f"{peak:.1f} MB" if peak is not None else "不支持"
+            print(f"{mode:>10}: {result['rows']} 行, 最快 {result['best']:.3f} 秒, 峰值内存 {peak_text}")
+
+
+if __name__ == "__main__":
+    main()
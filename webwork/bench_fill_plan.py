@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字段映射每行开销性能测试脚本
+
+用合成的配置和数据行（与询价单相同的9列），比较旧的逐行解释field_mappings的方式
+和预先编译的填表计划（fill_plan）每行确定所有字段值的耗时。编译计划分别测量
+debug级别（生成每个字段的取值说明）和info级别（不生成取值说明，默认）。
+不连接浏览器，日志输出替换为空函数，只测量取值本身的开销。
+
+用法:
+    python bench_fill_plan.py [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from excel_reader import EXPECTED_HEADERS, ExcelRow
+from fill_plan import compile_plan, SKIP
+
+CONFIG = {
+    'excel_config': {'oem_type': ['Genuine', 'OEM', 'Compatible']},
+    'field_mappings': [
+        {'excel_field': 'Price', 'element_type': 'input',
+         'web_element': {'table_identifier': 'grid', 'table_column': 5}},
+        {'excel_field': 'Brand', 'element_type': 'select',
+         'web_element': {'table_identifier': 'grid', 'table_column': 6}},
+        {'excel_field': 'Remark', 'element_type': 'textarea',
+         'web_element': {'table_identifier': 'grid', 'table_column': 7}},
+        {'excel_field': 'Discount', 'element_type': 'input',
+         'web_element': {'table_identifier': 'grid', 'table_column': 8}},
+        {'excel_field': 'Lead Time', 'element_type': 'input', 'default_value': '7',
+         'web_element': {'table_identifier': 'grid', 'table_column': 9}},
+        {'excel_field': 'Currency', 'element_type': 'select', 'default_value': 0,
+         'web_element': {'table_identifier': 'grid', 'table_column': 10}},
+    ]
+}
+DISCOUNT = 16.0
+
+
+def create_rows(rows):
+    """生成合成的数据行"""
+    columns = {header: index for index, header in enumerate(EXPECTED_HEADERS)}
+    return [
+        ExcelRow(columns, (i + 1, f"{190000 + i}", f"Item {i}", None, (i % 10) + 1, "PCS",
+                           round(1.5 + i % 100, 2), None, ["LOCAL BRAND", "OEM", "GENUINE"][i % 3]))
+        for i in range(rows)
+    ]
+
+
+def no_log(message, level='info'):
+    """丢弃日志和结果"""
+
+
+def resolve_inline(config, columns, data, discount, table_identifier, emit=no_log):
+    """旧的方式：每行每个字段重新解释字段映射（与改动前填表循环中的分支相同）"""
+    log = no_log
+    for row in data:
+        for field_mapping in config.get('field_mappings', []):
+            excel_field = field_mapping.get('excel_field')
+            web_element = field_mapping.get('web_element')
+            element_type = field_mapping.get('element_type', 'input')
+            default_value = field_mapping.get('default_value')
+            if 'table_identifier' in web_element:
+                web_element = web_element.copy()
+                web_element['table_identifier'] = table_identifier
+            value = None
+            if default_value == "{{discount}}" or (excel_field == "Discount" and discount is not None):
+                if discount is not None:
+                    value = discount
+                    log(f"使用Discount值: {value} 填入字段 {excel_field}")
+                else:
+                    log("警告: 配置使用Discount值，但未找到Discount值")
+                    continue
+            elif default_value is not None:
+                value = default_value
+                log(f"使用默认值: {value} 填入字段 {excel_field}")
+            else:
+                if not excel_field:
+                    log("警告: excel_field为空，且未配置默认值")
+                    continue
+                column = columns.get(excel_field)
+                if column is not None and row.has(column):
+                    value = row.at(column)
+                    if value is not None:
+                        if excel_field == 'Brand':
+                            oem_type_list = config.get('excel_config', {}).get('oem_type', [])
+                            brand_mapping = {
+                                'LOCAL BRAND': 'Compatible',
+                                'OEM': 'OEM',
+                                'GENUINE': 'Genuine'
+                            }
+                            if value in brand_mapping:
+                                oem_value = brand_mapping[value]
+                                if oem_value in oem_type_list:
+                                    oem_index = oem_type_list.index(oem_value)
+                                    value = oem_index
+                                    log(f"使用Excel值: {row.at(column)} 填入字段 {excel_field}")
+                                    log(f"转换为oem_type索引: {oem_index} ({oem_value})")
+                                else:
+                                    log(f"警告: 未找到对应的oem_type值: {oem_value}")
+                                    continue
+                            else:
+                                log(f"警告: 未知的Brand值: {value}")
+                                continue
+                        else:
+                            log(f"使用Excel值: {value} 填入字段 {excel_field}")
+                    elif discount is not None:
+                        value = discount
+                        log(f"Excel值为None，使用discount值: {value} 填入字段 {excel_field}")
+                    else:
+                        log(f"警告: Excel中字段 {excel_field} 的值为None")
+                        continue
+                elif discount is not None:
+                    value = discount
+                    log(f"Excel中缺少字段 {excel_field}，使用discount值: {value} 填入字段 {excel_field}")
+                else:
+                    log(f"警告: Excel中缺少字段 {excel_field}，且未配置discount值")
+                    continue
+            emit((excel_field, web_element['table_identifier'], value))
+
+
+def resolve_plan(config, columns, data, discount, table_identifier, emit=no_log, verbose=False):
+    """新的方式：编译一次填表计划，每行只调用取值器（verbose对应debug级别）"""
+    log = no_log
+    plan = compile_plan(config, columns, discount)
+    for row in data:
+        for field in plan:
+            value = field.resolve(row, log, verbose)
+            if value is SKIP:
+                continue
+            web_element = field.element_for(table_identifier)
+            emit((field.excel_field, web_element['table_identifier'], value))
+
+
+def check_same(config, columns, data, discount):
+    """确认两种方式得到的值完全一致"""
+    expected, actual = [], []
+    resolve_inline(config, columns, data, discount, 'grid_1', expected.append)
+    resolve_plan(config, columns, data, discount, 'grid_1', actual.append, verbose=True)
+    if expected != actual:
+        raise AssertionError("两种方式得到的值不一致")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字段映射每行开销性能测试')
+    parser.add_argument('--rows', type=int, default=20000, help='合成数据的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='每种方式的重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    data = create_rows(args.rows)
+    columns = {header: index for index, header in enumerate(EXPECTED_HEADERS)}
+    check_same(CONFIG, columns, data, DISCOUNT)
+
+    results = {}
+    variants = (
+        ('逐行解释', lambda: resolve_inline(CONFIG, columns, data, DISCOUNT, 'grid_1')),
+        ('编译计划（debug）', lambda: resolve_plan(CONFIG, columns, data, DISCOUNT, 'grid_1', verbose=True)),
+        ('编译计划（info）', lambda: resolve_plan(CONFIG, columns, data, DISCOUNT, 'grid_1')),
+    )
+    for name, resolve in variants:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            resolve()
+            times.append(time.perf_counter() - start)
+        results[name] = min(times) / args.rows * 1e6
+        print(f"{name}: {len(CONFIG['field_mappings'])} 个字段, 每行 {results[name]:.2f} 微秒")
+    for name, _ in variants[1:]:
+        print(f"{name}加速: {results['逐行解释'] / results[name]:.2f} 倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间性能测试脚本
+
+在新的Python进程中导入main.py和gui.py（使用 -X importtime），记录每个模块的导入耗时，
+并检查启动时是否导入了Playwright和openpyxl。有图形界面时还会测量GUI窗口第一次显示
+（创建窗口并完成第一次绘制）的耗时。每项重复多次取最快一次。
+
+用法:
+    python bench_startup.py [--repeat 5] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 启动时不应导入的较慢模块
+HEAVY_MODULES = ('playwright', 'openpyxl')
+
+# 子进程中执行的代码：导入入口模块后输出已导入的较慢模块
+IMPORT_CODE = """
+import json, sys
+import {module}
+print(json.dumps({{'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+# 子进程中执行的代码：创建GUI窗口并完成第一次绘制
+PAINT_CODE = """
+import json, os, sys, time
+start = time.perf_counter()
+import tkinter as tk
+import gui
+root = tk.Tk()
+app = gui.ExcelWebFillerGUI(root)
+root.update()
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+if app.log_writer is not None:
+    app.log_writer.close()
+    os.remove(app.log_file)
+root.destroy()
+print(json.dumps({{'paint_ms': elapsed, 'heavy': heavy}}))
+"""
+
+
+def run_python(code, importtime=False):
+    """在新的Python进程中执行代码
+
+    Returns:
+        tuple: (耗时毫秒, 标准输出最后一行的JSON, 标准错误)
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', code]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=SCRIPT_DIR, capture_output=True, text=True, encoding='utf-8')
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程执行失败")
+    lines = result.stdout.strip().splitlines()
+    return elapsed, json.loads(lines[-1]) if lines else {}, result.stderr
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出
+
+    Returns:
+        list: (模块名, 嵌套层级, 自身耗时毫秒, 累计耗时毫秒) 列表
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_part, cumulative_us, name = line.split('|', 2)
+        self_us = self_part.split(':', 1)[1]
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def bench_import(module, repeat):
+    """测量导入入口模块的耗时（取最快一次）"""
+    best = None
+    for _ in range(repeat):
+        elapsed, info, stderr = run_python(IMPORT_CODE.format(module=module, heavy=HEAVY_MODULES), importtime=True)
+        if best is None or elapsed < best[0]:
+            best = (elapsed, info, stderr)
+    return best
+
+
+def has_display():
+    """是否可以创建窗口"""
+    return sys.platform.startswith('win') or sys.platform == 'darwin' or bool(os.environ.get('DISPLAY'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动时间性能测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每项的重复次数（取最快一次）')
+    parser.add_argument('--top', type=int, default=15, help='显示导入耗时最多的模块数')
+    args = parser.parse_args()
+
+    baseline = min(run_python('pass')[0] for _ in range(args.repeat))
+    print(f"Python解释器启动: {baseline:.1f} 毫秒")
+
+    for module in ('main', 'gui'):
+        elapsed, info, stderr = bench_import(module, args.repeat)
+        modules = parse_importtime(stderr)
+        total = next((cumulative for name, depth, _, cumulative in modules if name == module and depth == 0), 0)
+        print(f"\n=== import {module} ===")
+        print(f"进程总耗时: {elapsed:.1f} 毫秒（不含解释器启动: {elapsed - baseline:.1f} 毫秒）")
+        print(f"导入耗时: {total:.1f} 毫秒")
+        heavy = info.get('heavy', [])
+        print(f"启动时导入的较慢模块: {', '.join(heavy) if heavy else '无'}")
+        print(f"导入耗时最多的 {args.top} 个模块（累计/自身，毫秒）:")
+        direct = [entry for entry in modules if entry[1] <= 1 and entry[0] != module]
+        for name, depth, self_ms, cumulative_ms in sorted(direct, key=lambda entry: -entry[3])[:args.top]:
+            print(f"  {name:<32} {cumulative_ms:8.1f} {self_ms:8.1f}")
+
+    print("\n=== GUI窗口第一次显示 ===")
+    if not has_display():
+        print("没有图形界面（未设置DISPLAY），跳过")
+        return
+    best = None
+    for _ in range(args.repeat):
+        _, info, _ = run_python(PAINT_CODE.format(heavy=HEAVY_MODULES))
+        if best is None or info['paint_ms'] < best['paint_ms']:
+            best = info
+    print(f"从导入到第一次绘制完成: {best['paint_ms']:.1f} 毫秒")
+    print(f"窗口显示时已导入的较慢模块: {', '.join(best['heavy']) if best['heavy'] else '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,15 @@ def main():
         "gui.py",
         "main.py",
         "excel_reader.py",
-        "web_automator.py"
+        "web_automator.py",
+        "selector_cache.py",
+        "fill_journal.py",
+        "xlsx_stream.py",
+        "fill_plan.py",
+        "fill_engine.py",
+        "log_writer.py",
+        "event_buffer.py",
+        "preload.py"
     ]
     
     for file in required_files:
@@ -36,6 +44,14 @@ def main():
         "--name", "excel_web_filler",
         "--add-data", f"excel_reader.py;.",
         "--add-data", f"web_automator.py;.",
+        "--add-data", f"selector_cache.py;.",
+        "--add-data", f"fill_journal.py;.",
+        "--add-data", f"xlsx_stream.py;.",
+        "--add-data", f"fill_plan.py;.",
+        "--add-data", f"fill_engine.py;.",
+        "--add-data", f"log_writer.py;.",
+        "--add-data", f"event_buffer.py;.",
+        "--add-data", f"preload.py;.",
         "--hidden-import", "playwright",
         "--hidden-import", "openpyxl",
         "gui.py"
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+xlsx读取后端一致性检查脚本
+
+用openpyxl后端和标准库（stdlib）后端分别读取同一批文件，检查返回的数据、
+Discount值、结束行和表头完全一致。不带参数时检查一组合成的询价单
+（共享字符串、富文本、内联字符串、缓存的公式结果、缺失的行、日期回退等），
+也可以指定要检查的xlsx文件。
+
+用法:
+    python check_xlsx_parity.py [xlsx文件 ...]
+"""
+
+import contextlib
+import datetime
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+
+import openpyxl
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+
+from excel_reader import EXPECTED_HEADERS, ExcelReader, logger as reader_logger
+
+SHEET_XML = 'xl/worksheets/sheet1.xml'
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def new_quote(rows=20, header_row=16):
+    """生成一个基本的询价单工作簿"""
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    for col, header in enumerate(EXPECTED_HEADERS, start=1):
+        sheet.cell(row=header_row, column=col, value=header)
+    for i in range(rows):
+        row = header_row + 1 + i
+        values = [i + 1, f"{190000 + i}", f"Item {i}", None, (i % 10) + 1, "PCS", 1.25 * i, None,
+                  ["LOCAL BRAND", "OEM", "GENUINE"][i % 3]]
+        for col, value in enumerate(values, start=1):
+            sheet.cell(row=row, column=col, value=value)
+    return wb
+
+
+def add_discount(sheet, row, value, label="Discount  :"):
+    """在指定行写入Discount行"""
+    sheet.cell(row=row, column=6, value=label)
+    sheet.cell(row=row, column=8, value=value)
+
+
+def rewrite_package(file_path, rewrites, extra_files=None):
+    """直接修改xlsx中的部件（用于生成openpyxl不会写出的结构）
+
+    Args:
+        file_path (str): xlsx文件路径
+        rewrites (dict): {部件路径: 接收并返回XML文本的函数}
+        extra_files (dict): 要新增的 {部件路径: XML文本}
+    """
+    temp_path = file_path + '.tmp'
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename in rewrites:
+                data = rewrites[item.filename](data.decode('utf-8')).encode('utf-8')
+            target.writestr(item, data)
+        for name, text in (extra_files or {}).items():
+            target.writestr(name, text)
+    shutil.move(temp_path, file_path)
+
+
+def use_shared_strings(file_path):
+    """把openpyxl写出的内联字符串改为共享字符串（Excel保存的文件都使用共享字符串）
+
+    第一个字符串改为富文本并带拼音（rPh），检查只读取纯文本部分
+    """
+    strings = []
+
+    def edit_sheet(xml):
+        def replace(match):
+            strings.append(match.group(3))
+            return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{len(strings) - 1}</v></c>'
+        return re.sub(r'<c r="([A-Z]+\d+)"([^>]*?) t="inlineStr"><is><t>(.*?)</t></is></c>', replace, xml)
+
+    def edit_rels(xml):
+        return xml.replace('</Relationships>', f'<Relationship Type="{REL_NS}/sharedStrings" '
+                                               'Target="sharedStrings.xml" Id="rIdShared" /></Relationships>')
+
+    def edit_content_types(xml):
+        return xml.replace('</Types>', '<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                                       'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml" /></Types>')
+
+    # 先改写工作表以收集字符串，再生成共享字符串表
+    rewrite_package(file_path, {SHEET_XML: edit_sheet})
+    items = [f'<si><t xml:space="preserve">{text}</t></si>' for text in strings]
+    if items:
+        items[0] = (f'<si><r><t xml:space="preserve">{strings[0]}</t></r><r><rPr><b/></rPr><t></t></r>'
+                    '<rPh sb="0" eb="1"><t>ignored</t></rPh></si>')
+    shared = (f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="{len(items)}" '
+              f'uniqueCount="{len(items)}">{"".join(items)}</sst>')
+    rewrite_package(file_path, {'xl/_rels/workbook.xml.rels': edit_rels, '[Content_Types].xml': edit_content_types},
+                    {'xl/sharedStrings.xml': shared})
+
+
+def build_cases(folder):
+    """生成合成的检查用例，返回 [(名称, 文件路径, ExcelReader参数)]"""
+    cases = []
+
+    def save(name, wb, **kwargs):
+        path = os.path.join(folder, f"{name}.xlsx")
+        wb.save(path)
+        cases.append((name, path, kwargs))
+        return path
+
+    wb = new_quote()
+    add_discount(wb.active, 40, "16%")
+    save("basic", wb)
+    save("explicit_end_row", wb, end_row=20)
+    save("end_row_past_data", wb, end_row=45)
+
+    wb = new_quote()
+    add_discount(wb.active, 40, 0.16)
+    add_discount(wb.active, 42, "12.5 %")
+    add_discount(wb.active, 44, "abc%")
+    add_discount(wb.active, 5, 7)
+    save("discount_variants", wb)
+
+    wb = new_quote()
+    sheet = wb.active
+    sheet.cell(row=18, column=3, value=CellRichText("Rich ", TextBlock(InlineFont(b=True), "text")))
+    sheet.cell(row=19, column=4, value=True)
+    sheet.cell(row=20, column=7, value="=E20*2")
+    sheet.cell(row=21, column=2, value="x005F_escaped")
+    sheet.cell(row=22, column=7, value=1e-7)
+    sheet.cell(row=23, column=12, value="beyond headers")
+    sheet.cell(row=16, column=11, value="Note")
+    save("value_types", wb)
+
+    wb = new_quote()
+    wb.active.delete_rows(25, 2)
+    wb.active.cell(row=30, column=1, value=99)
+    save("gap_in_data", wb)
+
+    wb = new_quote()
+    wb.active.cell(row=17, column=1).value = None
+    save("empty_first_row", wb)
+
+    wb = new_quote(header_row=1)
+    save("header_in_first_row", wb, header_row=1, start_row=2)
+
+    wb = new_quote()
+    wb.active.cell(row=3, column=12, value=datetime.datetime(2024, 5, 6))
+    save("date_outside_needed_columns", wb)
+
+    wb = new_quote()
+    wb.active.cell(row=20, column=4, value=datetime.date(2024, 5, 6))
+    save("date_in_data_fallback", wb)
+
+    wb = new_quote()
+    wb.active.cell(row=16, column=3, value="Desc")
+    save("header_mismatch", wb)
+
+    wb = new_quote()
+    other = wb.create_sheet("Other")
+    other.cell(row=1, column=1, value="not active")
+    wb.active = 0
+    save("two_sheets", wb)
+
+    # Excel保存的文件使用共享字符串
+    wb = new_quote()
+    add_discount(wb.active, 40, "16%")
+    use_shared_strings(save("shared_strings", wb))
+
+    # 富文本内联字符串、带缓存结果的公式、错误值、没有r属性的单元格、没有dimension
+    wb = new_quote()
+    path = save("raw_xml", wb)
+
+    def edit_raw(xml):
+        xml = re.sub(r'<dimension ref="[^"]*"\s*/>', '', xml)
+        xml = re.sub(r'<c r="C18" t="inlineStr">.*?</c>',
+                     '<c r="C18" t="inlineStr"><is><t>inline </t><r><t>rich</t></r></is></c>', xml)
+        xml = xml.replace('<c r="I19"', '<c r="H19" t="str"><f>"A"&amp;"B"</f><v>AB</v></c><c r="I19"')
+        xml = xml.replace('<c r="I20"', '<c r="H20" t="e"><v>#DIV/0!</v></c><c r="I20"')
+        xml = xml.replace('<c r="I21"', '<c r="H21"><f>G21*2</f><v>52.5</v></c><c r="I21"')
+        xml = xml.replace('<c r="I22"', '<c r="H22" t="b"><v>1</v></c><c r="I22"')
+        xml = xml.replace('<c r="B23"', '<c')
+        return xml
+
+    rewrite_package(path, {SHEET_XML: edit_raw})
+    return cases
+
+
+class ListHandler(logging.Handler):
+    """把日志记录的文本保存到列表中"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@contextlib.contextmanager
+def capture_reader_log():
+    """临时截获excel_reader的日志（不输出到控制台），返回日志文本列表"""
+    handler = ListHandler()
+    propagate, level = reader_logger.propagate, reader_logger.level
+    reader_logger.addHandler(handler)
+    reader_logger.propagate = False
+    reader_logger.setLevel(logging.INFO)
+    try:
+        yield handler.messages
+    finally:
+        reader_logger.removeHandler(handler)
+        reader_logger.propagate = propagate
+        reader_logger.setLevel(level)
+
+
+def read(path, backend, **kwargs):
+    """用指定后端读取文件，返回可比较的结果和日志"""
+    with capture_reader_log() as messages:
+        reader = ExcelReader(path, backend=backend, **kwargs)
+        try:
+            data, discount = reader.read_data()
+            result = (data, discount, reader.actual_end_row, reader.headers)
+        except ValueError as e:
+            result = ('ValueError', str(e))
+    return result, "\n".join(messages)
+
+
+def check(name, path, kwargs):
+    """比较两个后端的结果，返回是否一致"""
+    expected, _ = read(path, 'openpyxl', **kwargs)
+    actual, log = read(path, 'stdlib', **kwargs)
+    fallback = "回退到openpyxl" in log
+    ok = expected == actual
+    rows = len(expected[0]) if expected[0] != 'ValueError' else expected[0]
+    print(f"{'一致' if ok else '不一致':<4} {name}: {rows}{'（已回退到openpyxl）' if fallback else ''}")
+    if not ok:
+        print(f"    openpyxl: {expected}")
+        print(f"    stdlib:   {actual}")
+    return ok
+
+
+def main():
+    files = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as folder:
+        if files:
+            cases = [(os.path.basename(path), path, {}) for path in files]
+        else:
+            cases = build_cases(folder)
+        results = [check(*case) for case in cases]
+    failed = results.count(False)
+    print(f"\n共检查 {len(results)} 个文件，{len(results) - failed} 个一致，{failed} 个不一致")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
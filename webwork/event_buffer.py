@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件缓冲模块，记录网页自动化过程中的事件和计数
+
+EventBuffer是固定容量的环形缓冲区，只保留最近的事件（Event），超出容量时最早的事件被丢弃；
+订阅者在事件发生时立即收到通知，不需要重新读取整个列表。写入、失败、回退等计数
+只是整数累加，每个单元格写入都可以记录。
+"""
+
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+
+from log_writer import get_logger
+
+logger = get_logger('event_buffer')
+
+# 默认保留的事件数
+DEFAULT_CAPACITY = 1000
+
+# 事件类型
+LOG = 'log'  # 日志信息（连接、检测表格、截图等）
+FAILURE = 'failure'  # 单元格写入失败
+FALLBACK = 'fallback'  # 写入时使用了较慢的备用方式（键盘输入、点击选择等）
+KINDS = (LOG, FAILURE, FALLBACK)
+
+# 计数器名称
+COUNTERS = ('writes', 'failures', 'fallbacks')
+
+# seq为事件序号（从0开始，被丢弃的事件也占用序号），ts为time.time()，level为info/warn/error
+Event = namedtuple('Event', ['seq', 'ts', 'kind', 'level', 'message'])
+
+
+class EventBuffer:
+    """固定容量的事件环形缓冲区
+
+    事件可以在任意线程中发布，订阅者在发布事件的线程中被调用（GUI的订阅者只把文本放入队列）。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """初始化EventBuffer
+
+        Args:
+            capacity (int): 最多保留的事件数
+        """
+        self._events = deque(maxlen=capacity)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def subscribe(self, callback):
+        """订阅之后发布的事件
+
+        Args:
+            callback: callback(event)，在发布事件的线程中调用，不应阻塞
+
+        Returns:
+            取消订阅的函数
+        """
+        self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅（未订阅时忽略）"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, kind, message, level='info'):
+        """发布一个事件：放入缓冲区并通知所有订阅者
+
+        Args:
+            kind (str): 事件类型（LOG、FAILURE、FALLBACK）
+            message (str): 事件信息
+            level (str): 级别（info、warn、error）
+
+        Returns:
+            Event: 发布的事件
+        """
+        with self._lock:
+            event = Event(next(self._seq), time.time(), kind, level, message)
+            self._events.append(event)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"事件订阅者处理失败: {e}")
+        return event
+
+    def count(self, name, amount=1):
+        """累加计数器（不记录事件）"""
+        self.counters[name] += amount
+
+    def recent(self, kind=None, limit=None):
+        """返回缓冲区中最近的事件（按发生顺序）
+
+        Args:
+            kind (str): 只返回该类型的事件（None表示全部）
+            limit (int): 最多返回的事件数（None表示全部）
+
+        Returns:
+            list: Event列表
+        """
+        with self._lock:
+            events = list(self._events)
+        if kind is not None:
+            events = [event for event in events if event.kind == kind]
+        if limit is not None:
+            events = events[-limit:] if limit > 0 else []
+        return events
+
+    def snapshot(self):
+        """返回计数器的副本（用于之后计算一段时间内的增量）"""
+        return dict(self.counters)
+
+    def summary(self, since=None):
+        """计数器的文字说明
+
+        Args:
+            since (dict): 之前的snapshot()，只统计之后的增量（None表示全部）
+        """
+        counters = {name: value - (since or {}).get(name, 0) for name, value in self.counters.items()}
+        return f"写入 {counters['writes']} 个单元格，失败 {counters['failures']} 次，使用备用方式 {counters['fallbacks']} 次"
+
+    def __len__(self):
+        return len(self._events)
@@ -4,186 +4,466 @@
 Excel读取模块，用于读取Excel文件中的数据
 """
 
-import openpyxl
+import hashlib
+import os
+import pickle
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import closing
+
+from log_writer import get_logger
+from xlsx_stream import XlsxSheetReader, XlsxUnsupportedError
+
+logger = get_logger('excel_reader')
+
+
+# 预期的表头（比较时会把连续空格合并为一个）
+EXPECTED_HEADERS = [
+    "No.",
+    "IMPA",
+    "Description",
+    "Remark",
+    "Q'ty",
+    "Unit",
+    "Unit Price   (USD)",
+    "Amount   (USD)",
+    "Brand"
+]
+
+
+def clean_header(header):
+    """替换多个连续空格为单个空格，并去除首尾空格"""
+    if header is None:
+        return None
+    return re.sub(r'\s+', ' ', str(header)).strip()
+
+
+# 可选的读取后端：openpyxl只读模式，或只使用标准库的xlsx流式读取（不支持时自动回退到openpyxl）
+BACKENDS = ('openpyxl', 'stdlib')
+# Discount所在的F列和H列都在前8列中
+DISCOUNT_COLUMNS = 8
+
+
+def parse_discount(h_cell_value):
+    """解析Discount行H列的值
+    
+    Args:
+        h_cell_value: H列的值（如"16%"、0.16或16）
+    
+    Returns:
+        int: 折扣值，无法解析时返回None
+    """
+    if not h_cell_value:
+        return None
+    # 检查是否为字符串且包含百分号
+    if isinstance(h_cell_value, str) and "%" in h_cell_value:
+        try:
+            # 提取百分号前的数字部分，转换为整数
+            return int(float(h_cell_value.replace("%", "").strip()))
+        except ValueError:
+            return None
+    # 检查是否为数字类型（可能已经是数字格式）
+    if isinstance(h_cell_value, (int, float)):
+        # 小于1的小数是百分比的数字表示，如0.16表示16%
+        if h_cell_value < 1:
+            return int(h_cell_value * 100)
+        return int(h_cell_value)
+    return None
+
+
+class ParseCache:
+    """Excel解析结果缓存
+    
+    按 (文件路径, 文件大小, 修改时间, header_row, start_row, end_row) 缓存解析结果，
+    在内存中按最近使用顺序淘汰（LRU）。指定cache_dir时同时把结果序列化到磁盘，
+    文件未变化时下次启动也可以直接使用。
+    """
+    
+    max_disk_entries = 50  # 磁盘上最多保留的缓存文件数
+    
+    def __init__(self, max_entries=8, cache_dir=None):
+        """初始化ParseCache
+        
+        Args:
+            max_entries (int): 内存中最多缓存的解析结果数
+            cache_dir (str): 磁盘缓存目录（None表示只在内存中缓存）
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+    
+    @staticmethod
+    def make_key(excel_file, header_row, start_row, end_row):
+        """生成缓存键（文件不存在时返回None）"""
+        try:
+            stat = os.stat(excel_file)
+        except OSError:
+            return None
+        return (os.path.abspath(excel_file), stat.st_size, stat.st_mtime_ns, header_row, start_row, end_row)
+    
+    def _disk_path(self, key):
+        """返回缓存键对应的磁盘缓存文件路径"""
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+    
+    def get(self, key):
+        """获取缓存的解析结果，未缓存时返回None"""
+        if key is None:
+            return None
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        stored_key, result = pickle.load(f)
+                    if stored_key == key:
+                        self._remember(key, result)
+                        return result
+                except Exception as e:
+                    logger.warning(f"读取Excel解析缓存失败: {e}")
+        return None
+    
+    def put(self, key, result):
+        """缓存解析结果"""
+        if key is None:
+            return
+        self._remember(key, result)
+        if self.cache_dir:
+            try:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                path = self._disk_path(key)
+                temp_file = path + '.tmp'
+                with open(temp_file, 'wb') as f:
+                    pickle.dump((key, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_file, path)
+                self._prune_disk()
+            except Exception as e:
+                logger.warning(f"保存Excel解析缓存失败: {e}")
+    
+    def _prune_disk(self):
+        """只保留最近写入的磁盘缓存文件"""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.pkl')]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[self.max_disk_entries:]:
+            os.remove(path)
+    
+    def _remember(self, key, result):
+        """放入内存缓存，超出容量时淘汰最久未使用的结果"""
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+# 默认的进程内解析缓存（导入验证和填表共用）
+default_parse_cache = ParseCache()
+
+
+class ExcelRow(Mapping):
+    """一行Excel数据
+    
+    所有行共享同一个 {表头: 列索引} 映射，每行只保存一个值元组，比每行一个dict节省内存。
+    支持dict的只读用法（row[field]、field in row、get、items、与dict比较等），
+    也可以用预先解析的列索引直接取值（row.at(column)）。
+    """
+    
+    __slots__ = ('_columns', '_values')
+    
+    def __init__(self, columns, values):
+        """初始化ExcelRow
+        
+        Args:
+            columns (dict): 共享的 {表头: 列索引} 映射
+            values (tuple): 这一行的值
+        """
+        self._columns = columns
+        self._values = values
+    
+    def __getitem__(self, field):
+        column = self._columns[field]
+        if column >= len(self._values):
+            raise KeyError(field)
+        return self._values[column]
+    
+    def __contains__(self, field):
+        column = self._columns.get(field)
+        return column is not None and column < len(self._values)
+    
+    def __iter__(self):
+        return (field for field, column in self._columns.items() if column < len(self._values))
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __repr__(self):
+        return f"ExcelRow({dict(self.items())!r})"
+    
+    def has(self, column):
+        """判断这一行是否包含该列"""
+        return column < len(self._values)
+    
+    def at(self, column):
+        """按列索引取值"""
+        return self._values[column]
+
+
+class OpenpyxlSheet:
+    """openpyxl只读工作表，接口与XlsxSheetReader一致"""
+    
+    def __init__(self, excel_file):
+        """以read_only、data_only模式打开工作簿的活动工作表"""
+        import openpyxl  # 导入较慢，只在使用openpyxl后端时导入
+        self.workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+        self.sheet = self.workbook.active
+        self.max_row = self.sheet.max_row
+        self.max_col = None  # openpyxl总是解码整行，设置该属性没有效果
+    
+    def iter_rows(self, min_row=1):
+        """从min_row开始逐行返回值元组"""
+        return self.sheet.iter_rows(min_row=min_row, values_only=True)
+    
+    def close(self):
+        """关闭工作簿"""
+        self.workbook.close()
 
 
 class ExcelReader:
     """Excel文件读取器"""
     
-    def __init__(self, excel_file, header_row=16, start_row=17, end_row=None):
+    def __init__(self, excel_file, header_row=16, start_row=17, end_row=None, cache=None, backend='openpyxl'):
         """初始化ExcelReader
         
         Args:
             excel_file (str): Excel文件路径
             header_row (int): 表头所在行
             start_row (int): 数据开始行
-            end_row (int): 数据结束行（None表示到文件末尾）
+            end_row (int): 数据结束行（None表示自动检测）
+            cache (ParseCache): read_data()使用的解析结果缓存（None表示不缓存）
+            backend (str): 读取后端（openpyxl或stdlib）
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的Excel读取后端: {backend}，可选: {', '.join(BACKENDS)}")
         self.excel_file = excel_file
+        self.cache = cache
+        self.backend = backend
         self.header_row = header_row
         self.start_row = start_row
         self.end_row = end_row
+        # 以下属性在iter_rows()遍历完成后可用
+        self.headers = []
+        self.columns = {}  # {表头: 列索引}
+        self.actual_end_row = None
+        self.discount_value = None
     
-    def read_data(self):
-        """读取Excel文件中的数据
+    def validate_headers(self, headers):
+        """验证表头
         
-        Returns:
-            tuple: (data, discount_value)，data是包含数据的列表，discount_value是找到的折扣值
+        Args:
+            headers (list): 表头行的值
+        
+        Raises:
+            ValueError: 表头与预期不一致
         """
+        cleaned_headers = [clean_header(header) for header in headers]
+        cleaned_expected = [clean_header(header) for header in EXPECTED_HEADERS]
+        
+        # 检查表头数量
+        if len(cleaned_headers) < len(cleaned_expected):
+            error_message = f"表头数量不足，预期 {len(cleaned_expected)} 列，实际只有 {len(cleaned_headers)} 列"
+            raise ValueError(f"Excel表头验证失败: {error_message}")
+        
+        # 检查每列表头
+        for i, (actual, expected) in enumerate(zip(cleaned_headers, cleaned_expected)):
+            if actual != expected:
+                error_message = f"表头第 {i+1} 列不匹配，预期: '{expected}'，实际: '{actual}'"
+                raise ValueError(f"Excel表头验证失败: {error_message}")
+        
+        logger.info("Excel表头验证通过！")
+    
+    def iter_rows(self):
+        """流式逐行读取数据
+        
+        默认以openpyxl的read_only、data_only模式打开工作簿（公式单元格读取缓存的计算结果）；
+        backend为stdlib时直接解析xlsx中的XML，遇到不支持的内容时回退到openpyxl，
+        并跳过已经返回的行。遍历结束或生成器被关闭时立即关闭文件。遍历完成后，
+        headers、actual_end_row、discount_value属性可用。
+        
+        Yields:
+            ExcelRow: 一行数据（跳过全空的行）
+        
+        Raises:
+            ValueError: 表头验证失败
+        """
+        if self.backend != 'stdlib':
+            yield from self._scan(OpenpyxlSheet(self.excel_file))
+            return
+        
+        yielded = 0
         try:
-            # 打开Excel文件
-            wb = openpyxl.load_workbook(self.excel_file)
-            # 获取第一个工作表
-            sheet = wb.active
-            
-            # 获取工作表的总行数
-            max_row = sheet.max_row
-            
-            # 读取列名
-            headers = []
-            for cell in sheet[self.header_row]:  # 表头所在行
-                headers.append(cell.value)
-            
-            # 验证表头
-            expected_headers = [
-                "No.",
-                "IMPA",
-                "Description",
-                "Remark",
-                "Q'ty",
-                "Unit",
-                "Unit Price   (USD)",
-                "Amount   (USD)",
-                "Brand"
-            ]
+            with closing(self._scan(XlsxSheetReader(self.excel_file))) as rows:
+                for row_data in rows:
+                    yield row_data
+                    yielded += 1
+            return
+        except XlsxUnsupportedError as e:
+            logger.warning(f"标准库xlsx读取不支持该文件（{e}），回退到openpyxl")
+        
+        with closing(self._scan(OpenpyxlSheet(self.excel_file))) as rows:
+            for index, row_data in enumerate(rows):
+                if index >= yielded:
+                    yield row_data
+    
+    def column_index(self, field):
+        """返回字段所在的列索引（没有该字段时返回None），用于在填表循环前预先解析字段映射"""
+        return self.columns.get(field)
+    
+    def _column_limit(self, row_num, data_columns, in_data):
+        """返回第row_num行需要解码的列数（None表示整行）"""
+        if row_num == self.header_row:
+            return None
+        if data_columns is None:
+            # 表头之前的行只需要Discount所在的列
+            return DISCOUNT_COLUMNS if row_num < self.header_row else None
+        if in_data and row_num >= self.start_row:
+            return data_columns
+        return DISCOUNT_COLUMNS
+    
+    def _scan(self, source):
+        """顺序扫描工作表一次：同时读取表头、返回数据行、检测结束行并查找Discount值
+        
+        Args:
+            source: OpenpyxlSheet或XlsxSheetReader（扫描结束后关闭）
+        """
+        try:
+            headers = None
+            data_columns = None  # 数据行需要解码的列数（到最后一个非空表头为止）
+            # 指定了end_row时读到end_row为止，否则读到第一个A列为空或不是数字的行之前
+            detect_end = self.end_row is None
+            end_row = None if detect_end else max(self.end_row, self.start_row)
+            in_data = True
+            discount_value = None
             
-            # 清理实际表头中的空格，以便准确比较
-            cleaned_headers = []
-            for header in headers:
-                if header is not None:
-                    # 替换多个连续空格为单个空格，并去除首尾空格
-                    import re
-                    cleaned = re.sub(r'\s+', ' ', str(header)).strip()
-                    cleaned_headers.append(cleaned)
+            # Discount从第2行开始查找，表头可能在第1行
+            first_row = min(2, self.header_row)
+            source.max_col = self._column_limit(first_row, data_columns, in_data)
+            for row_num, row in enumerate(source.iter_rows(min_row=first_row), start=first_row):
+                # 下一行只解码需要的列
+                source.max_col = self._column_limit(row_num + 1, data_columns, in_data)
+                
+                # 查找Discount值：F列为"Discount  :"，取最后一个有效的H列值
+                if row_num >= 2 and len(row) >= 8 and row[5] == "Discount  :":
+                    value = parse_discount(row[7])
+                    if value is not None:
+                        discount_value = value
+                
+                if row_num == self.header_row:
+                    # 读取并验证列名
+                    headers = list(row)
+                    self.validate_headers(headers)
+                    self.headers = headers
+                    # 所有行共享的 {表头: 列索引}（表头重复时与dict一样使用最后一列）
+                    columns = {header: i for i, header in enumerate(headers) if header is not None}
+                    self.columns = columns
+                    named_columns = list(columns.values())
+                    row_width = max(named_columns) + 1 if named_columns else 0
+                    data_columns = max(row_width, DISCOUNT_COLUMNS)
+                    continue
+                
+                if row_num < self.start_row or not in_data:
+                    continue
+                
+                if headers is None:
+                    raise ValueError(f"Excel表头验证失败: 表头行 {self.header_row} 不在数据开始行 {self.start_row} 之前")
+                
+                if detect_end and not isinstance(row[0] if row else None, (int, float)):
+                    # 上一行就是结束行（至少为start_row，此时start_row这一行仍然读取）
+                    end_row = max(row_num - 1, self.start_row)
+                    if row_num > self.start_row:
+                        in_data = False
+                        continue
+                
+                # 只保存到最后一个有表头的列
+                if len(row) > row_width:
+                    row = row[:row_width]
+                # 只返回非空行
+                if len(row) == row_width:
+                    has_value = any(row[column] for column in named_columns)
                 else:
-                    cleaned_headers.append(None)
+                    has_value = any(row[column] for column in named_columns if column < len(row))
+                if has_value:
+                    yield ExcelRow(columns, tuple(row))
+                if row_num == end_row:
+                    in_data = False
             
-            # 清理预期表头中的空格
-            cleaned_expected = []
-            for header in expected_headers:
-                import re
-                cleaned = re.sub(r'\s+', ' ', str(header)).strip()
-                cleaned_expected.append(cleaned)
+            if headers is None:
+                # 工作表行数不足，表头行为空
+                self.validate_headers([])
             
-            # 验证表头是否一致
-            header_match = True
-            error_message = ""
-            
-            # 检查表头数量
-            if len(cleaned_headers) < len(cleaned_expected):
-                header_match = False
-                error_message = f"表头数量不足，预期 {len(cleaned_expected)} 列，实际只有 {len(cleaned_headers)} 列"
-            else:
-                # 检查每列表头
-                for i, (actual, expected) in enumerate(zip(cleaned_headers, cleaned_expected)):
-                    if actual != expected:
-                        header_match = False
-                        error_message = f"表头第 {i+1} 列不匹配，预期: '{expected}'，实际: '{actual}'"
-                        break
-            
-            # 如果表头验证失败，抛出异常
-            if not header_match:
-                raise ValueError(f"Excel表头验证失败: {error_message}")
-            
-            print("Excel表头验证通过！")
-            
-            # 读取数据
-            data = []
-            # 确定结束行
-            actual_end_row = self.end_row
-            
-            # 如果没有指定end_row，则自动计算
-            if actual_end_row is None:
-                actual_end_row = max_row  # 默认到文件末尾
-                
-                # 从start_row开始检查，找到第一个第一列为空或不是数字的行
-                for row_num in range(self.start_row, max_row + 1):
-                    # 获取第一列（A列）的值
-                    first_cell_value = sheet.cell(row=row_num, column=1).value
-                    
-                    # 检查第一列是否为空或不是数字
-                    if first_cell_value is None:
-                        # 第一列为空，上一行就是end_row
-                        actual_end_row = row_num - 1
-                        break
-                    elif not isinstance(first_cell_value, (int, float)):
-                        # 第一列不是数字，上一行就是end_row
-                        actual_end_row = row_num - 1
-                        break
-                    elif isinstance(first_cell_value, str) and not first_cell_value.strip().isdigit():
-                        # 第一列是字符串但不是数字，上一行就是end_row
-                        actual_end_row = row_num - 1
-                        break
-            
-            # 确保actual_end_row至少为start_row
-            if actual_end_row < self.start_row:
-                actual_end_row = self.start_row
-
-            for row in sheet.iter_rows(min_row=self.start_row, max_row=actual_end_row, values_only=True):
-                row_data = {}
-                for i, value in enumerate(row):
-                    if i < len(headers) and headers[i] is not None:
-                        row_data[headers[i]] = value
-                # 只添加非空行
-                if any(row_data.values()):
-                    data.append(row_data)
+            # 没有检测到结束行时读到文件末尾
+            self.actual_end_row = end_row if end_row is not None else max(source.max_row or 0, self.start_row)
+            self.discount_value = discount_value
+            if discount_value is not None:
+                logger.info(f"找到Discount值: {discount_value}")
+        finally:
+            source.close()
+    
+    def _cache_key(self):
+        """返回解析结果的缓存键（在读取文件之前生成，读取过程中文件被修改时不会缓存新的内容）"""
+        return self.cache.make_key(self.excel_file, self.header_row, self.start_row, self.end_row)
+    
+    def load_cached(self):
+        """返回缓存的解析结果，并恢复headers、columns、actual_end_row、discount_value属性
+        
+        Returns:
+            tuple: (data, discount_value)，没有缓存或文件已变化时返回None
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key())
+        if cached is None:
+            return None
+        data, self.discount_value, self.headers, self.actual_end_row = cached
+        self.columns = data[0]._columns if data else {}
+        logger.info(f"使用缓存的Excel解析结果: {self.excel_file}（共 {len(data)} 行数据）")
+        return data, self.discount_value
+    
+    def read_data(self):
+        """读取Excel文件中的数据
+        
+        文件未变化且参数相同时直接返回缓存的结果（调用方不应修改返回的数据）
+        
+        Returns:
+            tuple: (data, discount_value)，data是ExcelRow列表，discount_value是找到的折扣值
+        """
+        try:
+            cached = self.load_cached()
+            if cached is not None:
+                return cached
             
-            # 查找discount值
-            discount_value = None
-            # 从表格的最后一行开始往上查找
-            for row_num in range(max_row, 1, -1):
-                # 检查F列（第6列）的值是否为"Discount  :"
-                f_cell_value = sheet.cell(row=row_num, column=6).value
-                if f_cell_value == "Discount  :":
-                    # 检查H列（第8列）的值是否为百分号的数字
-                    h_cell_value = sheet.cell(row=row_num, column=8).value
-                    if h_cell_value:
-                        # 检查是否为字符串且包含百分号
-                        if isinstance(h_cell_value, str) and "%" in h_cell_value:
-                            try:
-                                # 提取百分号前的数字部分
-                                discount_str = h_cell_value.replace("%", "").strip()
-                                # 转换为浮点数
-                                discount_float = float(discount_str)
-                                # 转换为整数
-                                discount_value = int(discount_float)
-                                print(f"找到Discount值: {discount_value}")
-                                break
-                            except:
-                                # 如果转换失败，继续查找
-                                pass
-                        # 检查是否为数字类型（可能已经是数字格式）
-                        elif isinstance(h_cell_value, (int, float)):
-                            # 检查是否是小于1的小数（可能是百分比的数字表示，如0.16表示16%）
-                            if h_cell_value < 1:
-                                discount_value = int(h_cell_value * 100)
-                            else:
-                                discount_value = int(h_cell_value)
-                            print(f"找到Discount值: {discount_value}")
-                            break
+            cache_key = self._cache_key() if self.cache is not None else None
+            data = list(self.iter_rows())
+            if self.cache is not None:
+                self.cache.put(cache_key, (data, self.discount_value, self.headers, self.actual_end_row))
             
-            print(f"成功读取Excel文件: {self.excel_file}")
-            print(f"表头行: {self.header_row}")
-            print(f"数据开始行: {self.start_row}")
-            print(f"数据结束行: {actual_end_row}")
-            print(f"共读取 {len(data)} 行数据")
-            print(f"表头字段: {[h for h in headers if h is not None]}")
+            logger.info(f"成功读取Excel文件: {self.excel_file}")
+            logger.info(f"表头行: {self.header_row}")
+            logger.info(f"数据开始行: {self.start_row}")
+            logger.info(f"数据结束行: {self.actual_end_row}")
+            logger.info(f"共读取 {len(data)} 行数据")
+            logger.info(f"表头字段: {[h for h in self.headers if h is not None]}")
             
-            return data, discount_value
+            return data, self.discount_value
         except ValueError as ve:
             # 表头验证失败，重新抛出异常
-            print(f"Excel表头验证失败: {ve}")
+            logger.warning(f"Excel表头验证失败: {ve}")
             raise ve  # 重新抛出ValueError异常
         except Exception as e:
-            print(f"读取Excel文件失败: {e}")
+            logger.warning(f"读取Excel文件失败: {e}")
             return [], None
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填表引擎模块，GUI和命令行共用的逐行填表逻辑
+
+RowStream在后台线程中读取Excel，通过有界队列把数据行交给FillEngine，
+读取后面的行与写入网页同时进行。FillEngine按表格顺序分配数据行，
+以生成器方式逐个返回单元格的填写结果，日志和进度通过FillSink输出，
+FillControl可以在行与行之间暂停或取消填表。
+依赖Discount值的单元格（Discount行在数据之后）在读取结束前先跳过，读取结束后再填写，
+其他单元格的写入与读取同时进行。
+每个字段的取值说明和单元格结果记录只在日志级别为debug时输出。
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import closing
+
+from fill_plan import compile_plan, PENDING, SKIP
+from log_writer import get_logger
+
+logger = get_logger('fill_engine')
+
+# 读取线程最多领先填表的行数
+DEFAULT_QUEUE_SIZE = 256
+# 填表时生成的table_identifier（与WebAutomator的TABLE_IDENTIFIER_PATTERN对应）
+TABLE_IDENTIFIER_TEMPLATE = "//table[@id='{}']//tr[position()>=3]"
+
+# 单元格的填写结果
+FILLED = 'filled'  # 填写成功
+FAILED = 'failed'  # 填写失败
+UNCHANGED = 'unchanged'  # 增量填写：网页当前值与要填写的值相同
+RESUMED = 'resumed'  # 断点续填：上次已完成
+STATUSES = (FILLED, FAILED, UNCHANGED, RESUMED)
+
+# table_id为None表示不分配表格；row_index为表格中的行，excel_row为第几行Excel数据（都从0开始）
+FillResult = namedtuple('FillResult', ['table_id', 'row_index', 'excel_row', 'field', 'value', 'status'])
+
+# 队列中表示读取结束的标记
+_END = object()
+
+
+class _ReadError:
+    """读取线程中发生的异常，交给填表线程重新抛出"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class RowStream:
+    """Excel数据行流
+
+    在后台线程中调用ExcelReader.iter_rows()，数据行放入有界队列，填表循环按顺序取用。
+    Discount行在数据之后：peek_discount()在读取结束前返回PENDING，不等待；discount()
+    把队列中的行转移到本地缓冲区直到读取结束，读取线程不会因为队列已满而阻塞。解析结果有缓存时直接使用缓存，不启动读取线程。
+    """
+
+    def __init__(self, reader, default_discount=None, queue_size=DEFAULT_QUEUE_SIZE, log=print):
+        """开始读取，并等待表头读取完成（之后reader.columns可用）
+
+        Args:
+            reader (ExcelReader): Excel读取器
+            default_discount: Excel中没有Discount值时使用的值（配置中的discount）
+            queue_size (int): 读取线程最多领先的行数
+            log: 日志输出函数（只使用第一个参数，可以是print）
+
+        Raises:
+            ValueError: 表头验证失败
+        """
+        self.reader = reader
+        self.default_discount = default_discount
+        self.log = log
+        self.count = 0  # 已经交给填表循环的行数
+        self.done = False  # 是否已经读取结束
+        self._discount = default_discount
+        self._backlog = deque()
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        cached = reader.load_cached()
+        if cached is not None:
+            self._backlog.extend(cached[0])
+            self._finish()
+            return
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._produce, name='ExcelRowReader', daemon=True)
+        self._thread.start()
+        # 第一行数据（或读取结束）到达时表头已经读取并验证完成
+        self._pull()
+
+    def _produce(self):
+        """读取线程：逐行读取并放入队列"""
+        try:
+            with closing(self.reader.iter_rows()) as rows:
+                for row in rows:
+                    if self._stop.is_set():
+                        return
+                    self._queue.put(row)
+            self._queue.put(_END)
+        except Exception as e:
+            self._queue.put(_ReadError(e))
+
+    def _pull(self):
+        """从队列取一项到本地缓冲区（会等待读取线程）"""
+        item = self._queue.get()
+        if item is _END:
+            self._finish()
+        elif isinstance(item, _ReadError):
+            self.done = True
+            raise item.error
+        else:
+            self._backlog.append(item)
+
+    def _finish(self):
+        """读取结束：确定Discount值"""
+        self.done = True
+        if self.reader.discount_value is not None:
+            self._discount = self.reader.discount_value
+            self.log(f"从Excel中找到Discount值: {self._discount}")
+        self.log(f"Excel数据读取完成，共 {self.count + len(self._backlog)} 行")
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.exhausted():
+            raise StopIteration
+        self.count += 1
+        return self._backlog.popleft()
+
+    def exhausted(self):
+        """是否已经没有更多的行（下一行还没有读到时会等待）"""
+        while not self._backlog and not self.done:
+            self._pull()
+        return not self._backlog
+
+    def discount(self):
+        """返回Discount值：Excel中的值优先，没有时使用default_discount（需要时等待读取结束）"""
+        while not self.done:
+            self._pull()
+        return self._discount
+
+    def peek_discount(self):
+        """返回Discount值，还没有读取结束时返回PENDING（不等待）"""
+        return self._discount if self.done else PENDING
+
+    def close(self):
+        """停止读取线程（填表提前结束时调用，读取线程关闭Excel文件后退出）"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                # 取出队列中的行，让等待放入队列的读取线程继续并检查停止标记
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread = None
+
+
+class FillControl:
+    """填表的暂停/取消控制（可以在任意线程调用，填表引擎在每行开始前检查）"""
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self.cancelled = False
+
+    @property
+    def paused(self):
+        """是否已暂停"""
+        return not self._running.is_set()
+
+    def pause(self):
+        """暂停：当前行填写完成后等待"""
+        self._running.clear()
+
+    def resume(self):
+        """继续填写"""
+        self._running.set()
+
+    def cancel(self):
+        """取消：当前行填写完成后停止（暂停中也会立即停止等待）"""
+        self.cancelled = True
+        self._running.set()
+
+    def checkpoint(self):
+        """等待暂停结束
+
+        Returns:
+            bool: 是否继续填写（已取消时返回False）
+        """
+        self._running.wait()
+        return not self.cancelled
+
+
+class FillSink:
+    """填表事件的接收器，按需覆盖其中的方法"""
+
+    def log(self, message, level='info'):
+        """日志信息（不含换行），level为info、warn或error"""
+
+    def row_started(self, excel_row, table_id, row_index):
+        """开始处理一行Excel数据"""
+
+    def result(self, result):
+        """一个单元格的填写结果（FillResult）"""
+
+    def finished(self, stats):
+        """填表结束（包括中途出错），stats为各结果的单元格数"""
+
+
+class LogSink(FillSink):
+    """把日志信息交给一个函数输出：write(message, level)"""
+
+    def __init__(self, write):
+        self.write = write
+
+    def log(self, message, level='info'):
+        self.write(message, level)
+
+
+class FillEngine:
+    """填表引擎
+
+    把数据行按顺序分配到各个表格的各行（Excel行索引跨所有表格），每个字段通过
+    编译好的填表计划取值，按配置逐个、按表格批量或并发写入，并记录填表进度。
+    """
+
+    def __init__(self, automator, config, sinks=(), journal=None, incremental=False, control=None):
+        """初始化FillEngine
+
+        Args:
+            automator (WebAutomator): 已连接的网页自动化工具
+            config (dict): 配置内容（使用field_mappings、excel_config.oem_type和fill_config）
+            sinks (list): FillSink列表
+            journal (FillJournal): 填表进度日志（None表示不记录进度）
+            incremental (bool): 是否只写入与网页当前值不同的单元格
+            control (FillControl): 暂停/取消控制（None表示不能暂停和取消）
+        """
+        self.automator = automator
+        self.config = config
+        self.sinks = list(sinks)
+        self.journal = journal
+        self.incremental = incremental
+        self.control = control
+        self.cancelled = False  # 填表是否被取消
+        fill_config = config.get('fill_config', {})
+        self.bulk_fill = fill_config.get('bulk_fill', False)  # 是否按表格批量填写
+        self.concurrency = fill_config.get('concurrency', 1)  # 同时写入的单元格数（1表示逐个写入）
+        self.concurrent_rows = max(1, fill_config.get('concurrent_rows', 1))  # 每批并发写入的行数
+        self.stats = dict.fromkeys(STATUSES, 0)
+        # 等待Discount值的单元格：(field, row, table_id, table_identifier, row_index, excel_row, 网页当前值)
+        self.deferred = []
+        self.verbose = False  # 是否生成每个字段的取值说明和单元格结果记录（日志级别为debug时）
+
+    def log(self, message, level='info'):
+        """输出日志到所有接收器"""
+        for sink in self.sinks:
+            sink.log(message, level)
+
+    def _emit(self, result, duration_ms=None):
+        """统计并通知一个单元格的填写结果"""
+        self.stats[result.status] += 1
+        for sink in self.sinks:
+            sink.result(result)
+        if self.verbose:
+            logger.debug("单元格结果: %s", result.status, extra={
+                'table': result.table_id, 'row': result.row_index, 'field': result.field,
+                'status': result.status, 'duration_ms': duration_ms})
+        return result
+
+    def run(self, stream, tables=None):
+        """按顺序填写所有数据行
+
+        Args:
+            stream (RowStream): Excel数据行
+            tables (list): 按顺序填写的表格id；None表示不分配表格，
+                每行数据直接按配置中的元素标识符填写（行索引即Excel行索引）
+
+        Yields:
+            FillResult: 单元格的填写结果（批量和并发写入的单元格在该批完成后返回）
+        """
+        if self.bulk_fill:
+            self.log("已启用批量填写模式")
+        if self.incremental:
+            self.log("已启用增量填写: 只写入与网页当前值不同的单元格")
+        if self.concurrency > 1:
+            self.log(f"已启用并发写入: 最多 {self.concurrency} 个单元格同时写入，每批 {self.concurrent_rows} 行")
+        self.verbose = logger.isEnabledFor(logging.DEBUG)
+
+        # 预先编译字段映射：与行无关的判断和查找只做一次，填表循环中只调用取值器
+        # Discount值还没有读到时不等待，依赖它的单元格在读取结束后再填写
+        plan = compile_plan(self.config, stream.reader.columns, stream.peek_discount)
+        self.deferred = []
+        try:
+            if tables is None:
+                yield from self._fill_table(plan, stream, None)
+            else:
+                for table_index, table_id in enumerate(tables):
+                    self.log(f"\n处理表格 {table_index + 1}/{len(tables)}: {table_id}")
+                    yield from self._fill_table(plan, stream, table_id)
+                    if self.cancelled:
+                        break
+                    self.log(f"表格 {table_index + 1} 处理完成")
+
+                    # 如果Excel数据已全部填写完毕，退出循环
+                    if stream.exhausted():
+                        self.log("所有Excel数据已填写完毕")
+                        break
+            if self.deferred and not self.cancelled:
+                yield from self._fill_deferred(stream)
+
+            if self.incremental:
+                self.log(f"增量填写: 跳过 {self.stats[UNCHANGED]} 个未变化的单元格")
+            if self.journal is not None and self.journal.resume:
+                self.log(f"断点续填: 跳过 {self.stats[RESUMED]} 个已完成的单元格")
+            self.log(f"填写完成: 成功 {self.stats[FILLED]} 个单元格，失败 {self.stats[FAILED]} 个",
+                     'warn' if self.stats[FAILED] else 'info')
+        finally:
+            stream.close()
+            for sink in self.sinks:
+                sink.finished(self.stats)
+
+    def _fill_table(self, plan, stream, table_id):
+        """把数据行依次填入一个表格的各行（table_id为None时不限行数）"""
+        automator = self.automator
+        journal = self.journal
+        table_identifier = None
+        row_count = None
+        if table_id is not None:
+            # 动态生成table_identifier
+            table_identifier = TABLE_IDENTIFIER_TEMPLATE.format(table_id)
+            self.log(f"使用table_identifier: {table_identifier}")
+
+            # 获取当前表格的行数（检测表格时已得到）
+            try:
+                row_count = automator.get_table_row_count(table_id)
+                self.log(f"当前表格有 {row_count} 行可填写")
+            except Exception as e:
+                self.log(f"获取表格行数失败: {e}", 'warn')
+                row_count = 0
+
+        # 批量填写和增量填写需要按表格读写
+        bulk_fill = self.bulk_fill and table_id is not None
+        incremental = self.incremental and table_id is not None
+
+        # 增量填写：一次读取当前表格所有表格列的当前值
+        current_values = []
+        if incremental:
+            columns = [field.web_element['table_column'] for field in plan if field.bulk]
+            current_values = automator.read_table_values(table_id, columns)
+            self.log(f"已读取表格当前值: {len(current_values)} 行")
+
+        # 批量模式下收集的单元格、逐个填写所需的信息和对应的结果
+        bulk_cells = []
+        bulk_fallbacks = []
+        bulk_pending = []
+        # 并发模式下待写入的单元格
+        concurrent_cells = []
+        concurrent_pending = []
+
+        row_index = 0
+        while row_count is None or row_index < row_count:
+            # 在行与行之间响应暂停和取消，暂停或停止前先写入已收集的并发单元格
+            control = self.control
+            if concurrent_cells and control is not None and (control.paused or control.cancelled):
+                results = self._fill_concurrent_cells(table_id, concurrent_cells)
+                yield from self._complete_all(concurrent_pending, results)
+                concurrent_cells = []
+                concurrent_pending = []
+            if not self._checkpoint():
+                break
+
+            # 检查Excel数据是否已用完
+            if stream.exhausted():
+                if table_id is not None:
+                    self.log("Excel数据已全部填写完毕")
+                break
+
+            # 获取当前Excel行数据
+            excel_row = stream.count
+            row = next(stream)
+            if table_id is None:
+                self.log(f"\n正在填入第 {excel_row + 1} 行数据...")
+            else:
+                self.log(f"处理Excel第 {excel_row + 1} 行数据，填写到表格第 {row_index + 1} 行...")
+            for sink in self.sinks:
+                sink.row_started(excel_row, table_id, row_index)
+
+            # 填入数据
+            for field in plan:
+                # 断点续填：跳过上次已完成的单元格
+                journal_key = (table_id, row_index, field.journal_field)
+                if journal is not None and journal.is_done(*journal_key):
+                    yield self._emit(FillResult(table_id, row_index, excel_row, field.excel_field, None, RESUMED))
+                    continue
+
+                # 确定使用的值
+                value = field.resolve(row, self.log, self.verbose)
+                if value is SKIP:
+                    continue
+                if value is PENDING:
+                    # 增量填写时同时保存网页当前值，读取结束后比较（PENDING表示不比较）
+                    current = PENDING
+                    if incremental and field.bulk and row_index < len(current_values):
+                        current = current_values[row_index].get(field.web_element['table_column'])
+                    self.deferred.append((field, row, table_id, table_identifier, row_index, excel_row, current))
+                    continue
+
+                element_type = field.element_type
+                web_element = field.element_for(table_identifier)
+                result = FillResult(table_id, row_index, excel_row, field.excel_field, value, None)
+
+                # 增量填写：网页当前值与要填写的值相同时跳过
+                if (incremental and field.bulk and row_index < len(current_values)
+                        and automator.cell_value_matches(
+                            current_values[row_index].get(web_element['table_column']), value)):
+                    yield self._complete(journal_key, result, True, UNCHANGED)
+                    continue
+
+                # 批量模式下，表格列元素先收集起来，当前表格处理完后一次性填写
+                if bulk_fill and field.bulk:
+                    bulk_cells.append((row_index, web_element['table_column'], value, element_type))
+                    bulk_fallbacks.append((element_type, web_element, value, row_index, field.excel_field))
+                    bulk_pending.append((journal_key, result))
+                    continue
+
+                # 并发模式下先收集，攒够一批行后一起写入
+                if self.concurrency > 1:
+                    concurrent_cells.append((element_type, web_element, value, row_index, field.callback))
+                    concurrent_pending.append((journal_key, result))
+                    continue
+
+                # 填入网页元素，成功后记录进度
+                start = time.perf_counter()
+                ok = self._fill_element(element_type, web_element, value, row_index, field.excel_field)
+                yield self._complete(journal_key, result, ok, duration_ms=round((time.perf_counter() - start) * 1000, 2))
+
+            row_index += 1
+
+            # 并发写入攒够的一批行
+            if concurrent_cells and row_index % self.concurrent_rows == 0:
+                results = self._fill_concurrent_cells(table_id, concurrent_cells)
+                yield from self._complete_all(concurrent_pending, results)
+                concurrent_cells = []
+                concurrent_pending = []
+
+        # 写入当前表格剩余的并发单元格
+        if concurrent_cells:
+            results = self._fill_concurrent_cells(table_id, concurrent_cells)
+            yield from self._complete_all(concurrent_pending, results)
+
+        # 批量填写当前表格收集到的单元格，失败的单元格回退到逐个填写
+        if bulk_cells:
+            results = self._fill_bulk_cells(table_id, bulk_cells, bulk_fallbacks)
+            yield from self._complete_all(bulk_pending, results)
+
+        # 每个表格完成后确保进度写入磁盘
+        if journal is not None:
+            journal.flush()
+
+    def _fill_deferred(self, stream):
+        """读取结束后逐个填写等待Discount值的单元格"""
+        stream.discount()  # 等待读取结束（通常已经结束）
+        self.log(f"\n填写依赖Discount值的 {len(self.deferred)} 个单元格...")
+        journal = self.journal
+        for field, row, table_id, table_identifier, row_index, excel_row, current in self.deferred:
+            if not self._checkpoint():
+                break
+            value = field.resolve(row, self.log, self.verbose)
+            if value is SKIP:
+                continue
+            journal_key = (table_id, row_index, field.journal_field)
+            result = FillResult(table_id, row_index, excel_row, field.excel_field, value, None)
+            if current is not PENDING and self.automator.cell_value_matches(current, value):
+                yield self._complete(journal_key, result, True, UNCHANGED)
+                continue
+            start = time.perf_counter()
+            ok = self._fill_element(field.element_type, field.element_for(table_identifier), value,
+                                    row_index, field.excel_field)
+            yield self._complete(journal_key, result, ok, duration_ms=round((time.perf_counter() - start) * 1000, 2))
+        if journal is not None:
+            journal.flush()
+
+    def _checkpoint(self):
+        """暂停时等待继续，返回是否继续填写"""
+        control = self.control
+        if control is None:
+            return True
+        if control.paused and not control.cancelled:
+            self.log("填表已暂停，继续后从下一行开始填写")
+            control.checkpoint()
+            if not control.cancelled:
+                self.log("继续填表")
+        if control.cancelled:
+            if not self.cancelled:
+                self.log("填表已取消")
+            self.cancelled = True
+            return False
+        return True
+
+    def _complete(self, journal_key, result, ok, status=None, duration_ms=None):
+        """记录一个单元格的结果：成功时记入进度日志"""
+        if ok and self.journal is not None:
+            self.journal.record(*journal_key)
+        return self._emit(result._replace(status=status or (FILLED if ok else FAILED)), duration_ms)
+
+    def _complete_all(self, pending, results):
+        """记录一批单元格的结果（results与pending一一对应）"""
+        for (journal_key, result), ok in zip(pending, results):
+            yield self._complete(journal_key, result, ok)
+
+    def _fill_element(self, element_type, web_element, value, row_index, excel_field):
+        """逐个填写单个网页元素
+
+        Args:
+            element_type (str): 元素类型（input、select、textarea）
+            web_element (dict): 元素标识符
+            value: 要填写的值
+            row_index (int): 表格行索引
+            excel_field (str): Excel字段名（用于日志）
+
+        Returns:
+            bool: 是否填写成功
+        """
+        try:
+            if element_type == 'input':
+                return self.automator.fill_input(web_element, value, row_index)
+            elif element_type == 'select':
+                return self.automator.select_option(web_element, value, row_index)
+            elif element_type == 'textarea':
+                return self.automator.fill_textarea(web_element, value, row_index)
+            else:
+                self.log(f"警告: 不支持的元素类型 {element_type}", 'warn')
+        except Exception as e:
+            self.log(f"填入 {excel_field} 时出错: {e}", 'error')
+            self.log("继续处理下一个字段...")
+            # 出错时不退出，继续处理下一个字段
+        return False
+
+    def _fill_concurrent_cells(self, table_id, cells):
+        """并发写入一批单元格，返回与cells一一对应的填写结果"""
+        start = time.perf_counter()
+        results = self.automator.fill_cells(cells, self.concurrency)
+        if self.verbose:
+            logger.debug("并发写入 %s 个单元格", len(cells), extra={
+                'table': table_id, 'duration_ms': round((time.perf_counter() - start) * 1000, 2)})
+        return results
+
+    def _fill_bulk_cells(self, table_id, cells, fallbacks):
+        """批量填写一个表格的单元格，失败的单元格回退到逐个填写
+
+        Args:
+            table_id (str): 表格id
+            cells (list): (row_index, column, value, element_type) 元组列表
+            fallbacks (list): 与cells对应的 (element_type, web_element, value, row_index, excel_field) 元组列表
+
+        Returns:
+            list: 与cells一一对应的最终填写结果（包括逐个重新填写的结果）
+        """
+        self.log(f"批量填写表格 {table_id} 的 {len(cells)} 个单元格...")
+        start = time.perf_counter()
+        results = list(self.automator.fill_table_bulk(table_id, cells))
+        logger.debug("批量填写 %s 个单元格", len(cells), extra={
+            'table': table_id, 'duration_ms': round((time.perf_counter() - start) * 1000, 2)})
+        failed = [position for position, ok in enumerate(results) if not ok]
+        self.log(f"批量填写完成: 成功 {len(cells) - len(failed)} 个，失败 {len(failed)} 个", 'warn' if failed else 'info')
+
+        if failed:
+            self.log(f"对 {len(failed)} 个失败的单元格逐个重新填写...")
+            for position in failed:
+                results[position] = self._fill_element(*fallbacks[position])
+        return results
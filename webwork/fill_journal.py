@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填表进度日志模块，记录已完成的单元格写入，用于中断后继续填表
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from log_writer import get_logger
+
+logger = get_logger('fill_journal')
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA1
+
+    Args:
+        file_path (str): 文件路径
+        chunk_size (int): 每次读取的字节数
+
+    Returns:
+        str: 十六进制的SHA1值
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class FillJournal:
+    """填表进度日志
+
+    只追加写入已确认完成的 (table_id, row, field) 记录，按Excel文件内容和网页URL区分。
+    写入先进入文件缓冲区，每flush_every条或每flush_interval秒才执行一次fsync，
+    以便在填表循环中低开销地调用。
+    """
+
+    def __init__(self, journal_dir, excel_file, url, resume=False, flush_every=50, flush_interval=1.0):
+        """初始化FillJournal
+
+        Args:
+            journal_dir (str): 进度日志目录
+            excel_file (str): Excel文件路径
+            url (str): 网页URL
+            resume (bool): 是否继续上次的进度（False表示清空上次的进度重新开始）
+            flush_every (int): 每多少条记录执行一次fsync
+            flush_interval (float): 距上次fsync超过多少秒时执行fsync
+        """
+        if not os.path.exists(journal_dir):
+            os.makedirs(journal_dir)
+        key = hashlib.sha1(f"{file_hash(excel_file)}\n{url}".encode('utf-8')).hexdigest()
+        self.path = os.path.join(journal_dir, f"{key}.journal")
+        self.resume = resume
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.completed = set()
+        if resume:
+            self._load()
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def _load(self):
+        """加载已完成的记录
+
+        中断时写了一半的最后一行会从文件中截掉，之后追加的记录从新的一行开始
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+            logger.warning(f"填表进度的最后一行不完整，已忽略: {data[end:]!r}")
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            try:
+                table_id, row, field = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            self.completed.add((table_id, row, field))
+        logger.info(f"已加载填表进度: {len(self.completed)} 个已完成的单元格")
+
+    def is_done(self, table_id, row, field):
+        """判断单元格是否已经完成"""
+        return (table_id, row, field) in self.completed
+
+    def record(self, table_id, row, field):
+        """记录一个已完成的单元格"""
+        key = (table_id, row, field)
+        if key in self.completed:
+            return
+        self.completed.add(key)
+        self._file.write(json.dumps(key, ensure_ascii=False) + '\n')
+        self._pending += 1
+        if self._pending >= self.flush_every or time.time() - self._last_sync >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的记录写入磁盘"""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        """写入剩余记录并关闭文件"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填表计划模块，把配置中的field_mappings预先编译为每个字段的取值器
+
+编译时完成所有与行无关的判断和查找（默认值、Brand到oem_type索引的映射、
+Excel列索引、元素定位信息等），填表循环中每个字段只需要调用一次取值器。
+Discount值在取值时才获取：流式读取时Discount行在数据之后，还没有读到时取值器返回PENDING，
+由填表引擎在读取结束后重新取值，其他单元格不需要等待读取结束。
+"""
+
+import hashlib
+import json
+
+# 取值器返回SKIP表示跳过该字段（原因已通过log输出）
+SKIP = object()
+# Discount值还没有读到（discount函数返回PENDING时，取值器也返回PENDING，读取结束后重新取值）
+PENDING = object()
+
+# 取值器的调用方式: resolve(row, log, verbose)。log(message, level)输出日志；verbose为False时
+# 不生成取值说明（info级别的文本不格式化），只输出警告
+
+# Excel中的Brand值到oem_type的映射
+BRAND_MAPPING = {
+    'LOCAL BRAND': 'Compatible',
+    'OEM': 'OEM',
+    'GENUINE': 'Genuine'
+}
+
+
+def is_bulk_cell(web_element, element_type):
+    """判断字段是否可以按表格批量填写（或批量读取当前值）
+
+    只有按表格列号定位（且未指定其他定位方式）的input/select/textarea元素才可以
+    """
+    if element_type not in ('input', 'select', 'textarea'):
+        return False
+    if 'table_column' not in web_element or 'table_identifier' not in web_element:
+        return False
+    return not any(key in web_element for key in ('id', 'class_name', 'text', 'xpath', 'css_selector'))
+
+
+def triggers_callback(field_mapping):
+    """判断字段写入后是否会触发DevExpress回调
+
+    字段映射中的callback优先，未配置时select元素视为会触发回调
+
+    Args:
+        field_mapping (dict): 字段映射
+
+    Returns:
+        bool: 是否会触发回调
+    """
+    callback = field_mapping.get('callback')
+    if callback is not None:
+        return bool(callback)
+    return field_mapping.get('element_type', 'input') == 'select'
+
+
+def journal_field(excel_field, web_element):
+    """进度日志中的字段名：Excel字段名加元素标识符的摘要
+
+    不使用字段映射在配置中的序号，中断后增加、删除或调整字段映射的顺序时，
+    已记录的单元格仍然对应原来的字段
+    """
+    element = json.dumps(web_element, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{excel_field}:{hashlib.sha1(element.encode('utf-8')).hexdigest()[:12]}"
+
+
+class ConstantResolver:
+    """使用固定值（默认值）"""
+
+    __slots__ = ('value', 'message')
+
+    def __init__(self, value, message):
+        self.value = value
+        self.message = message
+
+    def __call__(self, row, log, verbose):
+        if verbose:
+            log(self.message)
+        return self.value
+
+
+class SkipResolver:
+    """总是跳过该字段（配置无法得到值）"""
+
+    __slots__ = ('message',)
+
+    def __init__(self, message):
+        self.message = message
+
+    def __call__(self, row, log, verbose):
+        log(self.message, 'warn')
+        return SKIP
+
+
+class DiscountResolver:
+    """使用Discount值，没有Discount值时交给fallback（没有fallback时跳过）"""
+
+    __slots__ = ('excel_field', 'discount', 'fallback')
+
+    def __init__(self, excel_field, discount, fallback=None):
+        self.excel_field = excel_field
+        self.discount = discount
+        self.fallback = fallback
+
+    def __call__(self, row, log, verbose):
+        discount = self.discount()
+        if discount is PENDING:
+            return PENDING
+        if discount is not None:
+            if verbose:
+                log(f"使用Discount值: {discount} 填入字段 {self.excel_field}")
+            return discount
+        if self.fallback is not None:
+            return self.fallback(row, log, verbose)
+        log("警告: 配置使用Discount值，但未找到Discount值", 'warn')
+        return SKIP
+
+
+class ExcelResolver:
+    """使用Excel中的值，值为空或缺少该列时使用discount值"""
+
+    __slots__ = ('excel_field', 'column', 'discount')
+
+    def __init__(self, excel_field, column, discount):
+        self.excel_field = excel_field
+        self.column = column
+        self.discount = discount
+
+    def __call__(self, row, log, verbose):
+        column = self.column
+        if column is None or not row.has(column):
+            # 如果Excel中缺少字段，尝试使用discount值
+            discount = self.discount()
+            if discount is PENDING:
+                return PENDING
+            if discount is not None:
+                if verbose:
+                    log(f"Excel中缺少字段 {self.excel_field}，使用discount值: {discount} 填入字段 {self.excel_field}")
+                return discount
+            log(f"警告: Excel中缺少字段 {self.excel_field}，且未配置discount值", 'warn')
+            return SKIP
+        value = row.at(column)
+        if value is None:
+            # 如果Excel中值为None，尝试使用discount值
+            discount = self.discount()
+            if discount is PENDING:
+                return PENDING
+            if discount is not None:
+                if verbose:
+                    log(f"Excel值为None，使用discount值: {discount} 填入字段 {self.excel_field}")
+                return discount
+            log(f"警告: Excel中字段 {self.excel_field} 的值为None", 'warn')
+            return SKIP
+        return self.convert(value, log, verbose)
+
+    def convert(self, value, log, verbose):
+        """转换Excel中的非空值"""
+        if verbose:
+            log(f"使用Excel值: {value} 填入字段 {self.excel_field}")
+        return value
+
+
+class BrandResolver(ExcelResolver):
+    """Brand列：把Excel中的Brand值转换为oem_type列表中的索引"""
+
+    __slots__ = ('brand_indexes',)
+
+    def __init__(self, excel_field, column, discount, oem_type_list):
+        super().__init__(excel_field, column, discount)
+        # 预先计算 {Brand值: (oem_type索引, oem_type值)}，找不到oem_type时索引为None
+        self.brand_indexes = {}
+        for brand, oem_value in BRAND_MAPPING.items():
+            index = oem_type_list.index(oem_value) if oem_value in oem_type_list else None
+            self.brand_indexes[brand] = (index, oem_value)
+
+    def convert(self, value, log, verbose):
+        try:
+            oem_index, oem_value = self.brand_indexes[value]
+        except (KeyError, TypeError):
+            log(f"警告: 未知的Brand值: {value}", 'warn')
+            return SKIP
+        if oem_index is None:
+            log(f"警告: 未找到对应的oem_type值: {oem_value}", 'warn')
+            return SKIP
+        if verbose:
+            log(f"使用Excel值: {value} 填入字段 {self.excel_field}")
+            log(f"转换为oem_type索引: {oem_index} ({oem_value})")
+        return oem_index
+
+
+class FieldPlan:
+    """一个字段映射的编译结果"""
+
+    __slots__ = ('index', 'excel_field', 'element_type', 'web_element', 'resolve',
+                 'callback', 'bulk', 'journal_field', '_bound')
+
+    def __init__(self, index, field_mapping, resolve):
+        """初始化FieldPlan
+
+        Args:
+            index (int): 字段映射在配置中的序号
+            field_mapping (dict): 字段映射配置
+            resolve: 取值器，resolve(row, log, verbose) 返回要填写的值、SKIP或PENDING
+        """
+        self.index = index
+        self.excel_field = field_mapping.get('excel_field')
+        self.element_type = field_mapping.get('element_type', 'input')
+        self.web_element = field_mapping.get('web_element') or {}
+        self.resolve = resolve
+        self.callback = triggers_callback(field_mapping)
+        self.bulk = is_bulk_cell(self.web_element, self.element_type)
+        self.journal_field = journal_field(self.excel_field, self.web_element)  # 进度日志中的字段名
+        self._bound = {}
+
+    def element_for(self, table_identifier):
+        """返回替换了table_identifier的元素标识符（每个表格只生成一次）"""
+        if table_identifier is None or 'table_identifier' not in self.web_element:
+            return self.web_element
+        element = self._bound.get(table_identifier)
+        if element is None:
+            element = dict(self.web_element, table_identifier=table_identifier)
+            self._bound[table_identifier] = element
+        return element
+
+
+def make_resolver(field_mapping, columns, discount, oem_type_list, static_discount=False):
+    """按原来逐行判断的顺序，为一个字段映射选择取值器
+
+    Args:
+        discount: 返回Discount值的函数（没有Discount值时返回None，还没有读到时返回PENDING）
+        static_discount: Discount值是否已经确定（确定时在编译时决定是否使用Discount值）
+    """
+    excel_field = field_mapping.get('excel_field')
+    default_value = field_mapping.get('default_value')
+    placeholder = default_value == "{{discount}}"
+
+    # 首先检查是否需要使用Discount值
+    if static_discount:
+        # Discount值已经确定，在编译时决定是否使用
+        value = discount()
+        if value is not None and (placeholder or excel_field == "Discount"):
+            return ConstantResolver(value, f"使用Discount值: {value} 填入字段 {excel_field}")
+        if placeholder:
+            return SkipResolver("警告: 配置使用Discount值，但未找到Discount值")
+    elif placeholder:
+        return DiscountResolver(excel_field, discount)
+    # 其次检查是否有默认值
+    if default_value is not None:
+        resolver = ConstantResolver(default_value, f"使用默认值: {default_value} 填入字段 {excel_field}")
+    # excel_field为空，无法从Excel中获取值
+    elif not excel_field:
+        resolver = SkipResolver("警告: excel_field为空，且未配置默认值")
+    elif excel_field == 'Brand':
+        resolver = BrandResolver(excel_field, columns.get(excel_field), discount, oem_type_list)
+    else:
+        resolver = ExcelResolver(excel_field, columns.get(excel_field), discount)
+    # Discount字段有Discount值时优先使用Discount值
+    if excel_field == "Discount" and not static_discount:
+        return DiscountResolver(excel_field, discount, resolver)
+    return resolver
+
+
+def compile_plan(config, columns, discount):
+    """把配置中的field_mappings编译为FieldPlan列表
+
+    Args:
+        config (dict): 配置内容
+        columns (dict): Excel的 {表头: 列索引}（ExcelReader.columns）
+        discount: Discount值（None表示没有），或返回Discount值的函数（取值时才调用，
+            用于流式读取；Discount行还没有读到时返回PENDING）
+
+    Returns:
+        list: FieldPlan列表，顺序与field_mappings一致
+    """
+    oem_type_list = config.get('excel_config', {}).get('oem_type', [])
+    static_discount = not callable(discount)
+    if static_discount:
+        discount_value = discount
+        discount = lambda: discount_value
+    return [
+        FieldPlan(index, field_mapping, make_resolver(field_mapping, columns, discount, oem_type_list, static_discount))
+        for index, field_mapping in enumerate(config.get('field_mappings', []))
+    ]
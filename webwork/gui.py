@@ -11,10 +11,23 @@ from tkinter import filedialog, messagebox, scrolledtext
 import subprocess
 import sys
 import os
+import queue
+import threading
+from collections import namedtuple
+from log_writer import LogWriter, get_logger, log_message
+from preload import preload_modules
+
+# 输出窗口的日志级别：(级别, 复选框文本, 文字颜色)
+OUTPUT_LEVELS = (("info", "信息", None), ("warn", "警告", "#E65100"), ("error", "错误", "#D32F2F"))
+
+# 输出队列中的一条日志：文本和级别（info、warn、error）
+OutputLine = namedtuple('OutputLine', ['text', 'level'])
 
 class ExcelWebFillerGUI:
     """Excel内容自动填入网页工具的GUI界面"""
     
+    PROFILE_FROM_CONFIG = "按配置文件"  # 执行模式选项：使用配置文件中的browser_config.profile
+    
     def __init__(self, root):
         """初始化GUI界面
         
@@ -40,6 +53,7 @@ class ExcelWebFillerGUI:
         self.create_start_button()
         
         # 创建输出窗口
+        self.max_output_lines = 5000  # 输出窗口最多保留的行数（完整日志只写入日志文件）
         self.create_output_window()
         
         # 初始化文件路径和URL
@@ -47,20 +61,115 @@ class ExcelWebFillerGUI:
         self.config_file = ""
         self.url = ""
         self.automator = None
-        self.log_buffer = []  # 日志缓冲区
-        self.buffer_size = 100  # 缓冲区大小
-        self.last_update_time = 0  # 上次更新时间
-        self.update_interval = 0.5  # 更新间隔（秒）
+        self.events = None  # 网页自动化的事件缓冲区（多次连接共用，连接前订阅）
+        self.browser_session = None  # 浏览器会话（多次连接共用；配置了prewarm时启动后在后台预先启动浏览器）
+        self.session_lock = threading.Lock()
+        self.parse_cache = None  # Excel解析结果缓存（导入验证和填表共用）
         self.log_file = self._init_log_file()  # 初始化日志文件
+        # 日志由后台线程写入日志文件（JSONL），界面和工作线程只把记录放入队列
+        self.log_writer = self._start_log_writer()
+        self.logger = get_logger('gui')
+        self.output_queue = queue.Queue()  # 工作线程提交的日志文本和界面操作，由主线程定时处理
+        self.pump_interval = 50  # 处理output_queue的间隔（毫秒）
+        self.pump_batch = 2000  # 每次最多处理的条数
+        self.task_thread = None  # 正在执行任务的工作线程
+        self.fill_control = None  # 当前填表的暂停/取消控制
+        self.root.after(self.pump_interval, self._pump_output)
+        # 窗口显示之后在后台导入Playwright和openpyxl等较慢的模块，点击按钮时不再等待导入
+        self.root.after(200, preload_modules)
+        # 配置文件中启用了browser_config.prewarm时，用户选择文件期间在后台启动浏览器
+        self.root.after(300, self.prewarm_browser)
+    
+    def _get_app_dir(self):
+        """获取程序所在目录（打包后为可执行文件所在目录）"""
+        if getattr(sys, 'frozen', False):
+            return os.path.dirname(os.path.abspath(sys.executable))
+        return os.path.dirname(os.path.abspath(__file__))
     
-    def set_button_states(self, connect_state=None, fill_state=None, screenshot_state=None):
-        """统一设置按钮状态
+    def prewarm_browser(self):
+        """在后台线程中预先启动浏览器（只在配置文件中browser_config.prewarm为true时启动）"""
+        threading.Thread(target=self._prewarm_browser_task, args=(self.profile_var.get(),),
+                         name='BrowserPrewarm', daemon=True).start()
+    
+    def _prewarm_browser_task(self, profile):
+        """预先启动浏览器（在后台线程中执行）
+        
+        Args:
+            profile (str): 界面选择的执行模式（PROFILE_FROM_CONFIG表示使用配置文件中的设置）
+        """
+        import json
+        # 读取已选择的配置文件或默认配置文件（读取失败时使用默认设置）
+        config = {}
+        config_paths = [self.config_file] if self.config_file else [
+            os.path.join(directory, "cfg", "default.json")
+            for directory in (self._get_app_dir(), os.path.dirname(os.path.abspath(__file__)), os.getcwd())]
+        for config_path in config_paths:
+            if os.path.exists(config_path):
+                try:
+                    with open(config_path, 'r', encoding='utf-8') as f:
+                        config = json.load(f)
+                except Exception as e:
+                    self.logger.warning(f"预先启动浏览器时读取配置文件失败: {e}")
+                break
+        browser_config = config.get('browser_config', {})
+        # 默认不预先启动：执行模式和连接方式以配置文件为准，避免启动之后又因设置不同而关闭
+        if not browser_config.get('prewarm', False):
+            return
+        if profile == self.PROFILE_FROM_CONFIG:
+            profile = browser_config.get('profile', 'demo')
+        try:
+            self._get_browser_session(profile, browser_config.get('cdp_port'))
+        except Exception as e:
+            self.append_output(f"预先启动浏览器失败: {e}\n", 'warn')
+    
+    def _get_browser_session(self, profile, cdp_port=None):
+        """返回执行模式和连接方式相同的浏览器会话，没有时新建并在后台启动浏览器（可以在任意线程中调用）
+        
+        Args:
+            profile (str): 执行模式
+            cdp_port (int): 已运行浏览器的远程调试端口（None表示启动新的浏览器）
+        
+        Returns:
+            BrowserSession: 浏览器会话（浏览器可能还在启动中）
+        """
+        from web_automator import BrowserSession, EXECUTION_PROFILES
+        with self.session_lock:
+            session = self.browser_session
+            if (session is None or session.profile != (profile if profile in EXECUTION_PROFILES else 'demo')
+                    or session.cdp_port != cdp_port):
+                if session is not None:
+                    self.append_output(f"执行模式或连接方式已修改，重新启动或连接浏览器\n")
+                    # 关闭之前的浏览器、Playwright和事件循环线程，不留在后台运行
+                    session.stop()
+                session = BrowserSession(profile, log=lambda message, level='info': self.append_output(f"{message}\n", level),
+                                         cdp_port=cdp_port)
+                self.browser_session = session
+            # 浏览器已启动时不做任何操作；启动失败或已被关闭时重新启动
+            session.start()
+            return session
+    
+    def _get_parse_cache(self):
+        """获取Excel解析结果缓存，解析结果同时保存到程序目录的cache文件夹"""
+        if self.parse_cache is None:
+            from excel_reader import ParseCache
+            self.parse_cache = ParseCache(cache_dir=os.path.join(self._get_app_dir(), "cache"))
+        return self.parse_cache
+    
+    def set_button_states(self, connect_state=None, fill_state=None, screenshot_state=None, control_state=None):
+        """统一设置按钮状态（可以在工作线程中调用，会交给主线程执行）
         
         Args:
             connect_state: 连接按钮状态（None表示不改变）
             fill_state: 填表按钮状态（None表示不改变）
             screenshot_state: 截图按钮状态（None表示不改变）
+            control_state: 暂停和取消按钮状态（None表示不改变）
         """
+        if threading.current_thread() is not threading.main_thread():
+            self._run_in_ui(self.set_button_states, connect_state, fill_state, screenshot_state, control_state)
+            return
+        if control_state is not None:
+            self.pause_button.config(state=control_state, text="暂停")
+            self.cancel_button.config(state=control_state)
         if connect_state is not None:
             self.connect_button.config(state=connect_state)
         if fill_state is not None:
@@ -68,6 +177,43 @@ class ExcelWebFillerGUI:
         if screenshot_state is not None:
             self.screenshot_button.config(state=screenshot_state)
     
+    def _run_in_ui(self, func, *args):
+        """在主线程中执行界面操作（工作线程中调用时放入队列，由_pump_output执行）"""
+        if threading.current_thread() is threading.main_thread():
+            func(*args)
+        else:
+            self.output_queue.put((func, args))
+    
+    def _show_error(self, title, message):
+        """显示错误对话框（可以在工作线程中调用）"""
+        self._run_in_ui(messagebox.showerror, title, message)
+    
+    def _show_warning(self, title, message):
+        """显示警告对话框（可以在工作线程中调用）"""
+        self._run_in_ui(messagebox.showwarning, title, message)
+    
+    def _show_info(self, title, message):
+        """显示提示对话框（可以在工作线程中调用）"""
+        self._run_in_ui(messagebox.showinfo, title, message)
+    
+    def _start_task(self, target, *args):
+        """在工作线程中执行任务（同一时间只执行一个任务），界面在任务执行期间保持响应
+        
+        Args:
+            target: 任务函数
+            *args: 任务函数的参数
+            
+        Returns:
+            bool: 是否已开始执行（已有任务在执行时返回False）
+        """
+        if self.task_thread is not None and self.task_thread.is_alive():
+            self.append_output("请等待当前任务完成\n")
+            return False
+        
+        self.task_thread = threading.Thread(target=target, args=args, name=target.__name__, daemon=True)
+        self.task_thread.start()
+        return True
+    
     def _process_url(self, url, config_file):
         """处理URL，支持相对路径
         
@@ -117,7 +263,7 @@ class ExcelWebFillerGUI:
         return 'file://' + file_url
     
     def _init_log_file(self):
-        """初始化日志文件
+        """选择日志文件路径（logs目录下，按时间命名的JSONL文件）
         
         Returns:
             str: 日志文件路径
@@ -183,38 +329,25 @@ class ExcelWebFillerGUI:
             if not os.path.exists(logs_dir):
                 os.makedirs(logs_dir)
         
-        # 生成日志文件名（基于当前时间）
+        # 生成日志文件名（基于当前时间），每行一条JSON记录
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = os.path.join(logs_dir, f"excel_web_filler_{timestamp}.log")
-        
-        # 写入日志文件头
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write(f"=== Excel Web Filler 日志文件 ===\n")
-                f.write(f"创建时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"日志文件: {log_file}\n")
-                f.write("==================================\n\n")
-        except Exception as e:
-            print(f"创建日志文件失败: {e}")
-            # 如果创建失败，使用临时文件
-            log_file = os.path.join(tempfile.gettempdir(), f"excel_web_filler_{timestamp}.log")
-            try:
-                with open(log_file, 'w', encoding='utf-8') as f:
-                    f.write(f"=== Excel Web Filler 日志文件 ===\n")
-                    f.write(f"创建时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"日志文件: {log_file}\n")
-                    f.write(f"使用临时目录，因为其他目录不可写\n")
-                    f.write(f"创建日志文件失败: {e}\n")
-                    f.write("==================================\n\n")
-            except:
-                # 如果临时文件也失败，返回空字符串
-                return ""
+        log_file = os.path.join(logs_dir, f"excel_web_filler_{timestamp}.jsonl")
         
         # 打印日志文件路径，方便调试
         print(f"日志文件路径: {log_file}")
         
         return log_file
     
+    def _start_log_writer(self):
+        """启动日志写入线程（日志文件无法打开时返回None，只在界面中显示日志）"""
+        if not self.log_file:
+            return None
+        try:
+            return LogWriter(self.log_file)
+        except Exception as e:
+            print(f"创建日志文件失败: {e}")
+            return None
+    
     def create_file_selection(self):
         """创建文件选择部分"""
         file_frame = tk.Frame(self.main_frame)
@@ -249,6 +382,27 @@ class ExcelWebFillerGUI:
         
         config_button = tk.Button(file_frame, text="配置", command=self.open_config_dialog, font=self.font)
         config_button.grid(row=2, column=2, padx=10, pady=5)
+        
+        # 执行模式选择（demo显示浏览器并放慢操作，turbo无头快速运行）
+        profile_label = tk.Label(file_frame, text="执行模式:", font=self.font)
+        profile_label.grid(row=3, column=0, sticky=tk.W, pady=5)
+        
+        self.profile_var = tk.StringVar(value=self.PROFILE_FROM_CONFIG)
+        profile_menu = tk.OptionMenu(file_frame, self.profile_var, self.PROFILE_FROM_CONFIG, "demo", "turbo")
+        profile_menu.config(font=self.font)
+        profile_menu.grid(row=3, column=1, sticky=tk.W, pady=5)
+        
+        # 增量填写：只写入与网页当前值不同的单元格（适合修改Excel后重新填表）
+        self.incremental_var = tk.BooleanVar(value=False)
+        incremental_check = tk.Checkbutton(file_frame, text="只填写有变化的单元格",
+                                           variable=self.incremental_var, font=self.font)
+        incremental_check.grid(row=3, column=1, sticky=tk.E, pady=5)
+        
+        # 断点续填：跳过上次中断前已完成的单元格（同一Excel文件和网页）
+        self.resume_var = tk.BooleanVar(value=False)
+        resume_check = tk.Checkbutton(file_frame, text="断点续填",
+                                      variable=self.resume_var, font=self.font)
+        resume_check.grid(row=4, column=1, sticky=tk.E, pady=5)
     
     def create_start_button(self):
         """创建启动按钮"""
@@ -273,23 +427,55 @@ class ExcelWebFillerGUI:
                                       bg="#FF9800", fg="white", 
                                       height=2, width=15, state=tk.DISABLED)
         self.screenshot_button.pack(side=tk.LEFT, padx=10)
+        
+        # 填表过程中的暂停/继续和取消（在当前行填写完成后生效）
+        self.pause_button = tk.Button(button_frame, text="暂停", command=self.toggle_pause, 
+                                   font=(self.font[0], self.font[1], "bold"), 
+                                   bg="#607D8B", fg="white", 
+                                   height=2, width=8, state=tk.DISABLED)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_button = tk.Button(button_frame, text="取消", command=self.cancel_fill, 
+                                    font=(self.font[0], self.font[1], "bold"), 
+                                    bg="#f44336", fg="white", 
+                                    height=2, width=8, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
     
     def create_output_window(self):
         """创建输出窗口"""
         output_frame = tk.Frame(self.main_frame)
         output_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
-        output_label = tk.Label(output_frame, text="执行输出:", font=self.font)
-        output_label.pack(anchor=tk.W)
+        header_frame = tk.Frame(output_frame)
+        header_frame.pack(fill=tk.X)
+        
+        output_label = tk.Label(header_frame, text=f"执行输出（最近{self.max_output_lines}行，完整日志见日志文件）:", 
+                                font=self.font)
+        output_label.pack(side=tk.LEFT)
         
         self.output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, 
                                                    font=("Courier New", 9), 
                                                    height=15)
         self.output_text.pack(fill=tk.BOTH, expand=True)
         
+        # 按日志级别显示/隐藏（通过文本标签的elide属性，不需要重新插入文本）
+        self.level_vars = {}
+        for level, text, color in reversed(OUTPUT_LEVELS):
+            if color:
+                self.output_text.tag_configure(level, foreground=color)
+            var = tk.BooleanVar(value=True)
+            self.level_vars[level] = var
+            level_check = tk.Checkbutton(header_frame, text=text, variable=var, font=self.font, 
+                                         command=lambda level=level: self.toggle_output_level(level))
+            level_check.pack(side=tk.RIGHT)
+        
         # 禁止编辑输出窗口
         self.output_text.config(state=tk.DISABLED)
     
+    def toggle_output_level(self, level):
+        """显示或隐藏某个级别的日志"""
+        self.output_text.tag_configure(level, elide=not self.level_vars[level].get())
+    
     def browse_excel(self):
         """浏览选择Excel文件"""
         file_path = filedialog.askopenfilename(
@@ -300,8 +486,8 @@ class ExcelWebFillerGUI:
             self.excel_var.set(file_path)
             self.excel_file = file_path
             
-            # 立即验证Excel文件格式
-            self.validate_excel_format(file_path)
+            # 立即在工作线程中验证Excel文件格式
+            self._start_task(self.validate_excel_format, file_path)
     
     def validate_excel_format(self, excel_file):
         """验证Excel文件格式
@@ -316,7 +502,8 @@ class ExcelWebFillerGUI:
             self.append_output(f"正在验证Excel文件格式: {excel_file}\n")
             
             # 创建ExcelReader实例，使用默认配置
-            reader = ExcelReader(excel_file, header_row=16, start_row=17, end_row=None)
+            reader = ExcelReader(excel_file, header_row=16, start_row=17, end_row=None,
+                                 cache=self._get_parse_cache())
             
             # 尝试读取数据（这会触发表头验证）
             data, discount = reader.read_data()
@@ -329,18 +516,14 @@ class ExcelWebFillerGUI:
         except ValueError as ve:
             # 表头验证失败
             error_msg = f"Excel文件格式验证失败: {ve}\n"
-            self.append_output(error_msg)
-            self.flush_log_buffer()  # 强制刷新日志缓冲区
-            self.root.update()  # 强制更新GUI界面
-            messagebox.showerror("Excel格式验证错误", str(ve))
+            self.append_output(error_msg, 'error')
+            self._show_error("Excel格式验证错误", str(ve))
         except Exception as e:
             # 其他错误
             error_msg = f"验证Excel文件时出错: {e}\n"
-            self.append_output(error_msg)
-            self.append_output(f"错误详情: {traceback.format_exc()}\n")
-            self.flush_log_buffer()  # 强制刷新日志缓冲区
-            self.root.update()  # 强制更新GUI界面
-            messagebox.showerror("错误", f"验证Excel文件时出错: {e}")
+            self.append_output(error_msg, 'error')
+            self.append_output(f"错误详情: {traceback.format_exc()}\n", 'error')
+            self._show_error("错误", f"验证Excel文件时出错: {e}")
     
     def browse_config(self):
         """浏览选择配置文件"""
@@ -483,7 +666,9 @@ class ExcelWebFillerGUI:
                 self.connect_button.config(state=tk.NORMAL)
                 self.fill_button.config(state=tk.DISABLED)
                 
-                # 重置automator对象
+                # 重置automator对象（关闭之前连接打开的页面）
+                if self.automator is not None:
+                    self.automator.release()
                 self.automator = None
                 
                 messagebox.showinfo("成功", "配置文件加载成功")
@@ -532,16 +717,23 @@ class ExcelWebFillerGUI:
         # 禁用所有按钮
         self.set_button_states(connect_state=tk.DISABLED, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
         
-        # 执行连接命令
-        self.execute_connect()
+        # 在工作线程中执行连接命令（执行模式在主线程中读取）
+        if not self._start_task(self.execute_connect, self.profile_var.get()):
+            self.set_button_states(connect_state=tk.NORMAL)
     
-    def execute_connect(self):
-        """执行连接网页命令"""
+    def execute_connect(self, profile):
+        """执行连接网页命令（在工作线程中执行）
+        
+        Args:
+            profile (str): 界面选择的执行模式（PROFILE_FROM_CONFIG表示使用配置文件中的设置）
+        """
         try:
             self.append_output("开始连接到网页...\n")
             
             # 导入WebAutomator
             from web_automator import WebAutomator
+            from selector_cache import SelectorCache
+            from event_buffer import EventBuffer
             self.append_output("WebAutomator模块导入成功\n")
             
             # 导入json和os
@@ -555,9 +747,9 @@ class ExcelWebFillerGUI:
             # 如果用户指定了配置文件，使用用户指定的
             if self.config_file:
                 if not os.path.exists(self.config_file):
-                    self.append_output(f"配置文件不存在: {self.config_file}\n")
-                    messagebox.showerror("错误", f"配置文件不存在: {self.config_file}")
-                    self.connect_button.config(state=tk.NORMAL)
+                    self.append_output(f"配置文件不存在: {self.config_file}\n", 'error')
+                    self._show_error("错误", f"配置文件不存在: {self.config_file}")
+                    self.set_button_states(connect_state=tk.NORMAL)
                     return
                 
                 try:
@@ -565,8 +757,8 @@ class ExcelWebFillerGUI:
                         config = json.load(f)
                     self.append_output(f"使用用户指定的配置文件: {self.config_file}\n")
                 except Exception as e:
-                    self.append_output(f"读取配置文件失败: {e}\n")
-                    messagebox.showerror("错误", f"读取配置文件失败: {e}")
+                    self.append_output(f"读取配置文件失败: {e}\n", 'error')
+                    self._show_error("错误", f"读取配置文件失败: {e}")
                     self.set_button_states(connect_state=tk.NORMAL, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
                     return
             else:
@@ -608,43 +800,63 @@ class ExcelWebFillerGUI:
                             self.append_output(f"使用默认配置文件: {default_config_path}\n")
                             config_file_found = True
                             # 更新主界面的配置文件路径
-                            self.config_var.set(default_config_path)
+                            self._run_in_ui(self.config_var.set, default_config_path)
                             self.config_file = default_config_path
                             break
                         except Exception as e:
-                            self.append_output(f"读取默认配置文件失败: {e}\n")
+                            self.append_output(f"读取默认配置文件失败: {e}\n", 'warn')
                             continue
                 
                 if not config_file_found:
-                    self.append_output("错误: 未找到配置文件\n")
-                    messagebox.showerror("错误", "未找到配置文件，请选择配置文件或在cfg文件夹中放置default.json")
+                    self.append_output("错误: 未找到配置文件\n", 'error')
+                    self._show_error("错误", "未找到配置文件，请选择配置文件或在cfg文件夹中放置default.json")
                     self.set_button_states(connect_state=tk.NORMAL, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
                     return
             
             # 获取URL，优先使用界面输入的URL
             url = self.url if self.url else config.get('url', '')
             if not url:
-                self.append_output("警告: 未提供网页URL\n")
-                messagebox.showwarning("警告", "未提供网页URL")
+                self.append_output("警告: 未提供网页URL\n", 'warn')
+                self._show_warning("警告", "未提供网页URL")
                 self.set_button_states(connect_state=tk.NORMAL, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
                 return
             
             # 处理相对路径
             url = self._process_url(url, self.config_file)
             
+            # 定位策略缓存保存在配置文件旁边，下次运行直接使用成功的定位策略
+            selector_cache_file = os.path.splitext(self.config_file)[0] + '.selectors.json'
+            selector_cache = SelectorCache(selector_cache_file, url, config)
+            
             # 连接到网页
             self.append_output("连接到网页...\n")
             self.append_output(f"使用URL: {url}\n")
-            self.automator = WebAutomator(url)
-            
-            # 显示浏览器启动的日志信息
-            if hasattr(self.automator, 'logs') and self.automator.logs:
-                for log in self.automator.logs:
-                    self.append_output(f"{log}\n")
+            # 执行模式：界面选择优先，否则使用配置文件中的设置
+            if profile == self.PROFILE_FROM_CONFIG:
+                profile = config.get('browser_config', {}).get('profile', 'demo')
+            self.append_output(f"执行模式: {profile}\n")
+            # 浏览器启动和连接过程中的日志通过事件订阅实时显示
+            if self.events is None:
+                self.events = EventBuffer()
+                self.events.subscribe(self._on_automator_event)
+            # 使用预先启动的浏览器（执行模式不同时启动新的浏览器），连接时只打开新页面；
+            # 配置了cdp_port时连接到已运行的浏览器，直接使用已打开的标签页
+            browser_config = config.get('browser_config', {})
+            session = self._get_browser_session(profile, browser_config.get('cdp_port'))
+            # 登录状态文件的相对路径相对于配置文件所在目录
+            storage_state = browser_config.get('storage_state')
+            if storage_state:
+                storage_state = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), storage_state)
+            # 关闭之前连接打开的页面，浏览器中不保留不再使用的标签页和上下文
+            if self.automator is not None:
+                self.automator.release()
+                self.automator = None
+            self.automator = WebAutomator(url, selector_cache=selector_cache, events=self.events,
+                                          session=session, storage_state=storage_state)
             
             if not self.automator.is_connected:
-                self.append_output("错误: 网页连接失败，无法继续执行任务\n")
-                messagebox.showerror("错误", "网页连接失败")
+                self.append_output("错误: 网页连接失败，无法继续执行任务\n", 'error')
+                self._show_error("错误", "网页连接失败")
                 self.set_button_states(connect_state=tk.NORMAL, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
                 return
             self.append_output("网页连接成功\n")
@@ -655,27 +867,68 @@ class ExcelWebFillerGUI:
             self.append_output("现在可以点击'页面截图'按钮进行截图\n")
             
         except Exception as e:
-            self.append_output(f"连接网页时出错: {e}\n")
+            self.append_output(f"连接网页时出错: {e}\n", 'error')
             import traceback
             traceback_str = traceback.format_exc()
-            self.append_output(traceback_str)
-            messagebox.showerror("错误", f"连接网页时出错: {e}")
+            self.append_output(traceback_str, 'error')
+            self._show_error("错误", f"连接网页时出错: {e}")
             self.set_button_states(connect_state=tk.NORMAL, fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
     
+    def _on_automator_event(self, event):
+        """显示网页自动化的日志事件（在发布事件的线程中调用）
+        
+        日志已经由WebAutomator写入日志文件，这里只放入输出队列
+        """
+        if event.kind == "log":
+            self.output_queue.put(OutputLine(event.message + "\n", event.level))
+    
     def fill_table(self):
         """执行填表操作"""
-        # 禁用填表按钮和截图按钮
-        self.set_button_states(fill_state=tk.DISABLED, screenshot_state=tk.DISABLED)
+        from fill_engine import FillControl
+        
+        # 禁用填表按钮和截图按钮，启用暂停和取消按钮
+        self.set_button_states(fill_state=tk.DISABLED, screenshot_state=tk.DISABLED, control_state=tk.NORMAL)
         
-        # 执行填表命令
-        self.execute_fill()
+        # 在工作线程中执行填表命令（界面选项在主线程中读取）
+        self.fill_control = FillControl()
+        if not self._start_task(self.execute_fill, self.incremental_var.get(), self.resume_var.get(),
+                                self.fill_control):
+            self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL, control_state=tk.DISABLED)
+    
+    def toggle_pause(self):
+        """暂停或继续填表（在当前行填写完成后生效）"""
+        control = self.fill_control
+        if control is None or control.cancelled:
+            return
+        if control.paused:
+            control.resume()
+            self.pause_button.config(text="暂停")
+        else:
+            control.pause()
+            self.pause_button.config(text="继续")
+            self.append_output("正在暂停，当前行填写完成后暂停...\n")
+    
+    def cancel_fill(self):
+        """取消填表（在当前行填写完成后停止，已完成的单元格已记入填表进度，可以断点续填）"""
+        control = self.fill_control
+        if control is None or control.cancelled:
+            return
+        control.cancel()
+        self.set_button_states(control_state=tk.DISABLED)
+        self.append_output("正在取消，当前行填写完成后停止...\n")
     
     def take_screenshot(self):
         """执行页面截图操作"""
+        self.set_button_states(screenshot_state=tk.DISABLED)
+        if not self._start_task(self.execute_screenshot):
+            self.set_button_states(screenshot_state=tk.NORMAL)
+    
+    def execute_screenshot(self):
+        """执行页面截图命令（在工作线程中执行）"""
         try:
             if not self.automator:
-                self.append_output("错误: 请先连接到网页\n")
-                messagebox.showerror("错误", "请先连接到网页")
+                self.append_output("错误: 请先连接到网页\n", 'error')
+                self._show_error("错误", "请先连接到网页")
                 return
             
             self.append_output("开始截图...\n")
@@ -698,8 +951,8 @@ class ExcelWebFillerGUI:
                 try:
                     os.makedirs(img_dir)
                 except Exception as e:
-                    self.append_output(f"创建img目录失败: {e}\n")
-                    messagebox.showerror("错误", f"创建img目录失败: {e}")
+                    self.append_output(f"创建img目录失败: {e}\n", 'warn')
+                    self._show_error("错误", f"创建img目录失败: {e}")
                     return
             
             # 生成截图文件名（基于当前时间）
@@ -712,24 +965,34 @@ class ExcelWebFillerGUI:
             if screenshot_path:
                 self.append_output(f"截图成功！\n")
                 self.append_output(f"截图文件路径: {screenshot_path}\n")
-                messagebox.showinfo("成功", f"截图成功！\n截图文件路径: {screenshot_path}")
+                self._show_info("成功", f"截图成功！\n截图文件路径: {screenshot_path}")
             else:
-                self.append_output("截图失败\n")
-                messagebox.showerror("错误", "截图失败")
+                self.append_output("截图失败\n", 'error')
+                self._show_error("错误", "截图失败")
             
         except Exception as e:
-            self.append_output(f"截图时出错: {e}\n")
+            self.append_output(f"截图时出错: {e}\n", 'error')
             import traceback
             traceback_str = traceback.format_exc()
-            self.append_output(traceback_str)
-            messagebox.showerror("错误", f"截图时出错: {e}")
+            self.append_output(traceback_str, 'error')
+            self._show_error("错误", f"截图时出错: {e}")
+        finally:
+            self.set_button_states(screenshot_state=tk.NORMAL)
     
-    def execute_fill(self):
-        """执行填表命令"""
+    def execute_fill(self, incremental=False, resume=False, control=None):
+        """执行填表命令（在工作线程中执行）
+        
+        Args:
+            incremental (bool): 界面是否勾选了只填写有变化的单元格
+            resume (bool): 界面是否勾选了断点续填
+            control (FillControl): 暂停/取消控制
+        """
+        stream = None
+        journal = None
         try:
             if not self.automator:
-                self.append_output("错误: 请先连接到网页\n")
-                messagebox.showerror("错误", "请先连接到网页")
+                self.append_output("错误: 请先连接到网页\n", 'error')
+                self._show_error("错误", "请先连接到网页")
                 self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                 return
             
@@ -737,6 +1000,8 @@ class ExcelWebFillerGUI:
             
             # 导入ExcelReader
             from excel_reader import ExcelReader
+            from fill_engine import FillEngine, LogSink, RowStream
+            from fill_journal import FillJournal
             self.append_output("ExcelReader模块导入成功\n")
             
             # 导入json和os
@@ -751,9 +1016,9 @@ class ExcelWebFillerGUI:
             # 如果用户指定了配置文件，使用用户指定的
             if self.config_file:
                 if not os.path.exists(self.config_file):
-                    self.append_output(f"配置文件不存在: {self.config_file}\n")
-                    messagebox.showerror("错误", f"配置文件不存在: {self.config_file}")
-                    self.fill_button.config(state=tk.NORMAL)
+                    self.append_output(f"配置文件不存在: {self.config_file}\n", 'error')
+                    self._show_error("错误", f"配置文件不存在: {self.config_file}")
+                    self.set_button_states(fill_state=tk.NORMAL)
                     return
                 
                 try:
@@ -761,8 +1026,8 @@ class ExcelWebFillerGUI:
                         config = json.load(f)
                     self.append_output(f"使用用户指定的配置文件: {self.config_file}\n")
                 except Exception as e:
-                    self.append_output(f"读取配置文件失败: {e}\n")
-                    messagebox.showerror("错误", f"读取配置文件失败: {e}")
+                    self.append_output(f"读取配置文件失败: {e}\n", 'error')
+                    self._show_error("错误", f"读取配置文件失败: {e}")
                     self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                     return
             else:
@@ -803,16 +1068,16 @@ class ExcelWebFillerGUI:
                             self.append_output(f"使用默认配置文件: {default_config_path}\n")
                             config_file_found = True
                             # 更新主界面的配置文件路径
-                            self.config_var.set(default_config_path)
+                            self._run_in_ui(self.config_var.set, default_config_path)
                             self.config_file = default_config_path
                             break
                         except Exception as e:
-                            self.append_output(f"读取默认配置文件失败: {e}\n")
+                            self.append_output(f"读取默认配置文件失败: {e}\n", 'warn')
                             continue
                 
                 if not config_file_found:
-                    self.append_output("错误: 未找到配置文件\n")
-                    messagebox.showerror("错误", "未找到配置文件，请选择配置文件或在cfg文件夹中放置default.json")
+                    self.append_output("错误: 未找到配置文件\n", 'error')
+                    self._show_error("错误", "未找到配置文件，请选择配置文件或在cfg文件夹中放置default.json")
                     self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                     return
             
@@ -821,262 +1086,173 @@ class ExcelWebFillerGUI:
             header_row = excel_config.get('header_row', 16)  # 默认表头行
             start_row = excel_config.get('start_row', 17)  # 默认数据开始行
             end_row = excel_config.get('end_row', None)  # 默认结束行
+            backend = excel_config.get('backend', 'openpyxl')  # Excel读取后端（openpyxl或stdlib）
             discount = excel_config.get('discount', None)  # 折扣值
             
-            # 读取Excel数据（Excel文件已经在导入时验证过，这里直接读取）
+            # 获取填表配置（批量填写、并发写入等由填表引擎读取）
+            fill_config = config.get('fill_config', {})
+            incremental = incremental or fill_config.get('incremental', False)  # 是否只写入有变化的单元格
+            resume = resume or fill_config.get('resume', False)  # 是否跳过上次已完成的单元格
+            
+            # 日志级别（debug时输出每个字段的取值和单元格结果）
+            if self.log_writer is not None:
+                self.log_writer.set_level(config.get('log_config', {}).get('level', 'info'))
+            
+            def log(message, level='info'):
+                self.append_output(message + "\n", level)
+            
+            # 读取Excel数据（Excel文件已经在导入时验证过，有缓存时直接使用，否则在后台边读取边填写）
             self.append_output("读取Excel数据...\n")
             try:
-                reader = ExcelReader(self.excel_file, header_row, start_row, end_row)
-                data, excel_discount = reader.read_data()
-                # 如果Excel中找到discount值，优先使用
-                if excel_discount is not None:
-                    discount = excel_discount
-                    self.append_output(f"从Excel中找到Discount值: {discount}\n")
-                self.append_output(f"Excel数据读取成功，共 {len(data)} 行\n")
+                reader = ExcelReader(self.excel_file, header_row, start_row, end_row,
+                                     cache=self._get_parse_cache(), backend=backend)
+                # Excel中找到的Discount值优先于配置中的值
+                stream = RowStream(reader, discount, log=log)
             except ValueError as ve:
                 # 处理表头验证错误（虽然导入时已验证，但可能配置不同）
                 error_msg = f"Excel文件验证失败: {ve}\n"
-                self.append_output(error_msg)
-                self.flush_log_buffer()  # 强制刷新日志缓冲区
-                self.root.update()  # 强制更新GUI界面
-                messagebox.showerror("Excel验证错误", str(ve))
+                self.append_output(error_msg, 'error')
+                self._show_error("Excel验证错误", str(ve))
                 self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                 return
             except Exception as e:
                 # 处理Excel读取错误
                 error_msg = f"读取Excel文件时出错: {e}\n"
-                self.append_output(error_msg)
-                self.append_output(f"错误详情: {traceback.format_exc()}\n")
-                self.flush_log_buffer()  # 强制刷新日志缓冲区
-                self.root.update()  # 强制更新GUI界面
-                messagebox.showerror("错误", f"读取Excel文件时出错: {e}")
+                self.append_output(error_msg, 'error')
+                self.append_output(f"错误详情: {traceback.format_exc()}\n", 'error')
+                self._show_error("错误", f"读取Excel文件时出错: {e}")
                 self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                 return
             
             # 获取满足条件的表格列表
             matching_tables = self.automator.matching_tables
             if not matching_tables:
-                self.append_output("警告: 未找到满足条件的表格，无法继续执行任务\n")
-                messagebox.showwarning("警告", "未找到满足条件的表格")
+                stream.close()
+                self.append_output("警告: 未找到满足条件的表格，无法继续执行任务\n", 'warn')
+                self._show_warning("警告", "未找到满足条件的表格")
                 self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
                 return
             
             self.append_output(f"找到 {len(matching_tables)} 个满足条件的表格\n")
             
-            # 初始化Excel数据行索引
-            excel_row_index = 0
+            # 打开填表进度日志（记录已完成的单元格，中断后可以继续填写）
+            journal = FillJournal(os.path.join(self._get_app_dir(), "journal"), self.excel_file,
+                                  self.automator.url, resume)
+            if resume:
+                self.append_output(f"已启用断点续填: 已完成 {len(journal.completed)} 个单元格\n")
             
-            # 按表格顺序处理数据
-            for table_index, table_id in enumerate(matching_tables):
-                self.append_output(f"\n处理表格 {table_index + 1}/{len(matching_tables)}: {table_id}\n")
-                
-                # 动态生成table_identifier
-                table_identifier = f"//table[@id='{table_id}']//tr[position()>=3]"
-                self.append_output(f"使用table_identifier: {table_identifier}\n")
-                
-                # 获取当前表格的行数
-                try:
-                    # 使用web_automator的page对象来获取表格行数
-                    table_locator = self.automator.page.locator(f"//table[@id='{table_id}']//tr[position()>=3]")
-                    table_row_count = self.automator._run_async(table_locator.count())
-                    self.append_output(f"当前表格有 {table_row_count} 行可填写\n")
-                except Exception as e:
-                    self.append_output(f"获取表格行数失败: {e}\n")
-                    table_row_count = 0
-                
-                # 处理当前表格的每一行
-                for table_row_index in range(table_row_count):
-                    # 检查Excel数据是否已用完
-                    if excel_row_index >= len(data):
-                        self.append_output("Excel数据已全部填写完毕\n")
-                        break
-                    
-                    # 获取当前Excel行数据
-                    row = data[excel_row_index]
-                    self.append_output(f"处理Excel第 {excel_row_index + 1} 行数据，填写到表格第 {table_row_index + 1} 行...\n")
-                    
-                    # 填入数据
-                    for field_mapping in config.get('field_mappings', []):
-                        excel_field = field_mapping.get('excel_field')
-                        web_element = field_mapping.get('web_element')
-                        element_type = field_mapping.get('element_type', 'input')
-                        default_value = field_mapping.get('default_value')
-                        
-                        # 动态生成web_element，替换table_identifier
-                        if 'table_identifier' in web_element:
-                            web_element = web_element.copy()
-                            web_element['table_identifier'] = table_identifier
-                        
-                        # 确定使用的值
-                        value = None
-                        # 首先检查是否需要使用Discount值
-                        if default_value == "{{discount}}" or (excel_field == "Discount" and discount is not None):
-                            # 使用从Excel中找到的Discount值
-                            if discount is not None:
-                                value = discount
-                                self.append_output(f"使用Discount值: {value} 填入字段 {excel_field}\n")
-                            else:
-                                self.append_output(f"警告: 配置使用Discount值，但未找到Discount值\n")
-                                continue
-                        # 其次检查是否有默认值
-                        elif default_value is not None:
-                            value = default_value
-                            self.append_output(f"使用默认值: {value} 填入字段 {excel_field}\n")
-                        else:
-                            # 没有默认值，检查excel_field是否为空
-                            if not excel_field:
-                                # excel_field为空，无法从Excel中获取值
-                                self.append_output(f"警告: excel_field为空，且未配置默认值\n")
-                                continue
-                            # 尝试使用Excel中的值
-                            if excel_field in row:
-                                value = row[excel_field]
-                                if value is not None:
-                                    # 处理Brand列的特殊映射
-                                    if excel_field == 'Brand':
-                                        # 获取oem_type映射
-                                        oem_type_list = config.get('excel_config', {}).get('oem_type', [])
-                                        # 定义Brand到oem_type的映射
-                                        brand_mapping = {
-                                            'LOCAL BRAND': 'Compatible',
-                                            'OEM': 'OEM',
-                                            'GENUINE': 'Genuine'
-                                        }
-                                        # 转换Brand值为oem_type值
-                                        if value in brand_mapping:
-                                            oem_value = brand_mapping[value]
-                                            # 查找oem_type的索引
-                                            if oem_value in oem_type_list:
-                                                oem_index = oem_type_list.index(oem_value)
-                                                value = oem_index
-                                                self.append_output(f"使用Excel值: {row[excel_field]} 填入字段 {excel_field}\n")
-                                                self.append_output(f"转换为oem_type索引: {oem_index} ({oem_value})\n")
-                                            else:
-                                                self.append_output(f"警告: 未找到对应的oem_type值: {oem_value}\n")
-                                                continue
-                                        else:
-                                            self.append_output(f"警告: 未知的Brand值: {value}\n")
-                                            continue
-                                    else:
-                                        self.append_output(f"使用Excel值: {value} 填入字段 {excel_field}\n")
-                                else:
-                                    # 如果Excel中值为None，尝试使用discount值
-                                    if discount is not None:
-                                        value = discount
-                                        self.append_output(f"Excel值为None，使用discount值: {value} 填入字段 {excel_field}\n")
-                                    else:
-                                        self.append_output(f"警告: Excel中字段 {excel_field} 的值为None\n")
-                                        continue
-                            else:
-                                # 如果Excel中缺少字段，尝试使用discount值
-                                if discount is not None:
-                                    value = discount
-                                    self.append_output(f"Excel中缺少字段 {excel_field}，使用discount值: {value} 填入字段 {excel_field}\n")
-                                else:
-                                    self.append_output(f"警告: Excel中缺少字段 {excel_field}，且未配置discount值\n")
-                                    continue
-                        
-                        # 填入网页元素
-                        try:
-                            if element_type == 'input':
-                                self.automator.fill_input(web_element, value, table_row_index)
-                            elif element_type == 'select':
-                                self.automator.select_option(web_element, value, table_row_index)
-                            elif element_type == 'textarea':
-                                self.automator.fill_textarea(web_element, value, table_row_index)
-                            else:
-                                self.append_output(f"警告: 不支持的元素类型 {element_type}\n")
-                        except Exception as e:
-                            self.append_output(f"填入 {excel_field} 时出错: {e}\n")
-                            self.append_output("继续处理下一个字段...\n")
-                            # 出错时不退出，继续处理下一个字段
-                    
-                    # Excel行索引递增
-                    excel_row_index += 1
-                
-                self.append_output(f"表格 {table_index + 1} 处理完成\n")
-                
-                # 如果Excel数据已全部填写完毕，退出循环
-                if excel_row_index >= len(data):
-                    self.append_output("所有Excel数据已填写完毕\n")
-                    break
+            # 按表格顺序填写数据，读取后面的行与写入网页同时进行
+            counters = self.automator.events.snapshot()
+            engine = FillEngine(self.automator, config, sinks=[LogSink(log)], journal=journal,
+                                incremental=incremental, control=control)
+            for _ in engine.run(stream, matching_tables):
+                pass
             
             # 任务完成
             self.append_output("\n" + "="*60 + "\n")
-            self.append_output("任务完成！")
+            self.append_output("任务已取消！" if engine.cancelled else "任务完成！")
             self.append_output("浏览器保持打开状态，您可以继续使用。")
             
-            # 刷新日志缓冲区，确保所有日志都被写入
-            self.flush_log_buffer()
+            # 输出实际等待时间统计
+            self.append_output(f"页面等待统计: {self.automator.wait_summary()}\n")
+            self.append_output(f"网页写入统计: {self.automator.events.summary(counters)}\n")
+            
+            # 保存定位策略缓存和登录状态
+            self.automator.selector_cache.save()
+            self.automator.save_storage_state()
             
         except Exception as e:
-            self.append_output(f"执行填表命令时出错: {e}\n")
+            self.append_output(f"执行填表命令时出错: {e}\n", 'error')
             import traceback
             traceback_str = traceback.format_exc()
-            self.append_output(traceback_str)
-            messagebox.showerror("错误", f"执行填表命令时出错: {e}")
+            self.append_output(traceback_str, 'error')
+            self._show_error("错误", f"执行填表命令时出错: {e}")
         finally:
-            # 启用填表按钮和截图按钮
-            self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL)
+            # 出错时也停止Excel读取线程（关闭工作簿），写入已缓冲的填表进度并关闭文件
+            if stream is not None:
+                stream.close()
+            if journal is not None:
+                journal.close()
+            # 启用填表按钮和截图按钮，禁用暂停和取消按钮
+            self.set_button_states(fill_state=tk.NORMAL, screenshot_state=tk.NORMAL, control_state=tk.DISABLED)
     
-    def append_output(self, text):
-        """向输出窗口添加文本并写入日志文件
+    def append_output(self, text, level='info'):
+        """向输出窗口添加文本并写入日志文件（可以在任意线程调用）
         
-        使用缓冲机制优化性能：
-        - 日志写入：使用缓冲区，批量写入文件
-        - 界面更新：使用时间间隔控制，减少update()调用频率
-        """
-        import time
-        
-        # 添加到日志缓冲区
-        self.log_buffer.append(text)
+        文本先放入队列，由主线程定时批量显示（_pump_output），工作线程不直接操作界面；
+        日志文件由日志写入线程写入
         
-        # 检查是否需要刷新缓冲区
-        current_time = time.time()
-        should_flush = False
-        
-        # 条件1：缓冲区达到指定大小
-        if len(self.log_buffer) >= self.buffer_size:
-            should_flush = True
-        # 条件2：距离上次更新超过指定时间间隔
-        elif current_time - self.last_update_time >= self.update_interval:
-            should_flush = True
+        Args:
+            text (str): 日志文本
+            level (str): 级别（info、warn、error），决定输出窗口中的颜色和筛选
+        """
+        self.output_queue.put(OutputLine(text, level))
+        log_message(self.logger, text, level)
+    
+    def _pump_output(self):
+        """在主线程中批量处理队列中的日志（OutputLine）和界面操作（通过root.after定时调用）"""
+        texts = []
+        try:
+            for _ in range(self.pump_batch):
+                try:
+                    item = self.output_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, OutputLine):
+                    texts.append(item)
+                    continue
+                # 执行界面操作之前先显示之前的日志，保持顺序
+                self._show_output(texts)
+                texts = []
+                func, args = item
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"执行界面操作失败: {e}")
+            self._show_output(texts)
+        finally:
+            # 处理完成后再安排下一次（弹出对话框期间不会重入）
+            self.root.after(self.pump_interval, self._pump_output)
+    
+    def _show_output(self, texts):
+        """把一批日志（OutputLine）一次性显示到输出窗口（输出窗口只保留最近max_output_lines行）"""
+        if not texts:
+            return
         
         # 添加到输出窗口
         self.output_text.config(state=tk.NORMAL)
-        self.output_text.insert(tk.END, text)
-        self.output_text.see(tk.END)  # 滚动到末尾
+        at_end = self.output_text.yview()[1] >= 1.0  # 用户向上滚动查看时不自动滚动
+        self.output_text.insert(tk.END, *self._tagged_output(texts))
+        # 删除超出行数上限的最早的行
+        line_count = int(self.output_text.index("end-1c").split(".")[0])
+        if line_count > self.max_output_lines:
+            self.output_text.delete("1.0", f"{line_count - self.max_output_lines + 1}.0")
+        if at_end:
+            self.output_text.see(tk.END)  # 滚动到末尾
         self.output_text.config(state=tk.DISABLED)
-        
-        # 控制界面更新频率
-        if should_flush:
-            self.root.update()  # 立即更新界面
-            self.last_update_time = current_time
-            
-            # 写入日志文件（批量写入）
-            if self.log_file and self.log_buffer:
-                try:
-                    with open(self.log_file, 'a', encoding='utf-8') as f:
-                        f.writelines(self.log_buffer)
-                    self.log_buffer.clear()  # 清空缓冲区
-                except Exception as e:
-                    # 日志写入失败时不影响主程序运行
-                    print(f"写入日志文件失败: {e}")
     
-    def flush_log_buffer(self):
-        """强制刷新日志缓冲区
+    def _tagged_output(self, texts):
+        """把一批日志（OutputLine）按级别合并为Text.insert的参数（文本, 标签, 文本, 标签, ...）
         
-        在程序退出或重要操作完成后调用，确保所有日志都被写入
+        一批中超过max_output_lines行的部分只写入日志文件，不插入输出窗口
         """
-        if self.log_file and self.log_buffer:
-            try:
-                record_count = len(self.log_buffer)  # 记录清空前的数量
-                with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.writelines(self.log_buffer)
-                self.log_buffer.clear()
-                print(f"日志缓冲区已刷新，共写入 {record_count} 条记录")
-            except Exception as e:
-                print(f"刷新日志缓冲区失败: {e}")
+        lines = 0
+        start = len(texts)
+        while start > 0 and lines < self.max_output_lines:
+            start -= 1
+            lines += texts[start].text.count("\n")
+        
+        args = []
+        run, run_level = [], None
+        for text, level in texts[start:]:
+            if level != run_level and run:
+                args.extend(("".join(run), (run_level,)))
+                run = []
+            run.append(text)
+            run_level = level
+        if run:
+            args.extend(("".join(run), (run_level,)))
+        return args
 
 def main():
     """主函数"""
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志模块，所有模块的日志通过同一条管道输出
+
+各模块通过get_logger()取得logging日志记录器，日志记录放入队列，由LogWriter的
+后台写入线程用一个一直打开的文件句柄写成JSONL（每行一条JSON记录：时间、级别、
+模块、信息，以及可选的表格、行、字段和耗时），文件达到指定大小后自动轮换。
+控制台输出（命令行）在调用线程中同步写出，保持与print输出的顺序。
+
+每个单元格的详细信息使用debug级别，日志级别高于debug时logging在创建记录之前
+就直接返回，不格式化也不写入。
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+# 所有模块日志记录器的上级名称
+LOGGER_NAME = 'webwork'
+
+# 日志级别名称（配置中的log_config.level和命令行的--log-level）
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warn': logging.WARNING,
+    'error': logging.ERROR,
+}
+DEFAULT_LEVEL = 'info'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的大小上限
+DEFAULT_BACKUP_COUNT = 5  # 保留的轮换日志文件数
+
+# 结构化字段：通过extra传入，写入JSON记录（值为None时省略）
+STRUCTURED_FIELDS = ('table', 'row', 'field', 'status', 'duration_ms')
+
+
+def get_logger(name):
+    """返回模块的日志记录器（名称为 webwork.<name>）"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+
+def log_message(logger, text, level=DEFAULT_LEVEL):
+    """按级别名称写入一条文本日志（去掉末尾的换行）
+
+    Args:
+        logger: 日志记录器
+        text (str): 日志文本
+        level (str): 级别名称（debug、info、warn、error）
+    """
+    logger.log(LEVELS[level], text.rstrip('\n'))
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key in STRUCTURED_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogWriter:
+    """后台日志写入线程
+
+    日志记录器只把记录放入队列（QueueHandler），后台线程（QueueListener）用一个
+    RotatingFileHandler写入文件，文件句柄在写入线程结束前一直保持打开。
+    """
+
+    def __init__(self, log_file, level=DEFAULT_LEVEL, max_bytes=DEFAULT_MAX_BYTES,
+                 backup_count=DEFAULT_BACKUP_COUNT, console=None):
+        """打开日志文件并启动写入线程
+
+        Args:
+            log_file (str): JSONL日志文件路径
+            level (str): 日志级别名称（debug、info、warn、error）
+            max_bytes (int): 单个日志文件的大小上限（0表示不轮换）
+            backup_count (int): 保留的轮换日志文件数
+            console: 同时输出纯文本日志的流（如sys.stdout，None表示不输出到控制台）
+        """
+        self.log_file = log_file
+        self.file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.file_handler.setFormatter(JsonFormatter())
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, self.file_handler)
+
+        self.console_handler = None
+        if console is not None:
+            self.console_handler = logging.StreamHandler(console)
+            self.console_handler.setFormatter(logging.Formatter('%(message)s'))
+
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.propagate = False
+        self.set_level(level)
+        self.logger.addHandler(self.queue_handler)
+        if self.console_handler is not None:
+            self.logger.addHandler(self.console_handler)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def set_level(self, level):
+        """修改日志级别（未知的级别名称使用info）"""
+        self.logger.setLevel(LEVELS.get(level, LEVELS[DEFAULT_LEVEL]))
+
+    def close(self):
+        """停止写入线程：写完队列中剩余的记录后关闭文件（可以重复调用）"""
+        if self.listener is None:
+            return
+        self.logger.removeHandler(self.queue_handler)
+        if self.console_handler is not None:
+            self.logger.removeHandler(self.console_handler)
+        self.listener.stop()
+        self.listener = None
+        self.file_handler.close()
+        atexit.unregister(self.close)
@@ -6,41 +6,58 @@
 
 import json
 import argparse
+import functools
 import sys
 import os
 from excel_reader import ExcelReader
-from web_automator import WebAutomator
+from web_automator import BrowserSession, WebAutomator, EXECUTION_PROFILES
+from fill_engine import FillEngine, LogSink, RowStream
+from selector_cache import SelectorCache
+from log_writer import LogWriter, LEVELS, DEFAULT_LEVEL, DEFAULT_MAX_BYTES, DEFAULT_BACKUP_COUNT, get_logger, log_message
+from preload import preload_modules
 
-# 确保标准输出无缓冲
-import io
-sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', line_buffering=True)
-sys.stderr = io.TextIOWrapper(sys.stderr.detach(), encoding='utf-8', line_buffering=True)
+# 是否输出诊断信息（--debug或环境变量WEBWORK_DEBUG=1）
+DEBUG = os.environ.get('WEBWORK_DEBUG') == '1'
 
-print("=== 程序开始执行 ===")
-print(f"Python版本: {sys.version}")
-print(f"命令行参数: {sys.argv}")
-print(f"当前工作目录: {os.getcwd()}")
-print(f"文件列表: {os.listdir('.')}")
-print(f"ExcelReader模块是否存在: {'ExcelReader' in dir()}")
-print(f"WebAutomator模块是否存在: {'WebAutomator' in dir()}")
+
+def debug(message):
+    """输出诊断信息（只在调试模式下输出）"""
+    if DEBUG:
+        print(message)
+
+
+def setup_console():
+    """确保标准输出使用UTF-8并按行输出（作为脚本运行时调用，导入模块时不修改）"""
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', line_buffering=True)
+    sys.stderr = io.TextIOWrapper(sys.stderr.detach(), encoding='utf-8', line_buffering=True)
+
+
+def print_diagnostics():
+    """输出运行环境的诊断信息"""
+    debug("=== 程序开始执行 ===")
+    debug(f"Python版本: {sys.version}")
+    debug(f"命令行参数: {sys.argv}")
+    debug(f"当前工作目录: {os.getcwd()}")
+    debug(f"文件列表: {os.listdir('.')}")
 
 
 def load_config(config_file):
     """加载配置文件"""
-    print(f"=== 进入load_config函数 ===")
-    print(f"配置文件路径: {config_file}")
-    print(f"配置文件是否存在: {os.path.exists(config_file)}")
+    debug(f"=== 进入load_config函数 ===")
+    debug(f"配置文件路径: {config_file}")
+    debug(f"配置文件是否存在: {os.path.exists(config_file)}")
     try:
-        print(f"尝试打开配置文件: {config_file}")
+        debug(f"尝试打开配置文件: {config_file}")
         with open(config_file, 'r', encoding='utf-8') as f:
-            print(f"成功打开配置文件: {config_file}")
+            debug(f"成功打开配置文件: {config_file}")
             content = f.read()
-            print(f"配置文件内容长度: {len(content)}")
+            debug(f"配置文件内容长度: {len(content)}")
             # 尝试解析JSON
-            print(f"尝试解析JSON")
+            debug(f"尝试解析JSON")
             config = json.loads(content)
-            print(f"成功解析JSON")
-            print(f"配置文件键值: {list(config.keys())}")
+            debug(f"成功解析JSON")
+            debug(f"配置文件键值: {list(config.keys())}")
             return config
     except Exception as e:
         print(f"加载配置文件失败: {e}")
@@ -49,31 +66,73 @@ def load_config(config_file):
         sys.exit(1)
 
 
+def start_log_writer(config, level=None):
+    """启动日志写入线程：日志写入logs目录下的JSONL文件，同时输出到控制台
+    
+    Args:
+        config (dict): 配置内容（使用log_config）
+        level (str): 日志级别（命令行参数，优先于配置）
+        
+    Returns:
+        LogWriter: 日志写入器
+    """
+    import datetime
+    log_config = config.get('log_config', {})
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = os.path.join(logs_dir, f"excel_web_filler_cli_{timestamp}.jsonl")
+    writer = LogWriter(log_file,
+                       level=level or log_config.get('level', DEFAULT_LEVEL),
+                       max_bytes=log_config.get('max_bytes', DEFAULT_MAX_BYTES),
+                       backup_count=log_config.get('backup_count', DEFAULT_BACKUP_COUNT),
+                       console=sys.stdout)
+    print(f"日志文件路径: {log_file}")
+    return writer
+
+
 def main():
     """主函数"""
-    print("=== 进入main函数 ===")
-    print(f"命令行参数数量: {len(sys.argv)}")
-    print(f"命令行参数列表: {sys.argv}")
+    global DEBUG
     try:
         parser = argparse.ArgumentParser(description='将Excel数据自动填入网页')
-        print("创建参数解析器成功")
         parser.add_argument('excel_file', help='Excel文件路径')
         parser.add_argument('config_file', help='配置文件路径')
         parser.add_argument('--url', help='网页URL（可选，默认为配置文件中的URL）')
-        print("添加参数成功")
+        parser.add_argument('--profile', choices=sorted(EXECUTION_PROFILES),
+                            help='执行模式（可选，默认为配置文件中的browser_config.profile，未配置时为demo）')
+        parser.add_argument('--cdp-port', type=int,
+                            help='连接到以该远程调试端口运行的浏览器（可选，默认为配置文件中的browser_config.cdp_port）')
+        parser.add_argument('--log-level', choices=sorted(LEVELS),
+                            help='日志级别（可选，默认为配置文件中的log_config.level，未配置时为info；debug输出每个字段的详情）')
+        parser.add_argument('--debug', action='store_true', help='输出运行环境和配置加载的诊断信息')
         args = parser.parse_args()
-        print("解析参数成功")
-        print(f"Excel文件: {args.excel_file}")
-        print(f"配置文件: {args.config_file}")
-        print(f"URL: {args.url}")
+        DEBUG = DEBUG or args.debug
+        print_diagnostics()
+        debug(f"Excel文件: {args.excel_file}")
+        debug(f"配置文件: {args.config_file}")
+        debug(f"URL: {args.url}")
     except Exception as e:
         print(f"解析命令行参数失败: {e}")
         import traceback
         traceback.print_exc()
         return
 
+    # 在后台导入Playwright和openpyxl，与加载配置、读取Excel表头同时进行
+    preload_modules()
+
     # 加载配置
     config = load_config(args.config_file)
+    log_writer = start_log_writer(config, args.log_level)
+    log = functools.partial(log_message, get_logger('main'))  # 填表引擎的日志：log(message, level)
+    
+    # 在后台启动浏览器，与读取Excel同时进行，连接网页时只需打开页面
+    browser_config = config.get('browser_config', {})
+    profile = args.profile or browser_config.get('profile', 'demo')
+    # 指定调试端口时连接到已运行的浏览器（直接使用已打开的标签页），不启动新的浏览器
+    cdp_port = args.cdp_port if args.cdp_port is not None else browser_config.get('cdp_port')
+    session = BrowserSession(profile, cdp_port=cdp_port)
+    session.start()
     
     # 使用命令行参数中的URL（如果提供）
     url = args.url if args.url else config.get('url')
@@ -91,114 +150,40 @@ def main():
     header_row = excel_config.get('header_row', 16)  # 默认表头行
     start_row = excel_config.get('start_row', 17)  # 默认数据开始行
     end_row = excel_config.get('end_row', None)  # 默认结束行（None表示到文件末尾）
+    backend = excel_config.get('backend', 'openpyxl')  # Excel读取后端（openpyxl或stdlib）
     
-    reader = ExcelReader(args.excel_file, header_row, start_row, end_row)
-    data = reader.read_data()
-    if not data:
+    reader = ExcelReader(args.excel_file, header_row, start_row, end_row, backend=backend)
+    # 在后台读取Excel，连接网页和填表的同时继续读取后面的行
+    stream = RowStream(reader, discount, log=log)
+    if stream.exhausted():
         print('警告: Excel文件中没有数据')
         # 出错时不退出，继续执行
 
     # 连接到网页并填入数据
     print('正在连接到网页...')
-    automator = WebAutomator(url)
+    # 定位策略缓存保存在配置文件旁边，下次运行直接使用成功的定位策略
+    selector_cache_file = os.path.splitext(args.config_file)[0] + '.selectors.json'
+    # 登录状态文件的相对路径相对于配置文件所在目录
+    storage_state = browser_config.get('storage_state')
+    if storage_state:
+        storage_state = os.path.join(os.path.dirname(os.path.abspath(args.config_file)), storage_state)
+    automator = WebAutomator(url, selector_cache=SelectorCache(selector_cache_file, url, config), session=session,
+                             storage_state=storage_state)
     
     if not automator.is_connected:
         print('警告: 无法连接到网页，请确保网页已打开')
         # 出错时不退出，继续执行
 
-    # 处理每个数据行
-    for row_index, row in enumerate(data):
-        print(f'\n正在填入第 {row_index + 1} 行数据...')
-        # 填入数据
-        for field_mapping in config.get('field_mappings', []):
-            excel_field = field_mapping.get('excel_field')
-            web_element = field_mapping.get('web_element')
-            element_type = field_mapping.get('element_type', 'input')
-            default_value = field_mapping.get('default_value')
-            
-            # 确定使用的值
-            value = None
-            # 首先检查是否有默认值
-            if default_value is not None:
-                value = default_value
-                print(f'使用默认值: {value} 填入字段 {excel_field}')
-            else:
-                # 没有默认值，检查excel_field是否为空
-                if not excel_field:
-                    # excel_field为空，无法从Excel中获取值
-                    print(f'警告: excel_field为空，且未配置默认值')
-                    continue
-                # 尝试使用Excel中的值
-                if excel_field in row:
-                    value = row[excel_field]
-                    if value is not None:
-                        # 处理Brand列的特殊映射
-                        if excel_field == 'Brand':
-                            # 获取oem_type映射
-                            oem_type_list = config.get('excel_config', {}).get('oem_type', [])
-                            # 定义Brand到oem_type的映射
-                            brand_mapping = {
-                                'LOCAL BRAND': 'Compatible',
-                                'OEM': 'OEM',
-                                'GENUINE': 'Genuine'
-                            }
-                            # 转换Brand值为oem_type值
-                            if value in brand_mapping:
-                                oem_value = brand_mapping[value]
-                                # 查找oem_type的索引
-                                if oem_value in oem_type_list:
-                                    oem_index = oem_type_list.index(oem_value)
-                                    value = oem_index
-                                    print(f'使用Excel值: {row[excel_field]} 填入字段 {excel_field}')
-                                    print(f'转换为oem_type索引: {oem_index} ({oem_value})')
-                                else:
-                                    print(f'警告: 未找到对应的oem_type值: {oem_value}')
-                                    continue
-                            else:
-                                print(f'警告: 未知的Brand值: {value}')
-                                continue
-                        else:
-                            print(f'使用Excel值: {value} 填入字段 {excel_field}')
-                    else:
-                        # 如果Excel中值为None，尝试使用discount值
-                        if discount is not None:
-                            value = discount
-                            print(f'Excel值为None，使用discount值: {value} 填入字段 {excel_field}')
-                        else:
-                            print(f'警告: Excel中字段 {excel_field} 的值为None')
-                            continue
-                else:
-                    # 如果Excel中缺少字段，尝试使用discount值
-                    if discount is not None:
-                        value = discount
-                        print(f'Excel中缺少字段 {excel_field}，使用discount值: {value} 填入字段 {excel_field}')
-                    else:
-                        print(f'警告: Excel中缺少字段 {excel_field}，且未配置discount值')
-                        continue
-            
-            # 填入网页元素
-            try:
-                if element_type == 'input':
-                    automator.fill_input(web_element, value, row_index)
-                elif element_type == 'select':
-                    automator.select_option(web_element, value, row_index)
-                elif element_type == 'textarea':
-                    automator.fill_textarea(web_element, value, row_index)
-                else:
-                    print(f'警告: 不支持的元素类型 {element_type}')
-            except Exception as e:
-                print(f'填入 {excel_field} 时出错: {e}')
-                print('继续处理下一个字段...')
-                # 出错时不退出，继续处理下一个字段
-        
-        # 自动处理所有行，不需要用户确认
-        # if len(data) > 1:
-        #     user_input = input('\n是否继续处理下一行数据？(y/n): ')
-        #     if user_input.lower() != 'y':
-        #         break
+    # 按检测到的表格顺序填写数据（与GUI相同）；没有检测到表格时按配置中的元素标识符逐行填写
+    tables = automator.matching_tables or None
+    engine = FillEngine(automator, config, sinks=[LogSink(log)])
+    for _ in engine.run(stream, tables):
+        pass
+    print(f"网页写入统计: {automator.events.summary()}")
 
     # 关闭浏览器（已禁用）
-    automator.close()  # 此方法已被修改，不会关闭浏览器
+    automator.close()  # 此方法已被修改，不会关闭浏览器，只保存定位策略缓存和登录状态
+    log_writer.close()  # 写完剩余的日志并关闭日志文件
     print('\n任务完成！浏览器保持打开状态。')
     print('数据已成功填入网页。')
     print('浏览器已保持打开状态，您可以继续使用。')
@@ -209,4 +194,5 @@ def main():
 
 
 if __name__ == '__main__':
+    setup_console()
     main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模块预加载，在后台线程中提前导入较慢的模块
+
+Playwright和openpyxl只在连接网页、读取Excel时才导入（各导入一百多毫秒），
+GUI在窗口显示之后、命令行在解析参数之后调用preload_modules()，
+用户点击按钮或读取Excel时这些模块已经导入完成。
+"""
+
+import importlib
+import threading
+import time
+
+from log_writer import get_logger
+
+logger = get_logger('preload')
+
+# 默认预加载的模块（按使用的先后顺序）
+HEAVY_MODULES = ('openpyxl', 'excel_reader', 'playwright.async_api', 'web_automator', 'fill_engine')
+
+
+def _import_all(names):
+    """依次导入模块，记录每个模块的导入耗时（导入失败时只记录，不影响之后的使用）"""
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"预加载模块 {name} 失败: {e}")
+            continue
+        logger.debug("预加载模块 %s: %.1f 毫秒", name, (time.perf_counter() - start) * 1000)
+
+
+def preload_modules(names=HEAVY_MODULES):
+    """在后台线程中导入模块
+
+    主线程之后导入同一个模块时，会等待后台线程导入完成（不会重复导入）
+
+    Args:
+        names: 模块名列表
+
+    Returns:
+        threading.Thread: 预加载线程
+    """
+    thread = threading.Thread(target=_import_all, args=(tuple(names),), name='ModulePreload', daemon=True)
+    thread.start()
+    return thread
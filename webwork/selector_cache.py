@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定位策略缓存模块，记住每个字段映射成功使用的定位策略
+"""
+
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+from log_writer import get_logger
+
+logger = get_logger('selector_cache')
+
+
+class SelectorCache:
+    """定位策略缓存
+
+    运行期间保存在内存中，并可持久化到旁路文件，按页面URL和配置区分，
+    下次运行直接使用上次成功的定位策略。策略失效时自动移除。
+    """
+
+    max_age = 30 * 24 * 3600  # 缓存条目的最长保留时间（秒）
+    max_namespaces = 20  # 旁路文件中最多保留的URL/配置组合数
+
+    def __init__(self, cache_file=None, url='', config=None):
+        """初始化SelectorCache
+
+        Args:
+            cache_file (str): 旁路缓存文件路径（None表示只在内存中缓存）
+            url (str): 网页URL
+            config (dict): 配置内容（用于区分不同的字段映射）
+        """
+        self.cache_file = cache_file
+        self.namespace = self._make_namespace(url, config)
+        self.entries = {}
+        self.dirty = False
+        self._load()
+
+    @staticmethod
+    def _make_namespace(url, config):
+        """根据页面URL和字段映射生成缓存命名空间
+
+        URL只取协议、主机和路径部分，同一页面的不同询价单可以共享缓存
+        """
+        parts = urlsplit(url or '')
+        page = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        mappings = (config or {}).get('field_mappings', [])
+        raw = page + '\n' + json.dumps(mappings, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_key(element_identifier):
+        """生成字段映射的缓存键（忽略每个表格不同的table_identifier）"""
+        identifier = {k: v for k, v in element_identifier.items() if k != 'table_identifier'}
+        return json.dumps(identifier, sort_keys=True, ensure_ascii=False)
+
+    def _load(self):
+        """从旁路文件加载缓存，丢弃过期条目"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data.get(self.namespace, {}).get('entries', {})
+            now = time.time()
+            for key, entry in entries.items():
+                if now - entry.get('updated', 0) <= self.max_age:
+                    self.entries[key] = entry
+                else:
+                    self.dirty = True
+            logger.info(f"已加载定位策略缓存: {len(self.entries)} 条")
+        except Exception as e:
+            logger.warning(f"加载定位策略缓存失败: {e}")
+
+    def get(self, key, kind):
+        """获取缓存的策略
+
+        Args:
+            key (str): 字段映射的缓存键
+            kind (str): 策略类别（find、input、select）
+
+        Returns:
+            str: 策略名称，未缓存时返回None
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry.get(kind)
+
+    def put(self, key, kind, strategy):
+        """记录成功的策略"""
+        entry = self.entries.setdefault(key, {})
+        if entry.get(kind) != strategy:
+            entry[kind] = strategy
+            entry['updated'] = time.time()
+            self.dirty = True
+
+    def evict(self, key):
+        """移除失效的缓存条目"""
+        if self.entries.pop(key, None) is not None:
+            logger.info(f"定位策略缓存已失效，已移除: {key}")
+            self.dirty = True
+
+    def save(self):
+        """将缓存写入旁路文件（只在有变化时写入）"""
+        if not self.cache_file or not self.dirty:
+            return
+        try:
+            data = {}
+            if os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except Exception:
+                    data = {}
+            data[self.namespace] = {'updated': time.time(), 'entries': self.entries}
+            # 只保留最近使用的命名空间
+            if len(data) > self.max_namespaces:
+                recent = sorted(data.items(), key=lambda item: item[1].get('updated', 0), reverse=True)
+                data = dict(recent[:self.max_namespaces])
+
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.cache_file)
+            self.dirty = False
+            logger.info(f"定位策略缓存已保存: {self.cache_file}")
+        except Exception as e:
+            logger.warning(f"保存定位策略缓存失败: {e}")
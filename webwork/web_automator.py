@@ -4,241 +4,826 @@
 网页自动化模块，用于连接到已打开的网页并填入数据
 """
 
-from playwright.async_api import async_playwright
 import time
 import os
+import re
 import asyncio
+import threading
+import functools
+from urllib.parse import urlsplit
+from selector_cache import SelectorCache
+from event_buffer import EventBuffer, LOG, FAILURE, FALLBACK
+from log_writer import LEVELS, get_logger, log_message
+
+# 每个单元格的定位、填写和选择详情使用debug级别（默认不输出）
+logger = get_logger('web_automator')
+
+
+# 批量填写脚本：在页面内按 //table[@id=...]//tr[position()>=3]/td[N] 的规则定位单元格，
+# 写入值后触发input/change事件，返回每个单元格是否填写成功
+BULK_FILL_SCRIPT = """
+({tableId, cells}) => {
+    const snapshot = document.evaluate(
+        `//table[@id='${tableId}']//tr[position()>=3]`, document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const rows = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) {
+        rows.push(snapshot.snapshotItem(i));
+    }
+    const fire = (el, type) => el.dispatchEvent(new Event(type, {bubbles: true}));
+    const setValue = (el, text) => {
+        const proto = Object.getPrototypeOf(el);
+        const descriptor = Object.getOwnPropertyDescriptor(proto, 'value');
+        if (descriptor && descriptor.set) {
+            descriptor.set.call(el, text);
+        } else {
+            el.value = text;
+        }
+    };
+    return cells.map(([row, column, value, type]) => {
+        const tr = rows[row];
+        if (!tr) return false;
+        const tds = Array.from(tr.children).filter(c => c.tagName === 'TD');
+        const td = tds[column - 1];
+        if (!td) return false;
+        const text = value === null ? '' : value;
+        if (type === 'select') {
+            const select = td.querySelector('select');
+            if (!select) return false;
+            const options = Array.from(select.options);
+            let index = options.findIndex(o => o.value === text);
+            if (index < 0) index = options.findIndex(o => o.text.trim() === text.trim());
+            if (index < 0 && /^\\d+$/.test(text) && Number(text) < options.length) index = Number(text);
+            if (index < 0) return false;
+            select.selectedIndex = index;
+            fire(select, 'input');
+            fire(select, 'change');
+            return true;
+        }
+        const selector = type === 'textarea' ? 'textarea' : 'input:not([type=hidden])';
+        const el = td.querySelector(selector);
+        if (!el || el.disabled || el.readOnly) return false;
+        el.focus();
+        setValue(el, text);
+        fire(el, 'input');
+        fire(el, 'change');
+        el.blur();
+        return true;
+    });
+}
+"""
+
+
+# 表格读取脚本：一次读取表格中指定列的当前值（select返回值、文本和索引，其他返回输入框的值或单元格文本）
+READ_TABLE_VALUES_SCRIPT = """
+({tableId, columns}) => {
+    const snapshot = document.evaluate(
+        `//table[@id='${tableId}']//tr[position()>=3]`, document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const rows = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) {
+        const tds = Array.from(snapshot.snapshotItem(i).children).filter(c => c.tagName === 'TD');
+        const values = {};
+        for (const column of columns) {
+            const td = tds[column - 1];
+            if (!td) {
+                values[column] = null;
+                continue;
+            }
+            const select = td.querySelector('select');
+            if (select) {
+                const option = select.options[select.selectedIndex];
+                values[column] = {value: select.value, label: option ? option.text.trim() : '', index: select.selectedIndex};
+                continue;
+            }
+            const el = td.querySelector('textarea, input:not([type=hidden])');
+            values[column] = {value: el ? el.value : td.textContent.trim()};
+        }
+        rows.push(values);
+    }
+    return rows;
+}
+"""
+
+# 页面等待钩子：统计进行中的XHR/fetch请求和最近一次DOM变化的时间，
+# 并检查DevExpress控件是否处于回调中，页面空闲时__webworkWait.idle()返回true
+WAIT_HOOK_SCRIPT = """
+(() => {
+    if (window.__webworkWait) return;
+    const state = {pending: 0, lastMutation: performance.now()};
+
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        state.pending++;
+        this.addEventListener('loadend', () => { state.pending--; }, {once: true});
+        return send.apply(this, args);
+    };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function (...args) {
+            state.pending++;
+            return fetch.apply(this, args).finally(() => { state.pending--; });
+        };
+    }
+
+    const observe = () => {
+        new MutationObserver(() => { state.lastMutation = performance.now(); })
+            .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    };
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', observe);
+    } else {
+        observe();
+    }
+
+    const inCallback = () => {
+        try {
+            const collection = window.ASPxClientControl && window.ASPxClientControl.GetControlCollection();
+            if (!collection) return false;
+            let busy = false;
+            collection.ForEachControl(control => {
+                if (!busy && typeof control.InCallback === 'function' && control.InCallback()) busy = true;
+            });
+            return busy;
+        } catch (e) {
+            return false;
+        }
+    };
+
+    window.__webworkWait = {
+        idle: (quietMs) => state.pending === 0 && !inCallback()
+            && performance.now() - state.lastMutation >= quietMs,
+    };
+})();
+"""
+
+# 表格id格式："CPH_QGV_dxdt"+数字+"_QDGV_"+数字+"_DXMainTable"，两个数字保持一致
+TABLE_ID_PATTERN = r'^CPH_QGV_dxdt(\d+)_QDGV_\1_DXMainTable$'
+
+# 表格检测脚本：一次页面内查询返回所有匹配表格的id及其可填写行数（第3行起）
+DETECT_TABLES_SCRIPT = """
+(pattern) => {
+    const regex = new RegExp(pattern);
+    const tables = [];
+    for (const table of document.querySelectorAll('table[id]')) {
+        if (!regex.test(table.id)) continue;
+        const rows = document.evaluate(
+            `//table[@id='${table.id}']//tr[position()>=3]`, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+        tables.push({id: table.id, rows: rows});
+    }
+    return tables;
+}
+"""
+
+# 单元格地址索引脚本：一次遍历所有表格，记录 表格id → 行 → 列 → 具体元素id（input/select/textarea，否则为td），
+# 并安装MutationObserver，表格重新渲染时标记索引失效
+CELL_INDEX_SCRIPT = """
+(tableIds) => {
+    const index = {};
+    for (const tableId of tableIds) {
+        const snapshot = document.evaluate(
+            `//table[@id='${tableId}']//tr[position()>=3]`, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const rows = [];
+        for (let i = 0; i < snapshot.snapshotLength; i++) {
+            const tr = snapshot.snapshotItem(i);
+            const tds = Array.from(tr.children).filter(c => c.tagName === 'TD');
+            rows.push(tds.map(td => {
+                const el = td.querySelector('select, textarea, input:not([type=hidden])');
+                if (el && el.id) return el.id;
+                return td.id || null;
+            }));
+        }
+        index[tableId] = rows;
+    }
+
+    if (window.__webworkCellIndexObserver) {
+        window.__webworkCellIndexObserver.disconnect();
+    }
+    window.__webworkCellIndexDirty = false;
+    const tables = tableIds.map(id => document.getElementById(id)).filter(Boolean);
+    const observer = new MutationObserver(mutations => {
+        for (const m of mutations) {
+            if (tables.some(t => !t.isConnected || t.contains(m.target))) {
+                window.__webworkCellIndexDirty = true;
+                observer.disconnect();
+                return;
+            }
+        }
+    });
+    if (document.body) {
+        observer.observe(document.body, {childList: true, subtree: true});
+    }
+    window.__webworkCellIndexObserver = observer;
+    return index;
+}
+"""
+
+# 匹配execute_fill生成的table_identifier，提取表格id
+TABLE_IDENTIFIER_PATTERN = re.compile(r"^//table\[@id='([^']+)'\]//tr\[position\(\)>=3\]$")
+
+
+# 执行模式：demo保持可视化的慢速操作，便于观察；turbo无头运行，去掉slow_mo并精简Chromium启动参数
+EXECUTION_PROFILES = {
+    'demo': {
+        'headless': False,  # 显示浏览器窗口
+        'slow_mo': 50,  # 减慢操作速度，便于观察
+        'args': ["--enable-scroll-bars"],  # 强制显示滚动条
+        'show_scrollbars': True,
+    },
+    'turbo': {
+        'headless': True,
+        'slow_mo': 0,
+        'args': [
+            "--disable-extensions",
+            "--disable-gpu",
+            "--disable-background-timer-throttling",
+            "--disable-backgrounding-occluded-windows",
+            "--disable-renderer-backgrounding",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--mute-audio",
+        ],
+        'show_scrollbars': False,
+    },
+}
+
+
+class BrowserSession:
+    """浏览器会话：事件循环线程、Playwright和已启动的浏览器
+    
+    可以在选择文件之前就在后台启动（start），多次连接网页（WebAutomator）复用同一个浏览器，
+    每次连接只打开新页面并导航。浏览器被关闭后，下次连接时自动重新启动。
+    指定cdp_port时不启动浏览器，而是通过CDP连接到已经运行的Chromium（以
+    --remote-debugging-port=端口 启动），连接网页时直接使用已打开的标签页。
+    """
+    
+    # 优先尝试的系统Chrome路径
+    CHROME_PATHS = [
+        "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+        "C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe"
+    ]
+    
+    def __init__(self, profile='demo', log=None, cdp_port=None):
+        """创建事件循环线程（不启动浏览器）
+        
+        Args:
+            profile (str): 执行模式（demo或turbo，见EXECUTION_PROFILES）
+            log: 浏览器启动过程的日志输出函数log(message, level)（None表示只写入日志）
+            cdp_port (int): 已运行浏览器的远程调试端口（None表示启动新的浏览器）
+        """
+        self.log = log or functools.partial(log_message, logger)
+        if profile not in EXECUTION_PROFILES:
+            self.log(f'警告: 未知的执行模式 {profile}，使用demo模式', 'warn')
+            profile = 'demo'
+        self.profile = profile
+        self.cdp_port = cdp_port
+        self.playwright = None
+        self.browser = None
+        self._launch = None  # 启动浏览器的Future（只在事件循环线程中替换）
+        # 创建事件循环并在专用后台线程中持续运行，所有Playwright操作都提交到该线程执行
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self._run_loop, name='BrowserSessionLoop', daemon=True)
+        self.loop_thread.start()
+    
+    def _run_loop(self):
+        """事件循环线程的入口，持续运行事件循环"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def start(self):
+        """在后台启动Playwright和浏览器，不等待启动完成（可以重复调用）"""
+        asyncio.run_coroutine_threadsafe(self.browser_async(), self.loop)
+    
+    async def browser_async(self):
+        """返回已启动的浏览器（在事件循环线程中调用）
+        
+        浏览器正在启动时等待启动完成；还没有启动、上次启动失败或被取消、浏览器已被关闭时重新启动
+        """
+        if self._launch is not None and self._launch.done():
+            if (self._launch.cancelled() or self._launch.exception() is not None
+                    or not self.browser.is_connected()):
+                self._launch = None
+        if self._launch is None:
+            self._launch = asyncio.ensure_future(self._launch_async())
+        return await asyncio.shield(self._launch)
+    
+    def stop(self):
+        """关闭浏览器（通过CDP连接时只断开连接，不关闭用户的浏览器），停止Playwright和事件循环线程
+        
+        不能在事件循环线程中调用；停止后不能再使用该会话
+        """
+        if not self.loop_thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_async(), self.loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"关闭浏览器会话失败: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=5)
+        if not self.loop_thread.is_alive():
+            self.loop.close()
+    
+    async def _stop_async(self):
+        """等待正在进行的启动结束后关闭浏览器和Playwright"""
+        if self._launch is not None:
+            try:
+                await self._launch
+            except BaseException:
+                pass  # 启动失败或被取消时没有需要关闭的浏览器
+        if self.browser is not None and self.cdp_port is None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
+    
+    async def _launch_async(self):
+        """启动Playwright（只启动一次）和浏览器"""
+        start_time = time.time()
+        if self.playwright is None:
+            # 导入较慢，只在启动浏览器时导入；GUI启动后会在后台预先导入
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+        if self.cdp_port is not None:
+            return await self._attach_async(start_time)
+        # 启动浏览器（默认使用Chrome）
+        self.log('正在启动浏览器...')
+        
+        # 按执行模式设置启动参数
+        profile = EXECUTION_PROFILES[self.profile]
+        self.log(f'执行模式: {self.profile}（headless={profile["headless"]}, slow_mo={profile["slow_mo"]}ms）')
+        launch_options = {
+            'headless': profile['headless'],
+            'slow_mo': profile['slow_mo'],
+            'args': profile['args'],
+        }
+        
+        # 尝试使用系统已安装的Chrome浏览器
+        browser = None
+        for chrome_path in self.CHROME_PATHS:
+            try:
+                self.log(f'尝试使用Chrome路径: {chrome_path}')
+                browser = await self.playwright.chromium.launch(
+                    executable_path=chrome_path,  # 系统Chrome路径
+                    **launch_options
+                )
+                break
+            except Exception as e:
+                self.log(f'使用路径 {chrome_path} 失败: {e}', 'warn')
+        
+        # 如果所有路径都失败，使用Playwright默认的浏览器
+        if browser is None:
+            self.log('使用系统Chrome失败，尝试使用Playwright默认浏览器...', 'warn')
+            browser = await self.playwright.chromium.launch(**launch_options)
+        self.browser = browser
+        self.log(f'浏览器已启动，耗时 {time.time() - start_time:.2f} 秒')
+        return browser
+    
+    async def _attach_async(self, start_time):
+        """通过CDP连接到已经运行的浏览器"""
+        endpoint = f'http://127.0.0.1:{self.cdp_port}'
+        self.log(f'正在连接到已运行的浏览器: {endpoint}')
+        browser = await self.playwright.chromium.connect_over_cdp(
+            endpoint, slow_mo=EXECUTION_PROFILES[self.profile]['slow_mo'])
+        self.browser = browser
+        pages = sum(len(context.pages) for context in browser.contexts)
+        self.log(f'已连接到浏览器（{pages} 个标签页），耗时 {time.time() - start_time:.2f} 秒')
+        return browser
+    
+    def find_page(self, url):
+        """在已连接浏览器的标签页中查找网址与url相同的页面（忽略#之后的部分和末尾的/）
+        
+        网址完全相同的标签页优先，其次是只有查询参数不同的标签页
+        
+        Args:
+            url (str): 网页URL
+        
+        Returns:
+            Page: 找到的标签页，没有时返回None
+        """
+        def key(address):
+            parts = urlsplit(address)
+            return parts.scheme, parts.netloc.lower(), parts.path.rstrip('/'), parts.query
+        pages = [page for context in self.browser.contexts for page in context.pages]
+        target = key(url)
+        for matches in (lambda page_key: page_key == target, lambda page_key: page_key[:3] == target[:3]):
+            for page in pages:
+                if matches(key(page.url)):
+                    return page
+        return None
 
 
 class WebAutomator:
     """网页自动化工具"""
     
-    def __init__(self, url):
+    def __init__(self, url, selector_cache=None, profile='demo', events=None, session=None, storage_state=None):
         """初始化WebAutomator
         
         Args:
             url (str): 网页URL
+            selector_cache (SelectorCache): 定位策略缓存（None表示只在本次运行的内存中缓存）
+            profile (str): 执行模式（demo或turbo，见EXECUTION_PROFILES；传入session时使用session的执行模式）
+            events (EventBuffer): 事件缓冲区（None表示新建；需要接收连接过程中的事件时
+                先订阅再传入）
+            session (BrowserSession): 已启动（或正在启动）的浏览器会话（None表示新建，连接时启动浏览器）
+            storage_state (str): 登录状态文件（cookie和localStorage）；文件存在时新打开的页面使用其中的
+                登录状态，save_storage_state()把当前登录状态保存到该文件（None表示不使用）
         """
         self.url = url
-        self.playwright = None
-        self.browser = None
+        self.events = events if events is not None else EventBuffer()  # 最近的事件和写入计数
+        if session is None:
+            session = BrowserSession(profile, log=self._log)
+        self.session = session
+        self.profile = session.profile
+        self.storage_state = storage_state
+        self.action_overhead_ms = None  # 每个操作的实测平均开销（毫秒）
+        self.selector_cache = selector_cache if selector_cache is not None else SelectorCache(url=url)
         self.page = None
+        self.owns_page = False  # 页面是否由本次连接打开（使用CDP连接中已打开的标签页时为False）
         self.is_connected = False
-        self.loop = None
+        self.loop = session.loop
+        self.loop_thread = session.loop_thread
         self.matching_tables = []
-        self.logs = []  # 存储日志信息
+        self.table_row_counts = {}  # 表格id → 可填写的行数
+        self.cell_index = {}  # 单元格地址索引：表格id → 行 → 列 → 元素id
+        self.option_maps = {}  # 下拉框选项表：字段映射 → 选项（每个页面只读取一次）
+        self.wait_stats = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'timeouts': 0}  # 实际等待时间统计
+        self._keyboard_lock = None  # 点击/键盘输入依赖页面焦点，需要串行执行（在事件循环线程中创建）
         self._connect()
     
-    def _log(self, message):
-        """记录日志信息
+    def _log(self, message, level='info'):
+        """记录日志信息（写入日志并作为LOG事件发布）
         
         Args:
             message (str): 日志信息
+            level (str): 级别（info、warn、error）
         """
-        print(message)
-        self.logs.append(message)
+        logger.log(LEVELS[level], message)
+        self.events.publish(LOG, message, level)
+    
+    def _fallback(self, message):
+        """记录写入时使用了备用方式（计数，并作为FALLBACK事件保留在事件缓冲区中）
+        
+        Args:
+            message (str): 使用的备用方式及原因
+        """
+        self.events.count('fallbacks')
+        self.events.publish(FALLBACK, message, 'warn')
+    
+    @property
+    def browser(self):
+        """浏览器会话中的浏览器"""
+        return self.session.browser
     
     def _connect(self):
         """连接到网页"""
         try:
-            # 创建并保存事件循环
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            
-            # 在事件循环中运行异步连接
-            self.loop.run_until_complete(self._connect_async())
+            # 在浏览器会话的事件循环中运行异步连接
+            self._run_async(self._connect_async())
             
         except Exception as e:
-            self._log(f"连接到网页失败: {e}")
+            self._log(f"连接到网页失败: {e}", 'error')
             self.is_connected = False
             # 不清理资源，保持浏览器打开
             self._log('保持浏览器打开状态，不清理资源')
     
     async def _connect_async(self):
         """异步连接到网页"""
+        # asyncio.Lock需要在事件循环线程中创建（Python 3.9及以下在其他线程中创建会绑定到错误的事件循环）
+        self._keyboard_lock = asyncio.Lock()
         try:
-            # 启动Playwright
-            self.playwright = await async_playwright().start()
-            # 启动浏览器（默认使用Chrome）
-            self._log('正在启动浏览器...')
-            
-            # 尝试使用系统已安装的Chrome浏览器
-            chrome_paths = [
-                "C:\Program Files\Google\Chrome\Application\chrome.exe",
-                "C:\Program Files (x86)\Google\Chrome\Application\chrome.exe"
-            ]
+            # 使用浏览器会话中的浏览器（已经在后台启动时直接使用，否则等待启动完成）
+            browser = await self.session.browser_async()
+            profile = EXECUTION_PROFILES[self.profile]
+            # 通过CDP连接时优先使用已打开（通常已登录）的标签页，不需要导航
+            self.page = self.session.find_page(self.url) if self.session.cdp_port is not None else None
+            if self.page is not None:
+                self._log(f'使用已打开的标签页: {self.page.url}')
+                await self.page.bring_to_front()
+                # 安装页面等待钩子，之后每次导航都会自动注入
+                await self.page.add_init_script(WAIT_HOOK_SCRIPT)
+            else:
+                # 创建新页面
+                self.page = await self._new_page_async(browser)
+                self.owns_page = True
+                # 安装页面等待钩子，之后每次导航都会自动注入
+                await self.page.add_init_script(WAIT_HOOK_SCRIPT)
+                # 导航到目标URL
+                self._log(f'正在导航到: {self.url}')
+                # 减少页面加载等待时间，从'networkidle'改为'load'，这样页面加载完成后就开始操作
+                await self.page.goto(self.url, wait_until='load')
+            await self._install_wait_hook_async()
             
-            browser_launched = False
-            for chrome_path in chrome_paths:
-                try:
-                    self._log(f'尝试使用Chrome路径: {chrome_path}')
-                    self.browser = await self.playwright.chromium.launch(
-                        headless=False,  # 显示浏览器窗口
-                        slow_mo=50,  # 减慢操作速度，便于观察（从100ms减少到50ms）
-                        executable_path=chrome_path,  # 系统Chrome路径
-                        args=["--enable-scroll-bars"]  # 强制显示滚动条
-                    )
-                    browser_launched = True
-                    break
-                except Exception as e:
-                    self._log(f'使用路径 {chrome_path} 失败: {e}')
-            
-            # 如果所有路径都失败，使用Playwright默认的浏览器
-            if not browser_launched:
-                self._log('使用系统Chrome失败，尝试使用Playwright默认浏览器...')
-                self.browser = await self.playwright.chromium.launch(
-                    headless=False,  # 显示浏览器窗口
-                    slow_mo=50,  # 减慢操作速度，便于观察
-                    args=["--enable-scroll-bars"]  # 强制显示滚动条
-                )
-            # 创建新页面
-            self.page = await self.browser.new_page()
-            # 导航到目标URL
-            self._log(f'正在导航到: {self.url}')
-            # 减少页面加载等待时间，从'networkidle'改为'load'，这样页面加载完成后就开始操作
-            await self.page.goto(self.url, wait_until='load')
-            
-            # 注入CSS以强制显示滚动条
-            await self.page.add_style_tag(content="""
-                /* 强制显示滚动条 */
-                ::-webkit-scrollbar {
-                    width: 12px !important;
-                    height: 12px !important;
-                    display: block !important;
-                }
-                ::-webkit-scrollbar-track {
-                    background: #f1f1f1 !important;
-                }
-                ::-webkit-scrollbar-thumb {
-                    background: #888 !important;
-                    border-radius: 6px !important;
-                }
-                ::-webkit-scrollbar-thumb:hover {
-                    background: #555 !important;
-                }
-                /* 为body和所有可滚动元素添加滚动条 */
-                body {
-                    overflow: auto !important;
-                    scrollbar-width: auto !important;
-                    -ms-overflow-style: auto !important;
-                }
-                /* 确保所有可滚动容器都显示滚动条 */
-                .scrollable,
-                .overflow-auto,
-                .overflow-x-auto,
-                .overflow-y-auto {
-                    overflow: auto !important;
-                    scrollbar-width: auto !important;
-                    -ms-overflow-style: auto !important;
-                }
-            """)
+            # 注入CSS以强制显示滚动条（无头模式下不需要）
+            if profile['show_scrollbars']:
+                await self._inject_scrollbar_style()
             
             # 检测满足条件的table元素
             await self._detect_tables()
             
+            # 测量当前执行模式下每个操作的额外开销
+            await self._measure_action_overhead()
+            
             self.is_connected = True
             self._log('连接成功！')
                 
         except Exception as e:
-            self._log(f"连接到网页失败: {e}")
+            self._log(f"连接到网页失败: {e}", 'error')
             self.is_connected = False
             # 不清理资源，保持浏览器打开
             self._log('保持浏览器打开状态，不清理资源')
     
+    async def _new_page_async(self, browser):
+        """打开新页面
+        
+        通过CDP连接时在浏览器已有的上下文中打开（共用已登录的cookie）；否则新建上下文，
+        登录状态文件存在时加载其中的登录状态
+        """
+        if self.session.cdp_port is not None and browser.contexts:
+            return await browser.contexts[0].new_page()
+        if self.storage_state and os.path.exists(self.storage_state):
+            self._log(f'加载登录状态: {self.storage_state}')
+            context = await browser.new_context(storage_state=self.storage_state)
+        else:
+            context = await browser.new_context()
+        return await context.new_page()
+    
+    async def close_page_async(self):
+        """关闭本次连接打开的页面（不再使用该WebAutomator时调用，浏览器保持打开）
+        
+        新启动的浏览器中关闭页面所在的上下文；通过CDP连接时只关闭页面，不关闭共用的上下文；
+        使用的是用户已打开的标签页时不关闭
+        """
+        page = self.page
+        self.page = None
+        self.is_connected = False
+        if page is None or not self.owns_page:
+            return
+        try:
+            if self.session.cdp_port is not None:
+                await page.close()
+            else:
+                await page.context.close()
+        except Exception as e:
+            logger.warning(f'关闭页面失败: {e}')
+    
+    def release(self):
+        """在后台关闭本次连接打开的页面，不等待完成（可以在界面线程中调用）"""
+        if self.page is None or self.loop.is_closed() or not self.loop_thread.is_alive():
+            self.page = None
+            self.is_connected = False
+            return
+        self.submit(self.close_page_async())
+    
+    async def save_storage_state_async(self):
+        """把当前页面的登录状态（cookie和localStorage）保存到storage_state文件（未设置时不保存）"""
+        if not self.storage_state or self.page is None:
+            return
+        try:
+            await self.page.context.storage_state(path=self.storage_state)
+            logger.info(f'已保存登录状态: {self.storage_state}')
+        except Exception as e:
+            logger.warning(f'保存登录状态失败: {e}')
+    
+    def save_storage_state(self):
+        """save_storage_state_async的同步版本"""
+        return self._run_async(self.save_storage_state_async())
+    
+    async def _inject_scrollbar_style(self):
+        """注入CSS以强制显示滚动条"""
+        await self.page.add_style_tag(content="""
+            /* 强制显示滚动条 */
+            ::-webkit-scrollbar {
+                width: 12px !important;
+                height: 12px !important;
+                display: block !important;
+            }
+            ::-webkit-scrollbar-track {
+                background: #f1f1f1 !important;
+            }
+            ::-webkit-scrollbar-thumb {
+                background: #888 !important;
+                border-radius: 6px !important;
+            }
+            ::-webkit-scrollbar-thumb:hover {
+                background: #555 !important;
+            }
+            /* 为body和所有可滚动元素添加滚动条 */
+            body {
+                overflow: auto !important;
+                scrollbar-width: auto !important;
+                -ms-overflow-style: auto !important;
+            }
+            /* 确保所有可滚动容器都显示滚动条 */
+            .scrollable,
+            .overflow-auto,
+            .overflow-x-auto,
+            .overflow-y-auto {
+                overflow: auto !important;
+                scrollbar-width: auto !important;
+                -ms-overflow-style: auto !important;
+            }
+        """)
+    
+    async def _install_wait_hook_async(self):
+        """在当前页面安装等待钩子（已安装时不重复安装）"""
+        try:
+            await self.page.evaluate(WAIT_HOOK_SCRIPT)
+        except Exception as e:
+            logger.warning(f"安装页面等待钩子失败: {e}")
+    
+    async def _wait_ready_async(self, max_ms, quiet_ms=50):
+        """等待页面空闲：没有进行中的请求和DevExpress回调，且DOM在quiet_ms内没有变化
+        
+        最多等待max_ms（即原来固定等待的时间），并记录实际等待时间
+        
+        Args:
+            max_ms (int): 最长等待时间（毫秒）
+            quiet_ms (int): DOM保持不变的时间（毫秒）
+            
+        Returns:
+            float: 实际等待时间（毫秒）
+        """
+        start_time = time.perf_counter()
+        timed_out = False
+        try:
+            await self.page.wait_for_function(
+                "q => !window.__webworkWait || window.__webworkWait.idle(q)",
+                arg=quiet_ms, timeout=max_ms, polling='raf'
+            )
+        except Exception:
+            # 超时后继续执行，与原来的固定等待效果相同
+            timed_out = True
+        waited_ms = (time.perf_counter() - start_time) * 1000
+        
+        stats = self.wait_stats
+        stats['count'] += 1
+        stats['total_ms'] += waited_ms
+        stats['max_ms'] = max(stats['max_ms'], waited_ms)
+        if timed_out:
+            stats['timeouts'] += 1
+        logger.debug("等待页面就绪: %.0fms（上限 %sms%s）", waited_ms, max_ms, '，已超时' if timed_out else '')
+        return waited_ms
+    
+    def wait_summary(self):
+        """返回实际等待时间的统计摘要"""
+        stats = self.wait_stats
+        if not stats['count']:
+            return "没有发生等待"
+        return (f"共等待 {stats['count']} 次，总计 {stats['total_ms']:.0f}ms，"
+                f"平均 {stats['total_ms'] / stats['count']:.0f}ms，最长 {stats['max_ms']:.0f}ms，"
+                f"超时 {stats['timeouts']} 次")
+    
+    async def _measure_action_overhead(self, samples=5):
+        """测量每个Playwright操作的平均耗时（包含slow_mo）
+        
+        Args:
+            samples (int): 测量次数
+        """
+        try:
+            locator = self.page.locator('body')
+            start_time = time.perf_counter()
+            for _ in range(samples):
+                await locator.is_visible()
+            self.action_overhead_ms = (time.perf_counter() - start_time) * 1000 / samples
+            self._log(f'执行模式 {self.profile} 每个操作的平均开销: {self.action_overhead_ms:.1f} 毫秒')
+        except Exception as e:
+            self._log(f'测量操作开销失败: {e}', 'warn')
+    
     async def _detect_tables(self):
         """检测满足条件的table元素
         
         查找所有id符合"CPH_QGV_dxdt"+数字+"_QDGV_"+数字+"_DXMainTable"格式的table元素
-        两个数字保持一致
+        两个数字保持一致。在页面内一次查询完成匹配，同时返回每个表格可填写的行数
         """
         try:
-            import time
-            start_time = time.time()
+            start_time = time.perf_counter()
             self._log('\n开始检测满足条件的table元素...')
             
-            # 优化方法：使用更精确的CSS选择器和批处理
-            matching_tables = []
+            tables = await self.page.evaluate(DETECT_TABLES_SCRIPT, TABLE_ID_PATTERN)
+            matching_tables = [table['id'] for table in tables]
             
-            # 方法1：使用更精确的CSS选择器（最快）
-            try:
-                # 使用更精确的CSS选择器，直接匹配id格式
-                # 先获取所有可能的候选元素
-                candidate_tables = await self.page.locator('table[id*="CPH_QGV_dxdt"][id*="_QDGV_"][id*="_DXMainTable"]').all()
-                
-                if candidate_tables:
-                    self._log(f'使用精确CSS选择器筛选到 {len(candidate_tables)} 个候选table元素')
-                    
-                    # 对候选元素进行批处理
-                    import re
-                    pattern = r'^CPH_QGV_dxdt(\d+)_QDGV_\1_DXMainTable$'
-                    
-                    # 遍历候选元素
-                    for table in candidate_tables:
-                        # 获取table元素的id
-                        table_id = await table.get_attribute('id')
-                        if table_id:
-                            # 检查id是否符合格式
-                            if re.match(pattern, table_id):
-                                matching_tables.append(table_id)
-                                self._log(f'找到符合条件的table元素: {table_id}')
-            except Exception as css_error:
-                self._log(f'使用CSS选择器失败: {css_error}')
-                # 如果CSS选择器方法失败，回退到优化的原始方法
-                pass
-            
-            # 如果CSS选择器方法没有找到任何元素，使用优化的原始方法
-            if not matching_tables:
-                # 优化：限制一次性获取的元素数量
-                self._log('使用优化的原始方法进行检测...')
-                
-                # 先获取所有table元素的id属性（批处理）
-                table_elements = await self.page.locator('table').all()
-                self._log(f'找到 {len(table_elements)} 个table元素')
-                
-                import re
-                pattern = r'^CPH_QGV_dxdt(\d+)_QDGV_\1_DXMainTable$'
-                
-                # 遍历table元素，使用更高效的方式
-                for i, table in enumerate(table_elements):
-                    try:
-                        # 获取table元素的id
-                        table_id = await table.get_attribute('id')
-                        if table_id:
-                            # 检查id是否符合格式
-                            if re.match(pattern, table_id):
-                                matching_tables.append(table_id)
-                                self._log(f'找到符合条件的table元素: {table_id}')
-                    except Exception as e:
-                        # 单个元素处理失败，继续处理下一个
-                        continue
-            
-            # 保存匹配的表格
+            # 保存匹配的表格及其可填写行数
             self.matching_tables = matching_tables
+            self.table_row_counts = {table['id']: table['rows'] for table in tables}
             
             # 计算耗时
-            end_time = time.time()
-            elapsed_time = end_time - start_time
+            elapsed_time = time.perf_counter() - start_time
             
             # 输出结果
             self._log('\n检测完成！')
-            self._log(f'检测耗时: {elapsed_time:.2f} 秒')
+            self._log(f'检测耗时: {elapsed_time * 1000:.1f} 毫秒')
             self._log(f'共找到 {len(matching_tables)} 个满足条件的table元素')
             if matching_tables:
                 self._log('符合条件的table元素id:')
-                for table_id in matching_tables:
-                    self._log(f'  - {table_id}')
+                for table in tables:
+                    self._log(f"  - {table['id']}（{table['rows']} 行可填写）")
             else:
-                self._log('未找到符合条件的table元素')
+                self._log('未找到符合条件的table元素', 'warn')
+            
+            # 一次遍历建立单元格地址索引
+            await self._build_cell_index()
                 
         except Exception as e:
-            self._log(f"检测table元素失败: {e}")
+            self._log(f"检测table元素失败: {e}", 'error')
+    
+    async def _build_cell_index(self):
+        """建立单元格地址索引
+        
+        一次页面脚本遍历所有匹配的表格，记录每个单元格中具体元素的id，
+        填写时可直接按 #id 定位，不再对每个字段重新构建XPath并计数
+        """
+        if not self.matching_tables:
+            self.cell_index = {}
+            return
+        
+        try:
+            start_time = time.time()
+            self.cell_index = await self.page.evaluate(CELL_INDEX_SCRIPT, self.matching_tables)
+            # 表格重新渲染后下拉框选项也可能变化
+            self.option_maps = {}
+            self.table_row_counts = {table_id: len(rows) for table_id, rows in self.cell_index.items()}
+            cell_count = sum(
+                1 for rows in self.cell_index.values() for cells in rows for element_id in cells if element_id
+            )
+            self._log(f'单元格地址索引已建立: {cell_count} 个单元格，耗时 {time.time() - start_time:.2f} 秒')
+        except Exception as e:
+            self.cell_index = {}
+            self._log(f'建立单元格地址索引失败: {e}', 'warn')
+    
+    async def _refresh_cell_index_async(self):
+        """表格重新渲染后重建单元格地址索引
+        
+        Returns:
+            bool: 是否重建了索引
+        """
+        if not self.page or not self.matching_tables:
+            return False
+        
+        try:
+            dirty = await self.page.evaluate('() => window.__webworkCellIndexDirty !== false')
+        except Exception as e:
+            logger.warning(f"检查单元格地址索引状态失败: {e}")
+            dirty = True
+        
+        if dirty:
+            logger.info("表格已重新渲染，重建单元格地址索引")
+            await self._build_cell_index()
+        return dirty
+    
+    def refresh_cell_index(self):
+        """表格重新渲染后重建单元格地址索引（同步版本）
+        
+        Returns:
+            bool: 是否重建了索引
+        """
+        return self._run_async(self._refresh_cell_index_async())
+    
+    def get_table_row_count(self, table_id):
+        """获取表格可填写的行数
+        
+        行数在检测表格时得到，表格重新渲染后随单元格地址索引一起更新
+        
+        Args:
+            table_id (str): 表格id
+            
+        Returns:
+            int: 可填写的行数
+        """
+        self.refresh_cell_index()
+        return self.table_row_counts.get(table_id, 0)
+    
+    def _lookup_cell_id(self, element_identifier, row_index):
+        """在单元格地址索引中查找元素id
+        
+        Args:
+            element_identifier (dict): 元素标识符（需包含table_column和execute_fill生成的table_identifier）
+            row_index (int): 数据行索引
+            
+        Returns:
+            tuple: (indexed, element_id)，indexed表示索引中是否包含该行，
+                element_id为元素id（单元格无id时为None）
+        """
+        match = TABLE_IDENTIFIER_PATTERN.match(element_identifier.get('table_identifier', ''))
+        if not match:
+            return True, None
+        rows = self.cell_index.get(match.group(1))
+        if not rows or row_index >= len(rows):
+            return False, None
+        cells = rows[row_index]
+        column = element_identifier['table_column']
+        if not isinstance(column, int) or column < 1 or column > len(cells):
+            return True, None
+        return True, cells[column - 1]
     
     def _cleanup(self):
         """清理资源（已禁用）"""
         self._log('清理资源功能已禁用，保持浏览器打开')
         # 不清理任何资源，保持浏览器完全打开状态
     
-    def screenshot(self, file_path):
+    async def screenshot_async(self, file_path):
         """截图当前页面
         
         Args:
@@ -249,62 +834,56 @@ class WebAutomator:
         """
         try:
             if not self.page:
-                self._log("错误: 页面未连接")
+                self._log("错误: 页面未连接", 'error')
                 return None
             
             self._log(f"正在截图，保存到: {file_path}")
             
             # 使用Playwright的screenshot方法
-            self._run_async(self.page.screenshot(path=file_path, full_page=True))
+            await self.page.screenshot(path=file_path, full_page=True)
             
             self._log(f"截图成功: {file_path}")
             return file_path
         except Exception as e:
-            self._log(f"截图失败: {e}")
+            self._log(f"截图失败: {e}", 'error')
             return None
     
     def _run_async(self, coro):
-        """运行异步函数
+        """在事件循环线程中运行异步函数，并等待其结果
         
-        如果事件循环不存在或已关闭，会重新创建事件循环
+        Args:
+            coro: 协程对象
+            
+        Returns:
+            协程的返回值
         """
-        try:
-            # 检查事件循环状态
-            if self.loop is None or self.loop.is_closed():
-                # 事件循环不存在或已关闭，重新创建
-                print("事件循环不存在或已关闭，正在重新创建...")
-                self._recreate_event_loop()
-            
-            # 使用保存的事件循环运行异步函数
-            return self.loop.run_until_complete(coro)
-        except Exception as e:
-            print(f"运行异步函数失败: {e}")
-            # 尝试重新创建事件循环并重试
-            try:
-                print("尝试重新创建事件循环并重试...")
-                self._recreate_event_loop()
-                return self.loop.run_until_complete(coro)
-            except Exception as retry_error:
-                print(f"重试失败: {retry_error}")
-                raise
+        if self.loop is None or self.loop.is_closed() or not self.loop_thread.is_alive():
+            coro.close()
+            raise RuntimeError('事件循环未运行')
+        if threading.current_thread() is self.loop_thread:
+            # 在事件循环线程内等待会导致死锁，应直接await对应的异步方法
+            coro.close()
+            raise RuntimeError('不能在事件循环线程中调用同步方法')
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
     
-    def _recreate_event_loop(self):
-        """重新创建事件循环"""
-        try:
-            # 关闭旧的事件循环（如果存在）
-            if self.loop is not None and not self.loop.is_closed():
-                self.loop.close()
-                print("旧事件循环已关闭")
-            
-            # 创建新的事件循环
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            print("新事件循环已创建")
-        except Exception as e:
-            print(f"重新创建事件循环失败: {e}")
-            raise
+    def submit(self, coro):
+        """把协程提交到事件循环线程，不等待其完成
+        
+        调用方可以同时提交多个操作，再分别等待结果
+        
+        Args:
+            coro: 协程对象
+            
+        Returns:
+            concurrent.futures.Future: 协程结果的Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
     
     def _find_element(self, element_identifier, row_index=0):
+        """查找网页元素（同步版本）"""
+        return self._run_async(self._find_element_async(element_identifier, row_index))
+    
+    async def _find_element_async(self, element_identifier, row_index=0):
         """查找网页元素
         
         Args:
@@ -335,329 +914,706 @@ class WebAutomator:
                 return self.page.locator(element_identifier['css_selector'])
             # 按表格列号查找
             elif 'table_column' in element_identifier:
-                column = element_identifier['table_column']
-                table_identifier = element_identifier.get('table_identifier', '')
-                
-                # 构建基础选择器
-                base_selector = table_identifier if table_identifier else "//table"
-                
-                # 首先尝试使用ID直接定位（如果有）
-                if 'id' in element_identifier:
-                    try:
-                        locator = self.page.locator(f"#{element_identifier['id']}")
-                        # 直接尝试获取元素，不先调用count()
-                        try:
-                            first_element = locator.first
-                            is_visible = self._run_async(first_element.is_visible())
-                            if is_visible:
-                                print(f"使用ID定位器: #{element_identifier['id']}")
-                                return locator
-                        except:
-                            pass
-                    except:
-                        pass
-                
-                # 清理base_selector，确保它不会导致重复的//tr
-                # 检查base_selector是否已经包含//tr
-                if "//tr" in base_selector:
-                    # 如果已经包含//tr，直接添加/td
-                    # 例如：//table//tr[position()>=3] 变成 //table//tr[position()>=3]/td[7]
-                    td_selector = f"{base_selector}/td[{column}]"
-                else:
-                    # 否则，添加//tr/td
-                    td_selector = f"{base_selector}//tr/td[{column}]"
-                
-                # 打印构建的选择器，方便调试
-                print(f"构建的选择器: {td_selector}")
-                
-                # 尝试多种定位策略（减少策略数量，提高速度）
-                strategies = [
-                    # 1. 优先定位有id属性的单元格
-                    f"{td_selector}[@id]",
-                    # 2. 通用定位
-                    td_selector
-                ]
-                
-                # 尝试每个策略
-                for strategy in strategies:
-                    try:
-                        locator = self.page.locator(strategy)
-                        # 直接尝试获取元素，不先调用count()
-                        try:
-                            # 尝试获取第一个元素
-                            first_element = locator.first
-                            # 检查元素是否存在
-                            is_visible = self._run_async(first_element.is_visible())
-                            if is_visible:
-                                print(f"使用表格定位策略: {strategy}")
-                                # 如果匹配到多个元素，根据row_index选择对应的元素
-                                try:
-                                    # 只在需要时才调用count()
-                                    if row_index > 0:
-                                        count = self._run_async(locator.count())
-                                        if count > 1 and row_index < count:
-                                            print(f"匹配到多个元素，使用第 {row_index + 1} 个元素")
-                                            return locator.nth(row_index)
-                                    # 默认返回第一个元素
-                                    return locator.first
-                                except:
-                                    # 如果count()失败，直接返回第一个元素
-                                    return locator.first
-                        except Exception as e:
-                            print(f"策略 {strategy} 获取元素失败: {e}")
-                            continue
-                    except Exception as e:
-                        print(f"策略 {strategy} 失败: {e}")
-                        continue
-                
-                # 不再使用硬编码的单元格ID，因为它可能不正确
-                # 直接使用基于列号的定位器
-                
-                # 如果所有策略都失败，使用原始的定位器
-                print("警告: 所有表格定位策略都失败，使用原始定位器")
-                final_locator = self.page.locator(td_selector)
-                return final_locator.first
+                return await self._find_table_cell_async(element_identifier, row_index)
             else:
                 raise Exception('元素标识符格式错误')
         except Exception as e:
             raise Exception(f"无法找到元素: {element_identifier}, 错误: {e}")
     
-    def fill_input(self, element_identifier, value, row_index=0):
+    async def _find_table_cell_async(self, element_identifier, row_index=0):
+        """按表格列号查找单元格
+        
+        依次尝试各个定位策略，并把成功的策略记入定位策略缓存；
+        已缓存策略的字段直接使用该策略，不再逐个探测可见性
+        
+        Args:
+            element_identifier (dict): 元素标识符，包含table_column和table_identifier
+            row_index (int): 数据行索引
+            
+        Returns:
+            Locator: 找到的网页元素定位器
+        """
+        column = element_identifier['table_column']
+        table_identifier = element_identifier.get('table_identifier', '')
+        
+        # 构建基础选择器
+        base_selector = table_identifier if table_identifier else "//table"
+        
+        # 清理base_selector，确保它不会导致重复的//tr
+        # 检查base_selector是否已经包含//tr
+        if "//tr" in base_selector:
+            # 如果已经包含//tr，直接添加/td
+            # 例如：//table//tr[position()>=3] 变成 //table//tr[position()>=3]/td[7]
+            td_selector = f"{base_selector}/td[{column}]"
+        else:
+            # 否则，添加//tr/td
+            td_selector = f"{base_selector}//tr/td[{column}]"
+        
+        # 已缓存的策略直接使用，失效时由_locate_visible移除并重新查找
+        cache_key = SelectorCache.make_key(element_identifier)
+        cached_strategy = self.selector_cache.get(cache_key, 'find')
+        keep_cached = False
+        if cached_strategy:
+            locator = await self._table_cell_locator_async(cached_strategy, element_identifier, row_index, td_selector)
+            if locator is not None:
+                return locator
+            # 索引中有该行但单元格没有id时只是本行不适用，保留缓存并尝试其他策略
+            keep_cached = self._indexed_without_id(cached_strategy, element_identifier, row_index)
+            if not keep_cached:
+                self.selector_cache.evict(cache_key)
+        
+        # 打印构建的选择器，方便调试
+        logger.debug("构建的选择器: %s", td_selector)
+        
+        # 尝试多种定位策略（减少策略数量，提高速度）：
+        # 1. 单元格地址索引中的元素id；2. 配置中的ID；3. 有id属性的单元格；4. 通用定位
+        for strategy in ('index', 'id', 'td_id', 'td'):
+            try:
+                locator = await self._table_cell_locator_async(strategy, element_identifier, row_index, td_selector)
+                if locator is None:
+                    continue
+                # 检查元素是否存在
+                if await locator.first.is_visible():
+                    logger.debug("使用表格定位策略: %s", strategy)
+                    if not keep_cached:
+                        self.selector_cache.put(cache_key, 'find', strategy)
+                    return locator
+            except Exception as e:
+                logger.debug("策略 %s 获取元素失败: %s", strategy, e)
+                continue
+        
+        # 不再使用硬编码的单元格ID，因为它可能不正确
+        # 直接使用基于列号的定位器
+        
+        # 如果所有策略都失败，使用原始的定位器
+        logger.warning("警告: 所有表格定位策略都失败，使用原始定位器")
+        self._fallback(f"所有表格定位策略都失败，使用原始定位器: {td_selector}")
+        return self.page.locator(td_selector).first
+    
+    def _indexed_without_id(self, strategy, element_identifier, row_index):
+        """判断index策略是否因为该行单元格没有id而不适用
+        
+        Args:
+            strategy (str): 定位策略
+            element_identifier (dict): 元素标识符
+            row_index (int): 数据行索引
+            
+        Returns:
+            bool: 策略为index、索引中包含该行且单元格没有id时返回True
+        """
+        if strategy != 'index':
+            return False
+        indexed, cell_id = self._lookup_cell_id(element_identifier, row_index)
+        return indexed and cell_id is None
+    
+    async def _table_cell_locator_async(self, strategy, element_identifier, row_index, td_selector):
+        """按指定策略构建单元格定位器
+        
+        Args:
+            strategy (str): 定位策略（index、id、td_id、td）
+            element_identifier (dict): 元素标识符
+            row_index (int): 数据行索引
+            td_selector (str): 单元格XPath
+            
+        Returns:
+            Locator: 单元格定位器，该策略不适用时返回None
+        """
+        if strategy == 'index':
+            indexed, cell_id = self._lookup_cell_id(element_identifier, row_index)
+            if not indexed and self.cell_index and await self._refresh_cell_index_async():
+                # 索引中没有该行，表格可能已重新渲染
+                indexed, cell_id = self._lookup_cell_id(element_identifier, row_index)
+            return self.page.locator(f"#{cell_id}") if cell_id else None
+        if strategy == 'id':
+            if 'id' not in element_identifier:
+                return None
+            return self.page.locator(f"#{element_identifier['id']}")
+        if strategy == 'td_id':
+            locator = self.page.locator(f"{td_selector}[@id]")
+        elif strategy == 'td':
+            locator = self.page.locator(td_selector)
+        else:
+            return None
+        # 如果匹配到多个元素，根据row_index选择对应的元素
+        return locator.nth(row_index) if row_index > 0 else locator.first
+    
+    async def _locate_visible_async(self, element_identifier, row_index, timeout):
+        """查找元素并等待其可见
+        
+        使用缓存的定位策略失败时，移除缓存并重新查找一次；
+        缓存的index策略只是对本行不适用（单元格没有id）时不移除缓存
+        
+        Args:
+            element_identifier (dict): 元素标识符
+            row_index (int): 数据行索引
+            timeout (int): 等待可见的超时时间（毫秒）
+            
+        Returns:
+            Locator: 可见元素的定位器
+        """
+        cache_key = SelectorCache.make_key(element_identifier)
+        cached = 'table_column' in element_identifier and self.selector_cache.get(cache_key, 'find')
+        if cached and self._indexed_without_id(cached, element_identifier, row_index):
+            # 本行单元格没有id，已改用其他策略定位，缓存的index策略并未失效
+            cached = None
+        locator = await self._find_element_async(element_identifier, row_index)
+        try:
+            await locator.wait_for(state='visible', timeout=timeout)
+            return locator
+        except Exception:
+            if not cached:
+                raise
+        # 缓存的策略已失效，可能表格已重新渲染
+        self.selector_cache.evict(cache_key)
+        await self._refresh_cell_index_async()
+        locator = await self._find_element_async(element_identifier, row_index)
+        await locator.wait_for(state='visible', timeout=timeout)
+        return locator
+    
+    async def _find_inner_async(self, locator, element_identifier, tag):
+        """查找元素内部的input/select元素
+        
+        结果记入定位策略缓存，已缓存的字段不再探测可见性
+        
+        Args:
+            locator (Locator): 已找到的元素定位器
+            element_identifier (dict): 元素标识符
+            tag (str): 内部元素标签（input或select）
+            
+        Returns:
+            Locator: 内部元素的定位器，找不到时返回原始定位器
+        """
+        cache_key = SelectorCache.make_key(element_identifier)
+        cached = self.selector_cache.get(cache_key, tag)
+        if cached == 'inner':
+            return locator.locator(tag)
+        if cached == 'self':
+            return locator
+        
+        try:
+            # 尝试在找到的元素内查找内部元素
+            inner_locator = locator.locator(tag)
+            # 直接尝试获取第一个内部元素，不先调用count()
+            if await inner_locator.first.is_visible():
+                logger.debug("找到内部%s元素", tag)
+                self.selector_cache.put(cache_key, tag, 'inner')
+                return inner_locator
+            logger.debug("未找到内部%s元素，使用原始locator", tag)
+        except Exception as e:
+            logger.debug("查找内部%s元素失败: %s", tag, e)
+        self.selector_cache.put(cache_key, tag, 'self')
+        return locator
+    
+    async def fill_input_async(self, element_identifier, value, row_index=0):
         """填写输入框
         
         Args:
             element_identifier (dict): 元素标识符
             value (str): 要填写的值
             row_index (int): 数据行索引
+            
+        Returns:
+            bool: 是否填写成功
         """
         try:
-            locator = self._find_element(element_identifier, row_index)
-            # 等待元素可见
-            self._run_async(locator.wait_for(state='visible', timeout=1000))
+            # 查找元素并等待可见
+            locator = await self._locate_visible_async(element_identifier, row_index, timeout=1000)
             
             # 尝试找到内部的input元素
-            input_locator = None
-            try:
-                # 尝试在找到的元素内查找input元素
-                input_locator = locator.locator("input")
-                # 直接尝试获取第一个input元素，不先调用count()
-                try:
-                    first_input = input_locator.first
-                    is_visible = self._run_async(first_input.is_visible())
-                    if is_visible:
-                        print("找到内部input元素")
-                        # 使用内部的input元素
-                        locator = input_locator
-                    else:
-                        print("未找到内部input元素，使用原始locator")
-                except:
-                    print("未找到内部input元素，使用原始locator")
-            except Exception as input_find_error:
-                print(f"查找内部input元素失败: {input_find_error}")
+            locator = await self._find_inner_async(locator, element_identifier, 'input')
             
             # 尝试直接填充值
             try:
-                self._run_async(locator.fill(str(value)))
-                print(f"已填写输入框: {element_identifier.get('id', element_identifier.get('class_name', 'unknown'))} = {value}")
+                await locator.fill(str(value))
+                logger.debug("已填写输入框: %s = %s", element_identifier.get('id', element_identifier.get('class_name', 'unknown')), value)
+                return True
             except Exception as fill_error:
-                print(f"直接填充失败: {fill_error}")
-                # 尝试点击元素，可能会弹出编辑框
-                self._run_async(locator.click())
-                # 减少等待时间，从1000ms减少到200ms
-                self._run_async(self.page.wait_for_timeout(200))
-                
-                # 尝试找到当前聚焦的元素并输入
-                try:
-                    # 尝试在当前聚焦的元素上输入
-                    self._run_async(self.page.keyboard.type(str(value)))
-                    print(f"已点击并输入值: {element_identifier.get('id', element_identifier.get('class_name', 'unknown'))} = {value}")
-                except Exception as keyboard_error:
-                    print(f"键盘输入失败: {keyboard_error}")
-                    # 尝试查找新生成的输入框
+                logger.debug("直接填充失败: %s", fill_error)
+                self._fallback(f"直接填充失败，使用点击和键盘输入: {fill_error}")
+                # 点击和键盘输入依赖页面焦点，并发写入时需要串行执行
+                async with self._keyboard_lock:
+                    # 尝试点击元素，可能会弹出编辑框
+                    await locator.click()
+                    # 等待页面响应点击（最多200ms）
+                    await self._wait_ready_async(200)
+                    
+                    # 尝试找到当前聚焦的元素并输入
                     try:
-                        # 查找可能新生成的输入框
-                        input_locator = self.page.locator("input:focus")
-                        count = self._run_async(input_locator.count())
-                        if count > 0:
-                            self._run_async(input_locator.fill(str(value)))
-                            print(f"已找到并填写新生成的输入框: {value}")
-                        else:
-                            # 尝试查找所有可见的输入框
-                            input_locator = self.page.locator("input:visible")
-                            # 直接尝试获取第一个输入框，不先调用count()
-                            try:
-                                first_input = input_locator.first
-                                is_visible = self._run_async(first_input.is_visible())
-                                if is_visible:
-                                    self._run_async(first_input.fill(str(value)))
-                                    print(f"已找到并填写第一个可见的输入框: {value}")
-                                else:
-                                    print("无法找到可填写的输入框")
-                            except Exception as visible_input_error:
-                                print(f"查找可见输入框失败: {visible_input_error}")
-                                print("无法找到可填写的输入框")
-                    except Exception as input_error:
-                        print(f"查找输入框失败: {input_error}")
+                        # 尝试在当前聚焦的元素上输入
+                        await self.page.keyboard.type(str(value))
+                        logger.debug("已点击并输入值: %s = %s", element_identifier.get('id', element_identifier.get('class_name', 'unknown')), value)
+                        return True
+                    except Exception as keyboard_error:
+                        logger.debug("键盘输入失败: %s", keyboard_error)
+                        # 尝试查找新生成的输入框
+                        try:
+                            # 查找可能新生成的输入框
+                            input_locator = self.page.locator("input:focus")
+                            count = await input_locator.count()
+                            if count > 0:
+                                await input_locator.fill(str(value))
+                                logger.debug("已找到并填写新生成的输入框: %s", value)
+                                return True
+                            else:
+                                # 尝试查找所有可见的输入框
+                                input_locator = self.page.locator("input:visible")
+                                # 直接尝试获取第一个输入框，不先调用count()
+                                try:
+                                    first_input = input_locator.first
+                                    is_visible = await first_input.is_visible()
+                                    if is_visible:
+                                        await first_input.fill(str(value))
+                                        logger.debug("已找到并填写第一个可见的输入框: %s", value)
+                                        return True
+                                    else:
+                                        logger.warning("无法找到可填写的输入框")
+                                except Exception as visible_input_error:
+                                    logger.warning(f"查找可见输入框失败: {visible_input_error}")
+                                    logger.warning("无法找到可填写的输入框")
+                        except Exception as input_error:
+                            logger.warning(f"查找输入框失败: {input_error}")
         except Exception as e:
-            print(f"填写输入框时出错: {e}")
+            logger.warning(f"填写输入框时出错: {e}")
             # 出错时不关闭浏览器，继续执行
+        return False
     
-    def select_option(self, element_identifier, value, row_index=0):
+    async def select_option_async(self, element_identifier, value, row_index=0):
         """选择下拉框选项
         
+        原生select元素的选项每个页面只读取一次，在Python中解析出确切的选项值后一次选择；
+        解析失败时依次尝试按值、按文本、按索引选择，自定义下拉框直接使用点击方式
+        
         Args:
             element_identifier (dict): 元素标识符
             value (str): 要选择的值
             row_index (int): 数据行索引
+            
+        Returns:
+            bool: 是否选择成功
         """
         try:
-            locator = self._find_element(element_identifier, row_index)
-            # 等待元素可见
-            self._run_async(locator.wait_for(state='visible', timeout=100))
+            # 查找元素并等待可见
+            locator = await self._locate_visible_async(element_identifier, row_index, timeout=100)
             
             # 尝试找到内部的select元素
-            select_locator = None
-            try:
-                # 尝试在找到的元素内查找select元素
-                select_locator = locator.locator("select")
-                # 直接尝试获取第一个select元素，不先调用count()
+            locator = await self._find_inner_async(locator, element_identifier, 'select')
+            
+            # 使用选项表解析出确切的选项值
+            option_key = SelectorCache.make_key(element_identifier)
+            options = await self._get_option_map_async(option_key, locator)
+            if options is None:
+                # 不是原生select元素，直接使用点击方式
+                logger.debug("不是原生下拉框，使用点击方式选择选项...")
+                self._fallback("不是原生下拉框，使用点击方式选择选项")
+                await self._select_by_click_async(locator, value)
+                return True
+            
+            option_value = self._resolve_option(options, value)
+            if option_value is not None:
                 try:
-                    first_select = select_locator.first
-                    is_visible = self._run_async(first_select.is_visible())
-                    if is_visible:
-                        print("找到内部select元素")
-                        # 使用内部的select元素
-                        locator = select_locator
-                    else:
-                        print("未找到内部select元素，使用原始locator")
-                except:
-                    print("未找到内部select元素，使用原始locator")
-            except Exception as select_find_error:
-                print(f"查找内部select元素失败: {select_find_error}")
+                    await locator.select_option(value=option_value)
+                    logger.debug("成功选择选项（按选项表）: %s → %s", value, option_value)
+                    return True
+                except Exception as option_error:
+                    # 选项可能已变化，下次重新读取
+                    logger.debug("按选项表选择失败: %s", option_error)
+                    self.option_maps.pop(option_key, None)
             
             # 尝试选择选项
+            self._fallback(f"按选项表无法选择 {value}，依次尝试按值、文本、索引选择")
             # 首先尝试按值选择（从错误信息看这个成功率更高）
             try:
-                self._run_async(locator.select_option(value=str(value)))
-                print(f"成功选择选项（按值）: {value}")
-                return
+                await locator.select_option(value=str(value))
+                logger.debug("成功选择选项（按值）: %s", value)
+                return True
             except Exception as value_error:
-                print(f"按值选择失败: {value_error}")
+                logger.debug("按值选择失败: %s", value_error)
                 
                 # 尝试按可见文本选择
                 try:
-                    self._run_async(locator.select_option(label=str(value)))
-                    print(f"成功选择选项（按文本）: {value}")
-                    return
+                    await locator.select_option(label=str(value))
+                    logger.debug("成功选择选项（按文本）: %s", value)
+                    return True
                 except Exception as label_error:
-                    print(f"按文本选择失败: {label_error}")
+                    logger.debug("按文本选择失败: %s", label_error)
                     
                     # 尝试按索引选择
                     try:
                         index = int(value)
-                        self._run_async(locator.select_option(index=index))
-                        print(f"成功选择选项（按索引）: {value}")
-                        return
+                        await locator.select_option(index=index)
+                        logger.debug("成功选择选项（按索引）: %s", value)
+                        return True
                     except Exception as index_error:
-                        print(f"按索引选择失败: {index_error}")
+                        logger.debug("按索引选择失败: %s", index_error)
                         
                         # 如果所有标准方法都失败，使用点击方式
-                        print("尝试使用点击方式选择选项...")
-                        try:
-                            # 点击下拉框展开
-                            self._run_async(locator.click())
-                            print("已点击下拉框")
-                            
-                            # 减少等待时间，从1500ms减少到500ms
-                            self._run_async(self.page.wait_for_timeout(500))
-                            
-                            # 尝试查找包含目标文本的选项
-                            option_selectors = [
-                                f"option:has-text('{value}')",
-                                f"li:has-text('{value}')",
-                                f"div:has-text('{value}')",
-                                f"span:has-text('{value}')",
-                                f"[role='option']:has-text('{value}')",
-                            ]
-                            
-                            option_found = False
-                            for option_selector in option_selectors:
-                                try:
-                                    option_locator = self.page.locator(option_selector)
-                                    # 直接尝试获取第一个选项，不先调用count()
-                                    try:
-                                        first_option = option_locator.first
-                                        # 等待选项可见
-                                        self._run_async(first_option.wait_for(state='visible', timeout=3000))
-                                        print(f"找到匹配的选项: {option_selector}")
-                                        # 点击第一个匹配的选项
-                                        self._run_async(first_option.click())
-                                        print(f"成功点击选项: {value}")
-                                        option_found = True
-                                        break
-                                    except Exception as option_error:
-                                        print(f"使用选择器 {option_selector} 查找选项失败: {option_error}")
-                                        continue
-                                except Exception as option_error:
-                                    print(f"使用选择器 {option_selector} 查找选项失败: {option_error}")
-                                    continue
-                            
-                            if not option_found:
-                                # 如果找不到选项，尝试使用键盘导航
-                                print("未找到选项，尝试使用键盘导航...")
-                                # 按下箭头键展开下拉列表
-                                self._run_async(self.page.keyboard.press("ArrowDown"))
-                                self._run_async(self.page.wait_for_timeout(500))
-                                
-                                # 尝试输入部分文本来过滤选项
-                                self._run_async(self.page.keyboard.type(str(value)))
-                                self._run_async(self.page.wait_for_timeout(800))
-                            
-                            # 按Enter确认
-                            self._run_async(self.page.keyboard.press("Enter"))
-                            print(f"已使用键盘输入选项: {value}")
-                            
-                        except Exception as click_error:
-                            print(f"点击方式选择选项失败: {click_error}")
-                            raise
+                        self._fallback(f"按值、文本、索引都无法选择 {value}，使用点击方式")
+                        await self._select_by_click_async(locator, value)
+                        return True
         except Exception as e:
-            print(f"选择下拉框选项时出错: {e}")
+            logger.warning(f"选择下拉框选项时出错: {e}")
             # 出错时不关闭浏览器，继续执行
+        return False
     
-    def fill_textarea(self, element_identifier, value, row_index=0):
+    async def _get_option_map_async(self, option_key, locator):
+        """获取下拉框的选项表（每个页面每个字段只读取一次）
+        
+        Args:
+            option_key (str): 字段映射的缓存键
+            locator (Locator): 下拉框定位器
+            
+        Returns:
+            dict: 选项表（values、labels、by_index），不是原生select元素时返回None
+        """
+        if option_key in self.option_maps:
+            return self.option_maps[option_key]
+        
+        try:
+            pairs = await locator.first.evaluate(
+                "el => el.tagName === 'SELECT' ? Array.from(el.options).map(o => [o.value, o.text.trim()]) : null"
+            )
+        except Exception as e:
+            logger.warning(f"读取下拉框选项失败: {e}")
+            return {}
+        
+        if pairs is None:
+            options = None
+        else:
+            options = {
+                'values': {option_value for option_value, _ in pairs},
+                'labels': {},
+                'by_index': [option_value for option_value, _ in pairs],
+            }
+            for option_value, label in pairs:
+                options['labels'].setdefault(label, option_value)
+            logger.debug("已读取下拉框选项: %s 个", len(pairs))
+        self.option_maps[option_key] = options
+        return options
+    
+    @staticmethod
+    def _resolve_option(options, value):
+        """在选项表中解析要选择的选项值
+        
+        与原有的选择顺序一致：先按值，再按文本，最后按索引
+        
+        Args:
+            options (dict): 选项表
+            value: 要选择的值
+            
+        Returns:
+            str: 选项值，无法解析时返回None
+        """
+        if not options:
+            return None
+        text = str(value)
+        if text in options['values']:
+            return text
+        if text.strip() in options['labels']:
+            return options['labels'][text.strip()]
+        try:
+            index = int(value)
+        except (TypeError, ValueError):
+            return None
+        if 0 <= index < len(options['by_index']):
+            return options['by_index'][index]
+        return None
+    
+    async def _select_by_click_async(self, locator, value):
+        """使用点击方式选择选项（用于自定义下拉框）
+        
+        Args:
+            locator (Locator): 下拉框定位器
+            value (str): 要选择的值
+        """
+        logger.debug("尝试使用点击方式选择选项...")
+        # 点击和键盘输入依赖页面焦点，并发写入时需要串行执行
+        async with self._keyboard_lock:
+            try:
+                # 点击下拉框展开
+                await locator.click()
+                logger.debug("已点击下拉框")
+                
+                # 等待下拉框展开（最多500ms）
+                await self._wait_ready_async(500)
+                
+                # 尝试查找包含目标文本的选项
+                option_selectors = [
+                    f"option:has-text('{value}')",
+                    f"li:has-text('{value}')",
+                    f"div:has-text('{value}')",
+                    f"span:has-text('{value}')",
+                    f"[role='option']:has-text('{value}')",
+                ]
+                
+                option_found = False
+                for option_selector in option_selectors:
+                    try:
+                        option_locator = self.page.locator(option_selector)
+                        # 直接尝试获取第一个选项，不先调用count()
+                        first_option = option_locator.first
+                        # 等待选项可见
+                        await first_option.wait_for(state='visible', timeout=3000)
+                        logger.debug("找到匹配的选项: %s", option_selector)
+                        # 点击第一个匹配的选项
+                        await first_option.click()
+                        logger.debug("成功点击选项: %s", value)
+                        option_found = True
+                        break
+                    except Exception as option_error:
+                        logger.debug("使用选择器 %s 查找选项失败: %s", option_selector, option_error)
+                        continue
+                
+                if not option_found:
+                    # 如果找不到选项，尝试使用键盘导航
+                    logger.debug("未找到选项，尝试使用键盘导航...")
+                    # 按下箭头键展开下拉列表
+                    await self.page.keyboard.press("ArrowDown")
+                    await self._wait_ready_async(500)
+                    
+                    # 尝试输入部分文本来过滤选项
+                    await self.page.keyboard.type(str(value))
+                    await self._wait_ready_async(800)
+                
+                # 按Enter确认
+                await self.page.keyboard.press("Enter")
+                logger.debug("已使用键盘输入选项: %s", value)
+                
+            except Exception as click_error:
+                logger.warning(f"点击方式选择选项失败: {click_error}")
+                raise
+    
+    async def fill_textarea_async(self, element_identifier, value, row_index=0):
         """填写文本区域
         
         Args:
             element_identifier (dict): 元素标识符
             value (str): 要填写的值
             row_index (int): 数据行索引
+            
+        Returns:
+            bool: 是否填写成功
         """
         try:
-            locator = self._find_element(element_identifier, row_index)
-            # 等待元素可见
-            self._run_async(locator.wait_for(state='visible', timeout=10000))
+            # 查找元素并等待可见
+            locator = await self._locate_visible_async(element_identifier, row_index, timeout=10000)
             
             # 尝试直接填充值
             try:
-                self._run_async(locator.fill(str(value)))
-                print(f"已填写文本区域: {element_identifier.get('id', element_identifier.get('class_name', 'unknown'))} = {value}")
+                await locator.fill(str(value))
+                logger.debug("已填写文本区域: %s = %s", element_identifier.get('id', element_identifier.get('class_name', 'unknown')), value)
+                return True
             except Exception as fill_error:
-                print(f"直接填充失败: {fill_error}")
-                # 尝试点击元素
-                self._run_async(locator.click())
-                self._run_async(self.page.wait_for_timeout(200))
-                
-                # 尝试使用键盘输入
-                try:
-                    self._run_async(self.page.keyboard.type(str(value)))
-                    print(f"已点击并输入值: {element_identifier.get('id', element_identifier.get('class_name', 'unknown'))} = {value}")
-                except Exception as keyboard_error:
-                    print(f"键盘输入失败: {keyboard_error}")
+                logger.debug("直接填充失败: %s", fill_error)
+                self._fallback(f"直接填充失败，使用点击和键盘输入: {fill_error}")
+                # 点击和键盘输入依赖页面焦点，并发写入时需要串行执行
+                async with self._keyboard_lock:
+                    # 尝试点击元素
+                    await locator.click()
+                    await self._wait_ready_async(200)
+                    
+                    # 尝试使用键盘输入
+                    try:
+                        await self.page.keyboard.type(str(value))
+                        logger.debug("已点击并输入值: %s = %s", element_identifier.get('id', element_identifier.get('class_name', 'unknown')), value)
+                        return True
+                    except Exception as keyboard_error:
+                        logger.debug("键盘输入失败: %s", keyboard_error)
         except Exception as e:
-            print(f"填写文本区域时出错: {e}")
+            logger.warning(f"填写文本区域时出错: {e}")
             # 出错时不关闭浏览器，继续执行
+        return False
+    
+    async def _fill_cell_async(self, element_type, element_identifier, value, row_index):
+        """按元素类型填写单个网页元素并计数，返回是否填写成功"""
+        if element_type == 'input':
+            ok = await self.fill_input_async(element_identifier, value, row_index)
+        elif element_type == 'select':
+            ok = await self.select_option_async(element_identifier, value, row_index)
+        elif element_type == 'textarea':
+            ok = await self.fill_textarea_async(element_identifier, value, row_index)
+        else:
+            logger.warning(f"警告: 不支持的元素类型 {element_type}")
+            ok = False
+        if ok:
+            self.events.count('writes')
+        else:
+            self.events.count('failures')
+            self.events.publish(FAILURE, f"{element_type}写入失败（第 {row_index + 1} 行）: {element_identifier}", 'error')
+        return ok
+    
+    async def _try_fill_cell_async(self, element_type, element_identifier, value, row_index):
+        """填写单个网页元素，出错时记录并计为写入失败（不影响同一批的其他单元格）"""
+        try:
+            return await self._fill_cell_async(element_type, element_identifier, value, row_index)
+        except Exception as e:
+            logger.warning(f"写入单元格时出错（第 {row_index + 1} 行）: {e}")
+            self.events.count('failures')
+            self.events.publish(FAILURE, f"{element_type}写入出错（第 {row_index + 1} 行）: {element_identifier}: {e}", 'error')
+            return False
+    
+    async def fill_cells_async(self, cells, concurrency=4):
+        """并发填写多个单元格
+        
+        普通单元格在信号量限制下并发写入；会触发DevExpress回调的单元格按原有顺序单独写入，
+        写入前等待之前的并发写入全部完成，写入后才开始后续单元格
+        
+        Args:
+            cells (list): (element_type, element_identifier, value, row_index, callback) 元组列表
+            concurrency (int): 最大并发写入数
+            
+        Returns:
+            list: 与cells一一对应的填写结果（True表示成功）
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        results = [False] * len(cells)
+        
+        async def write(position):
+            async with semaphore:
+                results[position] = await self._try_fill_cell_async(*cells[position][:4])
+        
+        batch = []
+        for position, cell in enumerate(cells):
+            if cell[4]:
+                # 触发回调的单元格：先完成之前的并发写入，再单独写入
+                if batch:
+                    await asyncio.gather(*(write(p) for p in batch))
+                    batch = []
+                results[position] = await self._try_fill_cell_async(*cell[:4])
+            else:
+                batch.append(position)
+        if batch:
+            await asyncio.gather(*(write(p) for p in batch))
+        return results
+    
+    async def read_table_values_async(self, table_id, columns):
+        """一次读取表格中指定列的当前值
+        
+        Args:
+            table_id (str): 表格id
+            columns (list): 列号列表（从1开始）
+            
+        Returns:
+            list: 每行一个字典：列号 → 当前值（见cell_value_matches），读取失败时返回空列表
+        """
+        if not self.page or not columns:
+            return []
+        try:
+            rows = await self.page.evaluate(
+                READ_TABLE_VALUES_SCRIPT, {'tableId': table_id, 'columns': sorted(set(columns))}
+            )
+            return [{int(column): value for column, value in row.items()} for row in rows]
+        except Exception as e:
+            logger.warning(f"读取表格 {table_id} 当前值失败: {e}")
+            return []
+    
+    @staticmethod
+    def cell_value_matches(current, value):
+        """判断单元格的当前值是否已经等于要填写的值
+        
+        Args:
+            current (dict): read_table_values_async返回的单元格当前值
+            value: 要填写的值
+            
+        Returns:
+            bool: 是否相同（相同则不需要写入）
+        """
+        if not current:
+            return False
+        text = '' if value is None else str(value).strip()
+        candidates = [current.get('value'), current.get('label')]
+        if current.get('index') is not None:
+            candidates.append(str(current['index']))
+        for candidate in candidates:
+            if candidate is None:
+                continue
+            candidate = str(candidate).strip()
+            if candidate == text:
+                return True
+            # 数字按数值比较，例如 12.5 与 "12.50"
+            try:
+                if float(candidate.replace(',', '')) == float(text):
+                    return True
+            except ValueError:
+                pass
+        return False
+    
+    async def fill_table_bulk_async(self, table_id, cells):
+        """批量填写一个表格中的单元格
+
+        在页面内一次执行脚本完成整张表格的填写，并触发input/change事件，
+        避免逐个单元格的定位和等待往返。
+
+        Args:
+            table_id (str): 表格id
+            cells (list): (row_index, column, value, element_type) 元组列表，
+                row_index从0开始（对应第3行起的数据行），column从1开始
+
+        Returns:
+            list: 与cells一一对应的填写结果（True表示成功）
+        """
+        if not self.page:
+            self._log("错误: 页面未连接", 'error')
+            return [False] * len(cells)
+
+        if not cells:
+            return []
+
+        try:
+            payload = [
+                [row_index, column, None if value is None else str(value), element_type]
+                for row_index, column, value, element_type in cells
+            ]
+            results = await self.page.evaluate(
+                BULK_FILL_SCRIPT, {'tableId': table_id, 'cells': payload}
+            )
+            success_count = sum(1 for result in results if result)
+            logger.info(f"批量填写表格 {table_id}: 成功 {success_count}/{len(cells)} 个单元格")
+            self._count_bulk(table_id, success_count, len(cells) - success_count)
+            return [bool(result) for result in results]
+        except Exception as e:
+            logger.warning(f"批量填写表格 {table_id} 失败: {e}")
+            self._count_bulk(table_id, 0, len(cells))
+            return [False] * len(cells)
+    
+    def _count_bulk(self, table_id, written, failed):
+        """记录批量填写的计数，有失败时发布一个FAILURE事件"""
+        self.events.count('writes', written)
+        if failed:
+            self.events.count('failures', failed)
+            self.events.publish(FAILURE, f"批量填写表格 {table_id}: {failed} 个单元格失败", 'error')
+
+    def screenshot(self, file_path):
+        """截图当前页面（同步版本）"""
+        return self._run_async(self.screenshot_async(file_path))
+    
+    def fill_input(self, element_identifier, value, row_index=0):
+        """填写输入框（同步版本）"""
+        return self._run_async(self._fill_cell_async('input', element_identifier, value, row_index))
+    
+    def select_option(self, element_identifier, value, row_index=0):
+        """选择下拉框选项（同步版本）"""
+        return self._run_async(self._fill_cell_async('select', element_identifier, value, row_index))
+    
+    def fill_textarea(self, element_identifier, value, row_index=0):
+        """填写文本区域（同步版本）"""
+        return self._run_async(self._fill_cell_async('textarea', element_identifier, value, row_index))
+    
+    def fill_cells(self, cells, concurrency=4):
+        """并发填写多个单元格（同步版本）"""
+        return self._run_async(self.fill_cells_async(cells, concurrency))
+    
+    def read_table_values(self, table_id, columns):
+        """一次读取表格中指定列的当前值（同步版本）"""
+        return self._run_async(self.read_table_values_async(table_id, columns))
+    
+    def fill_table_bulk(self, table_id, cells):
+        """批量填写一个表格中的单元格（同步版本）"""
+        return self._run_async(self.fill_table_bulk_async(table_id, cells))
     
     def close(self):
-        """关闭浏览器（已禁用）"""
-        print('关闭浏览器功能已禁用，保持浏览器打开')
+        """关闭浏览器（已禁用），只保存定位策略缓存和登录状态"""
+        self.selector_cache.save()
+        if self.is_connected:
+            self.save_storage_state()
+        logger.info('关闭浏览器功能已禁用，保持浏览器打开')
         # 不关闭浏览器，保持打开状态
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+xlsx流式读取模块，只使用标准库（zipfile + iterparse）读取活动工作表
+
+读取结果与openpyxl只读模式（read_only=True, data_only=True）的iter_rows(values_only=True)一致，
+遇到不支持的内容（日期单元格、Strict OOXML等）时抛出XlsxUnsupportedError，由调用方回退到openpyxl。
+"""
+
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# 内置的日期/时间数字格式编号（包括各语言版本的日期格式）
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+# 与openpyxl一致的日期格式判断：忽略引号中的文字和方括号中的区域设置
+DATE_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+DATE_FORMAT_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+COORDINATE_RE = re.compile(r"([A-Z]+)(\d+)$")
+
+
+class XlsxUnsupportedError(Exception):
+    """xlsx文件包含流式读取不支持的内容"""
+
+
+def localname(tag):
+    """去掉XML标签的命名空间"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(letters):
+    """把列字母转换为列号（A为1）"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def is_date_format(fmt):
+    """判断数字格式是否为日期/时间格式"""
+    if fmt is None:
+        return False
+    fmt = DATE_FORMAT_STRIP_RE.sub("", fmt.split(";")[0])
+    return DATE_FORMAT_RE.search(fmt) is not None
+
+
+def text_content(element):
+    """读取字符串元素（si或is）的纯文本：直接的t元素加上各个r/t，忽略拼音（rPh）"""
+    snippets = []
+    for child in element:
+        name = localname(child.tag)
+        if name == 't':
+            snippets.append(child.text or '')
+        elif name == 'r':
+            for grandchild in child:
+                if localname(grandchild.tag) == 't':
+                    snippets.append(grandchild.text or '')
+    return ''.join(snippets)
+
+
+class XlsxSheetReader:
+    """xlsx活动工作表的流式读取器
+
+    打开时只读取工作簿结构、共享字符串、样式和工作表的尺寸，
+    iter_rows()边解析边返回每一行，已处理的行立即释放。
+    max_col可以在遍历过程中修改，只解码需要的列。
+    """
+
+    def __init__(self, excel_file):
+        """打开xlsx文件
+
+        Args:
+            excel_file (str): xlsx文件路径
+
+        Raises:
+            XlsxUnsupportedError: 文件不是xlsx或包含不支持的结构
+        """
+        try:
+            self.archive = zipfile.ZipFile(excel_file)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise XlsxUnsupportedError(f"无法作为xlsx打开: {e}")
+        self.max_col = None  # 只解码到该列（None表示全部）
+        self._columns = {}  # 列字母到列号的缓存
+        try:
+            workbook_path = self._find_workbook()
+            sheet_path, shared_strings_path, styles_path = self._find_parts(workbook_path)
+            self.sheet_path = sheet_path
+            self.shared_strings = self._read_shared_strings(shared_strings_path)
+            self.date_styles = self._read_date_styles(styles_path)
+            self.max_row, self.width = self._read_dimensions()
+        except XlsxUnsupportedError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            raise XlsxUnsupportedError(f"无法解析xlsx结构: {e}")
+
+    def close(self):
+        """关闭xlsx文件"""
+        self.archive.close()
+
+    def _read_rels(self, part_path):
+        """读取部件的关系文件，返回 {rId: (type, target_path)}"""
+        folder, name = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, '_rels', name + '.rels')
+        rels = {}
+        if rels_path not in self.archive.namelist():
+            return rels
+        for _, element in iterparse(self.archive.open(rels_path)):
+            if localname(element.tag) == 'Relationship':
+                target = element.get('Target', '')
+                if target.startswith('/'):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join(folder, target))
+                rels[element.get('Id')] = (element.get('Type', ''), target)
+        return rels
+
+    def _find_workbook(self):
+        """找到工作簿部件的路径"""
+        for rel_type, target in self._read_rels('').values():
+            if rel_type.endswith('/officeDocument'):
+                return target
+        raise XlsxUnsupportedError("找不到工作簿")
+
+    def _find_parts(self, workbook_path):
+        """找到活动工作表、共享字符串和样式部件的路径"""
+        rels = self._read_rels(workbook_path)
+        sheet_ids = []
+        active = None
+        for _, element in iterparse(self.archive.open(workbook_path)):
+            name = localname(element.tag)
+            if name == 'workbook' and not element.tag.startswith('{http://schemas.openxmlformats.org/'):
+                raise XlsxUnsupportedError("不支持Strict OOXML格式")
+            if name == 'workbookView' and active is None and element.get('activeTab') is not None:
+                # 与openpyxl一致：使用第一个指定了activeTab的视图
+                active = int(element.get('activeTab'))
+            elif name == 'sheet':
+                sheet_ids.append(element.get(f'{{{REL_NS}}}id'))
+        active = active or 0
+        if not 0 <= active < len(sheet_ids):
+            raise XlsxUnsupportedError("找不到活动工作表")
+        rel_type, sheet_path = rels.get(sheet_ids[active], ('', None))
+        if not rel_type.endswith('/worksheet'):
+            raise XlsxUnsupportedError("活动工作表不是普通工作表")
+
+        shared_strings_path = styles_path = None
+        for rel_type, target in rels.values():
+            if rel_type.endswith('/sharedStrings'):
+                shared_strings_path = target
+            elif rel_type.endswith('/styles'):
+                styles_path = target
+        return sheet_path, shared_strings_path, styles_path
+
+    def _read_shared_strings(self, path):
+        """读取共享字符串表"""
+        strings = []
+        if path is None or path not in self.archive.namelist():
+            return strings
+        for _, element in iterparse(self.archive.open(path)):
+            if localname(element.tag) == 'si':
+                strings.append(text_content(element).replace('x005F_', ''))
+                element.clear()
+        return strings
+
+    def _read_date_styles(self, path):
+        """读取样式表，返回使用日期/时间格式的单元格样式编号"""
+        date_styles = set()
+        if path is None or path not in self.archive.namelist():
+            return date_styles
+        custom_formats = {}
+        style_formats = []
+        in_cell_xfs = False
+        for event, element in iterparse(self.archive.open(path), events=('start', 'end')):
+            name = localname(element.tag)
+            if name == 'cellXfs':
+                in_cell_xfs = event == 'start'
+            elif event == 'end' and name == 'numFmt':
+                custom_formats[int(element.get('numFmtId'))] = element.get('formatCode')
+            elif event == 'start' and name == 'xf' and in_cell_xfs:
+                style_formats.append(int(element.get('numFmtId', 0)))
+        for style_id, format_id in enumerate(style_formats):
+            if format_id in custom_formats:
+                if is_date_format(custom_formats[format_id]):
+                    date_styles.add(style_id)
+            elif format_id in BUILTIN_DATE_FORMATS:
+                date_styles.add(style_id)
+        return date_styles
+
+    def _read_dimensions(self):
+        """读取工作表的尺寸（dimension），返回 (max_row, max_col)，没有尺寸时返回 (None, None)"""
+        for _, element in iterparse(self.archive.open(self.sheet_path), events=('start',)):
+            name = localname(element.tag)
+            if name == 'dimension':
+                ref = element.get('ref')
+                if ref:
+                    last = ref.split(':')[-1]
+                    match = COORDINATE_RE.match(last)
+                    if match:
+                        return int(match.group(2)), column_index(match.group(1))
+            elif name == 'sheetData':
+                break
+        return None, None
+
+    def _decode(self, cell, data_type, value_text, style, ns):
+        """把单元格的原始值转换为Python值"""
+        if data_type == 'inlineStr':
+            child = cell.find(ns + 'is')
+            return text_content(child) if child is not None else None
+        if value_text is None:
+            return None
+        if data_type == 'n':
+            if style in self.date_styles:
+                raise XlsxUnsupportedError(f"单元格 {cell.get('r')} 是日期格式")
+            if '.' in value_text or 'E' in value_text or 'e' in value_text:
+                return float(value_text)
+            return int(value_text)
+        if data_type == 's':
+            return self.shared_strings[int(value_text)]
+        if data_type == 'b':
+            return bool(int(value_text))
+        if data_type in ('str', 'e'):
+            return value_text
+        raise XlsxUnsupportedError(f"不支持的单元格类型: {data_type}")
+
+    def _parse_row(self, row_element, max_col, ns):
+        """解析一行，返回 ({列号: 值}, 最后一个单元格的列号)"""
+        values = {}
+        column = 0
+        cell_tag = ns + 'c'
+        value_tag = ns + 'v'
+        columns = self._columns
+        for cell in row_element:
+            if cell.tag != cell_tag:
+                continue
+            coordinate = cell.get('r')
+            if coordinate:
+                letters = coordinate.rstrip('0123456789')
+                column = columns.get(letters)
+                if column is None:
+                    column = columns[letters] = column_index(letters)
+            else:
+                column += 1
+            if max_col is not None and column > max_col:
+                continue
+            data_type = cell.get('t', 'n')
+            value_text = None if data_type == 'inlineStr' else (cell.findtext(value_tag) or None)
+            style = cell.get('s')
+            values[column] = self._decode(cell, data_type, value_text, int(style) if style else 0, ns)
+        return values, column
+
+    def _build_row(self, values, last_column):
+        """按openpyxl的规则把一行补齐为固定宽度的元组"""
+        if not last_column and not self.width:
+            return ()
+        width = self.width or last_column
+        if self.max_col is not None:
+            width = min(width, self.max_col)
+        row = [None] * width
+        for column, value in values.items():
+            if column <= width:
+                row[column - 1] = value
+        return tuple(row)
+
+    def _empty_row(self):
+        """缺失行对应的空行"""
+        if not self.width:
+            return ()
+        width = self.width if self.max_col is None else min(self.width, self.max_col)
+        return (None,) * width
+
+    def iter_rows(self, min_row=1):
+        """从min_row开始逐行返回值元组（缺失的行返回空行）
+
+        Args:
+            min_row (int): 开始行
+
+        Yields:
+            tuple: 一行的值
+
+        Raises:
+            XlsxUnsupportedError: 遇到不支持的单元格
+        """
+        counter = min_row
+        row_num = 0
+        ns = None
+        row_tag = None
+        sheet_data = None
+        for event, element in iterparse(self.archive.open(self.sheet_path), events=('start', 'end')):
+            if event == 'start':
+                if ns is None:
+                    # 根元素确定命名空间
+                    tag = element.tag
+                    ns = tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+                    row_tag = ns + 'row'
+                elif element.tag == ns + 'sheetData':
+                    sheet_data = element
+                continue
+            if element.tag != row_tag:
+                continue
+
+            row_attr = element.get('r')
+            row_num = int(row_attr) if row_attr else row_num + 1
+            if self.max_row is not None and row_num > self.max_row:
+                break
+            if row_num >= min_row:
+                # 补齐缺失的行
+                while counter < row_num:
+                    counter += 1
+                    yield self._empty_row()
+                if counter == row_num:
+                    values, last_column = self._parse_row(element, self.max_col, ns)
+                    counter += 1
+                    yield self._build_row(values, last_column)
+
+            # 释放已处理的行
+            element.clear()
+            if sheet_data is not None:
+                sheet_data.remove(element)
+
+        if self.max_row is not None:
+            while counter <= self.max_row:
+                counter += 1
+                yield self._empty_row()